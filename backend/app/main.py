@@ -1,5 +1,8 @@
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+import logging
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.db import create_db_and_tables
@@ -7,6 +10,13 @@ from app.observability import metrics_middleware
 from app.services.rate_limit import rate_limit_middleware
 from app.services.request_id import request_id_middleware
 from app.services.request_logging import request_logging_middleware
+from app.services.http_pool import proxy_clients
+from app.services.refresh import cancel_background_refreshes
+from app.services.executor import ExecutorBusy, cpu_executor
+from app.services import snapshot
+from app.services.snapshot import flush_snapshots
+from app.services.m3u import restore_snapshots as restore_m3u_snapshots
+from app.services.epg import restore_snapshots as restore_epg_snapshots
 from app.config import CORS_ALLOW_ORIGINS
 from app.routers.auth import router as auth_router
 from app.routers.devices import router as devices_router
@@ -19,12 +29,30 @@ from app.routers.ui import router as ui_router
 from app.routers.billing import router as billing_router
 from app.routers.playlists import router as playlists_router
 
+logger = logging.getLogger("webplay")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     create_db_and_tables()
+    # Warm restart: playlists e guias do último snapshot em disco; as fontes configuradas
+    # (mesmos padrões das rotas do catálogo) são atualizadas em segundo plano
+    if snapshot.enabled():
+        restored_m3u = await restore_m3u_snapshots({os.getenv("M3U_SOURCE") or "sample.m3u"})
+        restored_epg = await restore_epg_snapshots({os.getenv("EPG_SOURCE") or "sample.xml"})
+        logger.info("msg=snapshots_restored m3u=%s epg=%s", restored_m3u, restored_epg)
+    # Cliente padrão do proxy criado no loop da aplicação
+    proxy_clients.get()
     yield
-    # Shutdown (opcional)
+    # Shutdown: interromper atualizações de fontes em segundo plano
+    await cancel_background_refreshes()
+    # Concluir gravações de snapshot pendentes
+    await flush_snapshots()
+    # Fechar conexões mantidas pelo pool do proxy
+    await proxy_clients.aclose()
+    # Encerrar workers do executor CPU-bound
+    cpu_executor.shutdown()
 
 app = FastAPI(title="WebPlay Backend", version="0.1.0", lifespan=lifespan)
 
@@ -33,6 +61,11 @@ app = FastAPI(title="WebPlay Backend", version="0.1.0", lifespan=lifespan)
 def health():
     return {"status": "ok"}
 
+# Fila do executor CPU-bound cheia: pedir ao cliente que tente novamente
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request: Request, exc: ExecutorBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 # Redireciona a raiz para a página inicial da UI
 @app.get("/")
 def root():
@@ -43,6 +43,89 @@ RATE_LIMIT_BLOCKED_TOTAL = Counter(
     labelnames=["path"],
 )
 
+# Caches in-memory (M3U, EPG, etc.)
+CACHE_REQUESTS_TOTAL = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache name and result",
+    labelnames=["cache", "result"],
+)
+
+CACHE_EVICTIONS_TOTAL = Counter(
+    "cache_evictions_total",
+    "Entries evicted from a cache to respect its byte budget",
+    labelnames=["cache"],
+)
+
+CACHE_EXPIRED_TOTAL = Counter(
+    "cache_expired_total",
+    "Expired entries removed proactively from a cache",
+    labelnames=["cache"],
+)
+
+CACHE_BYTES = Gauge(
+    "cache_bytes",
+    "Approximate bytes held by a cache",
+    labelnames=["cache"],
+)
+
+CACHE_ENTRIES = Gauge(
+    "cache_entries",
+    "Number of entries held by a cache",
+    labelnames=["cache"],
+)
+
+# Requisições coalescidas (single-flight): chamadas que aguardaram uma busca já em andamento
+SINGLEFLIGHT_COALESCED_TOTAL = Counter(
+    "singleflight_coalesced_total",
+    "Callers that awaited an in-flight load instead of starting their own",
+    labelnames=["name"],
+)
+
+# Stale-while-revalidate de fontes (M3U/EPG)
+STALE_SERVED_TOTAL = Counter(
+    "source_stale_served_total",
+    "Requests served from an expired entry while a background refresh runs",
+    labelnames=["name"],
+)
+
+SOURCE_REFRESH_TOTAL = Counter(
+    "source_refresh_total",
+    "Background refreshes of cached sources by result",
+    labelnames=["name", "result"],
+)
+
+SOURCE_DATA_AGE_SECONDS = Gauge(
+    "source_data_age_seconds",
+    "Age of the most recently served source data",
+    labelnames=["name"],
+)
+
+# Executor de etapas CPU-bound (parse, normalização, hashing)
+CPU_TASK_QUEUE_WAIT_SECONDS = Histogram(
+    "cpu_task_queue_wait_seconds",
+    "Time a CPU-bound task waited for an executor worker",
+    labelnames=["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+CPU_TASK_RUN_SECONDS = Histogram(
+    "cpu_task_run_seconds",
+    "Run time of a CPU-bound task on an executor worker",
+    labelnames=["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+CPU_TASKS_REJECTED_TOTAL = Counter(
+    "cpu_tasks_rejected_total",
+    "CPU-bound tasks rejected because the executor queue was full",
+    labelnames=["stage"],
+)
+
+CPU_EXECUTOR_PENDING = Gauge(
+    "cpu_executor_pending",
+    "CPU-bound tasks submitted and not yet finished",
+)
+
 
 async def metrics_middleware(request: Request, call_next: Callable[[Request], Response]):
     start = time.perf_counter()
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
@@ -12,6 +12,8 @@ import socket
 from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 import hashlib
+import json
+import re
 
 from app.config import os as _os  # reuse loaded dotenv context
 from app.config import (
@@ -23,8 +25,14 @@ from app.config import (
     PROXY_OUTBOUND_HTTPS,
     PROXY_TRUST_ENV,
 )
-from app.services.m3u import load_m3u_text, parse_m3u
-from app.services.catalog import get_enriched_channels, get_now
+from app.services.m3u import iter_m3u_channels, load_m3u_entry, load_m3u_channels, m3u_data_age
+from app.services.epg import epg_data_age
+from app.services.http_cache import etag_matches, strong_etag
+from app.services.refresh import SOURCE_ERRORS, data_age_headers
+from app.services.catalog import get_catalog_view, get_now
+from app.services.http_pool import proxy_clients
+from app.services.manifest_cache import manifest_cache
+from app.services.segment_cache import CachedSegment, segment_cache
 from sqlmodel import Session, select
 from app.db import get_session
 from app.models import Playlist
@@ -105,18 +113,88 @@ def _get_active_playlist(
         return None
 
 
+class CatalogQuery(BaseModel):
+    q: Optional[str] = None
+    group: Optional[str] = None
+    category: Optional[str] = None
+    sort: Optional[str] = None
+    cursor: Optional[str] = None
+    limit: Optional[int] = None
+
+    def is_empty(self) -> bool:
+        return not any(v is not None and v != "" for v in self.model_dump().values())
+
+
+def _catalog_query(
+    q: Optional[str] = Query(default=None, description="Busca por nome/grupo (sem acentos, case-insensitive)"),
+    group: Optional[str] = Query(default=None, description="Grupo exato (case-insensitive)"),
+    category: Optional[str] = Query(default=None, pattern="^(live|movies|series|all)$", description="live|movies|series|all"),
+    sort: Optional[str] = Query(default=None, pattern="^(name|group|number)$", description="name|group|number"),
+    cursor: Optional[str] = Query(default=None, description="Cursor opaco devolvido em X-Next-Cursor"),
+    limit: Optional[int] = Query(default=None, ge=1, le=5000, description="Itens por página"),
+) -> CatalogQuery:
+    return CatalogQuery(q=q, group=group, category=category, sort=sort, cursor=cursor, limit=limit)
+
+
+async def _enriched_response(
+    request: Request,
+    m3u_source: str,
+    epg_source: str,
+    force: bool,
+    include_now: bool,
+    time: Optional[datetime],
+    query: CatalogQuery,
+) -> Response:
+    offset = 0
+    if query.cursor:
+        try:
+            offset = int(query.cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+    try:
+        ref_time = None
+        if include_now and time is not None:
+            ref_time = time if time.tzinfo else time.replace(tzinfo=timezone.utc)
+        view = await get_catalog_view(m3u_source, epg_source, force=force, include_now=include_now, ref_time=ref_time)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Fonte EPG não encontrada: {e}")
+    except SOURCE_ERRORS as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    # JSON pré-serializado no formato de EnrichedChannelResponse
+    if query.is_empty():
+        body, etag, headers = view.body, strong_etag(view.etag), {}
+    else:
+        body, total, next_offset = view.page(
+            q=query.q,
+            group=query.group,
+            category=query.category,
+            sort=query.sort,
+            offset=offset,
+            limit=query.limit,
+        )
+        etag = strong_etag(hashlib.sha256((view.etag + query.model_dump_json()).encode("utf-8")).hexdigest())
+        headers = {"X-Total-Count": str(total)}
+        if next_offset is not None:
+            headers["X-Next-Cursor"] = str(next_offset)
+    headers.update(data_age_headers(m3u_data_age(m3u_source), epg_data_age(epg_source)))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, **headers})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, **headers})
+
+
 @router.get("/m3u", response_class=PlainTextResponse)
 async def get_m3u(request: Request, force: bool = Query(default=False)):
     source = _get_source()
     try:
-        text = await load_m3u_text(source, force=force)
-    except Exception as e:
+        entry = await load_m3u_entry(source, force=force)
+    except SOURCE_ERRORS as e:
         raise HTTPException(status_code=500, detail=str(e))
-    etag = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    etag = entry.content_hash
+    headers = data_age_headers(m3u_data_age(source))
     inm = request.headers.get("if-none-match")
     if inm == etag:
-        return Response(status_code=304)
-    return PlainTextResponse(text, headers={"ETag": etag})
+        return Response(status_code=304, headers=headers)
+    return PlainTextResponse(entry.text, headers={"ETag": etag, **headers})
 
 
 @router.get("/next", response_model=List[NextItem])
@@ -141,23 +219,67 @@ async def get_next_program(time: Optional[datetime] = Query(default=None, descri
         return result
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=f"Fonte EPG não encontrada: {e}")
-    except Exception as e:
+    except SOURCE_ERRORS as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Campos de ChannelResponse (listas e linhas do NDJSON): só eles são lidos de
+# cada Channel, sem materializar raw_extinf
+_STREAM_FIELDS = tuple(ChannelResponse.model_fields)
+
+
+def _channel_response(ch: Any) -> ChannelResponse:
+    return ChannelResponse(**{k: ch.get(k) for k in _STREAM_FIELDS})
+
+
 @router.get("/channels", response_model=List[ChannelResponse])
-async def get_channels(force: bool = Query(default=False)):
+async def get_channels(response: Response, force: bool = Query(default=False)):
     source = _get_source()
     try:
-        text = await load_m3u_text(source, force=force)
-        channels = parse_m3u(text)
-    except Exception as e:
+        channels = await load_m3u_channels(source, force=force)
+    except SOURCE_ERRORS as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    response.headers.update(data_age_headers(m3u_data_age(source)))
+    return [_channel_response(c) for c in channels]
+
+# Linhas acumuladas antes de enviar um bloco ao cliente
+_STREAM_FLUSH_BYTES = 64 * 1024
+
+
+@router.get("/channels/stream")
+async def stream_channels():
+    """Canais em NDJSON (uma linha JSON por canal), enviados à medida que a playlist é parseada."""
+    source = _get_source()
+    channels = iter_m3u_channels(source)
+    try:
+        # Primeiro canal antes de iniciar a resposta: erros da fonte ainda viram 500
+        first = await channels.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except SOURCE_ERRORS as e:
         raise HTTPException(status_code=500, detail=str(e))
-    return [ChannelResponse(**c) for c in channels]
+
+    async def body():
+        if first is None:
+            return
+        buf = [json.dumps({k: first.get(k) for k in _STREAM_FIELDS}, ensure_ascii=False)]
+        size = len(buf[0])
+        async for ch in channels:
+            line = json.dumps({k: ch.get(k) for k in _STREAM_FIELDS}, ensure_ascii=False)
+            buf.append(line)
+            size += len(line) + 1
+            if size >= _STREAM_FLUSH_BYTES:
+                yield "\n".join(buf) + "\n"
+                buf, size = [], 0
+        if buf:
+            yield "\n".join(buf) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
 
 
 @router.get("/channels/me", response_model=List[ChannelResponse])
 async def get_channels_me(
+    response: Response,
     force: bool = Query(default=False),
     session: Session = Depends(get_session),
     current_user: UserProfile = Depends(get_current_user),
@@ -166,60 +288,68 @@ async def get_channels_me(
     if not item:
         raise HTTPException(status_code=404, detail="Nenhuma playlist ativa para este usuário")
     try:
-        text = await load_m3u_text(item.url, force=force)
-        channels = parse_m3u(text)
-    except Exception as e:
+        channels = await load_m3u_channels(item.url, force=force)
+    except SOURCE_ERRORS as e:
         raise HTTPException(status_code=500, detail=str(e))
-    return [ChannelResponse(**c) for c in channels]
+    response.headers.update(data_age_headers(m3u_data_age(item.url)))
+    return [_channel_response(c) for c in channels]
 
 
 @router.get("/channels/enriched", response_model=List[EnrichedChannelResponse])
 async def get_channels_enriched(
+    request: Request,
     force: bool = Query(default=False),
     include_now: bool = Query(default=False, description="Inclui current/next por canal"),
     time: Optional[datetime] = Query(default=None, description="ISO8601; assume UTC se sem timezone"),
+    query: CatalogQuery = Depends(_catalog_query),
 ):
-    m3u_source = _get_source()
-    epg_source = _get_epg_source()
-    try:
-        items = await get_enriched_channels(m3u_source, epg_source, force=force)
-        now_map = {}
-        if include_now:
-            ref_time = None
-            if time is not None:
-                ref_time = time if time.tzinfo else time.replace(tzinfo=timezone.utc)
-            now_items = await get_now(m3u_source, epg_source, ref_time=ref_time)
-            # mapear por tvg_id (case-insensitive)
-            for it in now_items:
-                tid = it.get("tvg_id")
-                key = tid.lower() if isinstance(tid, str) else None
-                if key:
-                    now_map[key] = {
-                        "current": it.get("current"),
-                        "next": it.get("next"),
-                    }
-        # Modelagem: epg pode ser None ou dict compatível com EpgInfo
-        result: List[EnrichedChannelResponse] = []
-        for it in items:
-            epg = it.get("epg")
-            payload = {k: it.get(k) for k in ["name", "url", "tvg_id", "group", "logo"]}
-            if epg:
-                payload["epg"] = EpgInfo(**epg)  # type: ignore[arg-type]
-            if include_now:
-                tvg_id = it.get("tvg_id")
-                key = tvg_id.lower() if isinstance(tvg_id, str) else None
-                if key and key in now_map:
-                    nm = now_map[key]
-                    if nm.get("current"):
-                        payload["current"] = ProgramItem(**nm["current"])  # type: ignore[arg-type]
-                    if nm.get("next"):
-                        payload["next"] = ProgramItem(**nm["next"])  # type: ignore[arg-type]
-            result.append(EnrichedChannelResponse(**payload))
-        return result
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=404, detail=f"Fonte EPG não encontrada: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await _enriched_response(request, _get_source(), _get_epg_source(), force, include_now, time, query)
+
+
+def _is_manifest(target: str, ctype: str) -> bool:
+    path = urlparse(target).path.lower()
+    if path.endswith(('.m3u8', '.m3u', '.mpd')):
+        return True
+    return 'mpegurl' in ctype.lower() or 'dash+xml' in ctype.lower()
+
+
+def _rewrite_hls_playlist(text: str, base_url: str) -> Tuple[str, List[str], Optional[float]]:
+    """Reescreve a playlist HLS para que segmentos/chaves passem pelo proxy.
+
+    Retorna (corpo reescrito, URLs absolutas dos recursos, #EXT-X-TARGETDURATION).
+    """
+    base_dir = base_url.rsplit('/', 1)[0] + '/'
+    proxied = []
+    resources: List[str] = []
+    target_duration: Optional[float] = None
+
+    def repl(m):
+        uri = m.group(1)
+        absu = uri if uri.startswith('http') else urljoin(base_dir, uri)
+        return f'URI="/catalog/proxy?url={quote(absu, safe="")}"'
+
+    for line in text.splitlines():
+        if line.startswith('#EXT-X-KEY') and 'URI=' in line:
+            # Reescrever URI do KEY
+            try:
+                line = re.sub(r'URI="([^"]+)"', repl, line)
+            except Exception:
+                pass
+            proxied.append(line)
+        elif line.startswith('#EXT-X-TARGETDURATION:'):
+            try:
+                target_duration = float(line.split(':', 1)[1].strip())
+            except ValueError:
+                pass
+            proxied.append(line)
+        elif line.startswith('#') or not line.strip():
+            proxied.append(line)
+        else:
+            # Linha de recurso (segmento ou playlist aninhada)
+            absu = line if line.startswith('http') else urljoin(base_dir, line)
+            resources.append(absu)
+            proxied.append(f"/catalog/proxy?url={quote(absu, safe='')}")
+    return "\n".join(proxied), resources, target_duration
 
 
 # Proxy simples para HLS/DASH com cabeçalhos customizados
@@ -281,147 +411,135 @@ async def stream_proxy(
             except Exception:
                 pass
 
-        # httpx >=0.28 remove 'proxies' e usa transport com proxy
-        transport = None
-        try:
-            proxy_url = None
-            low = target.lower()
-            if low.startswith('https') and PROXY_OUTBOUND_HTTPS:
-                proxy_url = PROXY_OUTBOUND_HTTPS
-            elif PROXY_OUTBOUND_HTTP:
-                proxy_url = PROXY_OUTBOUND_HTTP
-            if proxy_url:
-                transport = httpx.AsyncHTTPTransport(proxy=proxy_url)
-        except Exception:
-            transport = None
-        async with httpx.AsyncClient(
-            follow_redirects=True,
-            timeout=httpx.Timeout(20.0),
-            verify=PROXY_VERIFY_TLS,
-            transport=transport,
-            trust_env=PROXY_TRUST_ENV,
-        ) as client:
+        # Cliente do pool (conexões keep-alive reaproveitadas entre segmentos)
+        proxy_url = None
+        low = target.lower()
+        if low.startswith('https') and PROXY_OUTBOUND_HTTPS:
+            proxy_url = PROXY_OUTBOUND_HTTPS
+        elif PROXY_OUTBOUND_HTTP:
+            proxy_url = PROXY_OUTBOUND_HTTP
+        client = proxy_clients.get(proxy_url)
+        upstream_host = urlparse(target).netloc.lower()
+
+        async def _fetch():
             # Retry simples para falhas transitórias de rede/DNS
             resp = None
             last_err = None
             for attempt in range(3):
                 try:
-                    resp = await client.get(target, headers=hdrs)
+                    async with proxy_clients.host_slot(upstream_host):
+                        resp = await client.get(target, headers=hdrs)
                     break
                 except httpx.RequestError as e:
                     last_err = e
-                    import asyncio
                     await asyncio.sleep(0.5 * (attempt + 1))
-            if resp is None:
-                # Fallback: resolver DNS via resolvers públicos usando aiohttp
-                try:
-                    import aiohttp  # type: ignore
-                except Exception:
-                    raise HTTPException(status_code=500, detail=f"Proxy falhou (rede/DNS): {last_err}; e fallback DNS requer 'aiohttp' instalado.")
-
-                # Preparar SSL conforme configuração
-                ssl_ctx = ssl.create_default_context()
-                if not PROXY_VERIFY_TLS:
-                    ssl_ctx.check_hostname = False
-                    ssl_ctx.verify_mode = ssl.CERT_NONE
-
-                # Resolver com servidores públicos (Cloudflare + Google)
-                resolver = aiohttp.AsyncResolver(nameservers=["1.1.1.1", "8.8.8.8"])  # type: ignore
-                connector = aiohttp.TCPConnector(ssl=ssl_ctx, resolver=resolver)  # type: ignore
-                # Escolher proxy apropriado por esquema
-                proxy_url = None
-                if target.lower().startswith('https') and PROXY_OUTBOUND_HTTPS:
-                    proxy_url = PROXY_OUTBOUND_HTTPS
-                elif PROXY_OUTBOUND_HTTP:
-                    proxy_url = PROXY_OUTBOUND_HTTP
+            return resp, last_err
+
+        async def _fetch_segment():
+            resp, last_err = await _fetch()
+            if resp is not None and resp.status_code == 200:
+                seg_ctype = resp.headers.get('content-type', '')
+                if not _is_manifest(target, seg_ctype):
+                    await segment_cache.put(target, CachedSegment(body=resp.content, content_type=seg_ctype))
+            return resp, last_err
+
+        async def _fetch_manifest():
+            resp, last_err = await _fetch()
+            body = None
+            if resp is not None and resp.status_code < 400:
+                m_ctype = resp.headers.get('content-type', '')
+                if 'application/vnd.apple.mpegurl' in m_ctype or 'application/x-mpegURL' in m_ctype or target.lower().endswith('.m3u8'):
+                    body, seg_urls, target_duration = _rewrite_hls_playlist(resp.text, str(resp.url))
+                    segment_cache.register_playlist(seg_urls, target_duration)
+                    manifest_cache.put(target, body, target_duration)
+            return resp, last_err, body
+
+        looks_like_manifest = _is_manifest(target, '')
+        if manifest_cache.enabled and not rng and looks_like_manifest:
+            # Playlists HLS: cache curto (fração do target duration) + coalescência
+            cached_manifest = manifest_cache.get(target)
+            if cached_manifest is not None:
+                return Response(content=cached_manifest, media_type='application/vnd.apple.mpegurl', headers={'X-Cache': 'HIT'})
+            resp, last_err, manifest_body = await manifest_cache.coalesce(target, _fetch_manifest)
+            if manifest_body is not None:
+                return Response(content=manifest_body, media_type='application/vnd.apple.mpegurl')
+        elif segment_cache.enabled and not rng and not looks_like_manifest:
+            # Segmentos (sem Range) passam pelo cache compartilhado com coalescência
+            cached = await segment_cache.get(target)
+            if cached is not None:
+                return Response(content=cached.body, headers={'Content-Type': cached.content_type, 'X-Cache': 'HIT'})
+            resp, last_err = await segment_cache.coalesce(target, _fetch_segment)
+        else:
+            resp, last_err = await _fetch()
+        if resp is None:
+            # Fallback: resolver DNS via resolvers públicos usando aiohttp
+            try:
+                import aiohttp  # type: ignore
+            except Exception:
+                raise HTTPException(status_code=500, detail=f"Proxy falhou (rede/DNS): {last_err}; e fallback DNS requer 'aiohttp' instalado.")
+
+            # Preparar SSL conforme configuração
+            ssl_ctx = ssl.create_default_context()
+            if not PROXY_VERIFY_TLS:
+                ssl_ctx.check_hostname = False
+                ssl_ctx.verify_mode = ssl.CERT_NONE
+
+            # Resolver com servidores públicos (Cloudflare + Google)
+            resolver = aiohttp.AsyncResolver(nameservers=["1.1.1.1", "8.8.8.8"])  # type: ignore
+            connector = aiohttp.TCPConnector(ssl=ssl_ctx, resolver=resolver)  # type: ignore
+            # Escolher proxy apropriado por esquema
+            proxy_url = None
+            if target.lower().startswith('https') and PROXY_OUTBOUND_HTTPS:
+                proxy_url = PROXY_OUTBOUND_HTTPS
+            elif PROXY_OUTBOUND_HTTP:
+                proxy_url = PROXY_OUTBOUND_HTTP
+            timeout = None
+            try:
+                import aiohttp
+                timeout = aiohttp.ClientTimeout(total=20)  # type: ignore
+            except Exception:
                 timeout = None
+            async with aiohttp.ClientSession(connector=connector, trust_env=PROXY_TRUST_ENV, timeout=timeout) as session:  # type: ignore
                 try:
-                    import aiohttp
-                    timeout = aiohttp.ClientTimeout(total=20)  # type: ignore
-                except Exception:
-                    timeout = None
-                async with aiohttp.ClientSession(connector=connector, trust_env=PROXY_TRUST_ENV, timeout=timeout) as session:  # type: ignore
-                    try:
-                        r = await session.get(target, headers=hdrs, allow_redirects=True, proxy=proxy_url)  # type: ignore
-                    except Exception as e:
-                        raise HTTPException(status_code=500, detail=f"Proxy falhou (DNS público): {e}")
-
-                    # Mapear para estrutura semelhante ao httpx Response
-                    status_code = r.status
-                    if status_code >= 400:
-                        body_preview = await r.text()
-                        raise HTTPException(status_code=status_code, detail=f"Proxy falhou: {body_preview[:300]}")
-                    ctype = r.headers.get('content-type', '')
-                    # Reescrever playlists HLS
-                    if 'application/vnd.apple.mpegurl' in ctype or 'application/x-mpegURL' in ctype or target.lower().endswith('.m3u8'):
-                        text = await r.text()
-                        base_url = str(r.url)
-                        base_dir = base_url.rsplit('/', 1)[0] + '/'
-                        proxied = []
-                        for line in text.splitlines():
-                            if line.startswith('#EXT-X-KEY') and 'URI=' in line:
-                                try:
-                                    import re
-                                    def repl(m):
-                                        uri = m.group(1)
-                                        absu = uri if uri.startswith('http') else urljoin(base_dir, uri)
-                                        return f'URI="/catalog/proxy?url={quote(absu, safe="")}"'
-                                    line2 = re.sub(r'URI="([^"]+)"', repl, line)
-                                    proxied.append(line2)
-                                except Exception:
-                                    proxied.append(line)
-                            elif line.startswith('#') or not line.strip():
-                                proxied.append(line)
-                            else:
-                                absu = line if line.startswith('http') else urljoin(base_dir, line)
-                                proxied.append(f"/catalog/proxy?url={quote(absu, safe='')}")
-                        body = "\n".join(proxied)
-                        return Response(content=body, media_type='application/vnd.apple.mpegurl')
-                    # Pass-through streaming
-                    headers = { 'Content-Type': ctype }
-                    cl = r.headers.get('content-length')
-                    if cl: headers['Content-Length'] = cl
-                    ar = r.headers.get('accept-ranges')
-                    if ar: headers['Accept-Ranges'] = ar
-                    return StreamingResponse(r.content.iter_chunked(65536), status_code=status_code, headers=headers)
-            if resp.status_code >= 400:
-                raise HTTPException(status_code=resp.status_code, detail=f"Proxy falhou: {resp.text[:300]}")
-            ctype = resp.headers.get('content-type', '')
-            # Reescrever playlists HLS para que segmentos passem pelo proxy
-            if 'application/vnd.apple.mpegurl' in ctype or 'application/x-mpegURL' in ctype or target.lower().endswith('.m3u8'):
-                text = resp.text
-                base_url = str(resp.url)
-                base_dir = base_url.rsplit('/', 1)[0] + '/'
-                proxied = []
-                for line in text.splitlines():
-                    if line.startswith('#EXT-X-KEY') and 'URI=' in line:
-                        # Reescrever URI do KEY
-                        try:
-                            import re
-                            def repl(m):
-                                uri = m.group(1)
-                                absu = uri if uri.startswith('http') else urljoin(base_dir, uri)
-                                return f'URI="/catalog/proxy?url={quote(absu, safe="")}"'
-                            line = re.sub(r'URI="([^"]+)"', repl, line)
-                        except Exception:
-                            pass
-                        proxied.append(line)
-                    elif line.startswith('#') or not line.strip():
-                        proxied.append(line)
-                    else:
-                        # Linha de recurso (segmento ou playlist aninhada)
-                        absu = line if line.startswith('http') else urljoin(base_dir, line)
-                        proxied.append(f"/catalog/proxy?url={quote(absu, safe='')}" )
-                body = "\n".join(proxied)
-                return Response(content=body, media_type='application/vnd.apple.mpegurl')
-            # Caso geral: stream pass-through
-            headers = { 'Content-Type': ctype }
-            # Propagar content-length e accept-ranges quando disponíveis
-            cl = resp.headers.get('content-length')
-            if cl: headers['Content-Length'] = cl
-            ar = resp.headers.get('accept-ranges')
-            if ar: headers['Accept-Ranges'] = ar
-            return StreamingResponse(resp.aiter_bytes(), status_code=resp.status_code, headers=headers)
+                    r = await session.get(target, headers=hdrs, allow_redirects=True, proxy=proxy_url)  # type: ignore
+                except Exception as e:
+                    raise HTTPException(status_code=500, detail=f"Proxy falhou (DNS público): {e}")
+
+                # Mapear para estrutura semelhante ao httpx Response
+                status_code = r.status
+                if status_code >= 400:
+                    body_preview = await r.text()
+                    raise HTTPException(status_code=status_code, detail=f"Proxy falhou: {body_preview[:300]}")
+                ctype = r.headers.get('content-type', '')
+                # Reescrever playlists HLS
+                if 'application/vnd.apple.mpegurl' in ctype or 'application/x-mpegURL' in ctype or target.lower().endswith('.m3u8'):
+                    text = await r.text()
+                    body, seg_urls, target_duration = _rewrite_hls_playlist(text, str(r.url))
+                    segment_cache.register_playlist(seg_urls, target_duration)
+                    return Response(content=body, media_type='application/vnd.apple.mpegurl')
+                # Pass-through streaming
+                headers = { 'Content-Type': ctype }
+                cl = r.headers.get('content-length')
+                if cl: headers['Content-Length'] = cl
+                ar = r.headers.get('accept-ranges')
+                if ar: headers['Accept-Ranges'] = ar
+                return StreamingResponse(r.content.iter_chunked(65536), status_code=status_code, headers=headers)
+        if resp.status_code >= 400:
+            raise HTTPException(status_code=resp.status_code, detail=f"Proxy falhou: {resp.text[:300]}")
+        ctype = resp.headers.get('content-type', '')
+        # Reescrever playlists HLS para que segmentos passem pelo proxy
+        if 'application/vnd.apple.mpegurl' in ctype or 'application/x-mpegURL' in ctype or target.lower().endswith('.m3u8'):
+            body, seg_urls, target_duration = _rewrite_hls_playlist(resp.text, str(resp.url))
+            segment_cache.register_playlist(seg_urls, target_duration)
+            return Response(content=body, media_type='application/vnd.apple.mpegurl')
+        # Caso geral: stream pass-through
+        headers = { 'Content-Type': ctype }
+        # Propagar content-length e accept-ranges quando disponíveis
+        cl = resp.headers.get('content-length')
+        if cl: headers['Content-Length'] = cl
+        ar = resp.headers.get('accept-ranges')
+        if ar: headers['Accept-Ranges'] = ar
+        return StreamingResponse(resp.aiter_bytes(), status_code=resp.status_code, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -430,54 +548,18 @@ async def stream_proxy(
 
 @router.get("/channels/enriched/me", response_model=List[EnrichedChannelResponse])
 async def get_channels_enriched_me(
+    request: Request,
     force: bool = Query(default=False),
     include_now: bool = Query(default=False, description="Inclui current/next por canal"),
     time: Optional[datetime] = Query(default=None, description="ISO8601; assume UTC se sem timezone"),
+    query: CatalogQuery = Depends(_catalog_query),
     session: Session = Depends(get_session),
     current_user: UserProfile = Depends(get_current_user),
 ):
     item = _get_active_playlist(session, current_user)
     if not item:
         raise HTTPException(status_code=404, detail="Nenhuma playlist ativa para este usuário")
-    m3u_source = item.url
-    epg_source = item.epg_url or _get_epg_source()
-    try:
-        items = await get_enriched_channels(m3u_source, epg_source, force=force)
-        now_map = {}
-        if include_now:
-            ref_time = None
-            if time is not None:
-                ref_time = time if time.tzinfo else time.replace(tzinfo=timezone.utc)
-            now_items = await get_now(m3u_source, epg_source, ref_time=ref_time)
-            for it in now_items:
-                tid = it.get("tvg_id")
-                key = tid.lower() if isinstance(tid, str) else None
-                if key:
-                    now_map[key] = {
-                        "current": it.get("current"),
-                        "next": it.get("next"),
-                    }
-        result: List[EnrichedChannelResponse] = []
-        for it in items:
-            epg = it.get("epg")
-            payload = {k: it.get(k) for k in ["name", "url", "tvg_id", "group", "logo"]}
-            if epg:
-                payload["epg"] = EpgInfo(**epg)  # type: ignore[arg-type]
-            if include_now:
-                tvg_id = it.get("tvg_id")
-                key = tvg_id.lower() if isinstance(tvg_id, str) else None
-                if key and key in now_map:
-                    nm = now_map[key]
-                    if nm.get("current"):
-                        payload["current"] = ProgramItem(**nm["current"])  # type: ignore[arg-type]
-                    if nm.get("next"):
-                        payload["next"] = ProgramItem(**nm["next"])  # type: ignore[arg-type]
-            result.append(EnrichedChannelResponse(**payload))
-        return result
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=404, detail=f"Fonte EPG não encontrada: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await _enriched_response(request, item.url, item.epg_url or _get_epg_source(), force, include_now, time, query)
 
 
 @router.get("/now", response_model=List[NowItem])
@@ -504,5 +586,5 @@ async def get_now_playing(time: Optional[datetime] = Query(default=None, descrip
         return result
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=f"Fonte EPG não encontrada: {e}")
-    except Exception as e:
+    except SOURCE_ERRORS as e:
         raise HTTPException(status_code=500, detail=str(e))
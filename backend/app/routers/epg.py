@@ -1,16 +1,20 @@
 import os
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any
 
 from fastapi import APIRouter, HTTPException, Query, Request, Response
-from fastapi.responses import JSONResponse
 import json
 import hashlib
 from datetime import datetime, timezone
+import math
 import time
 from prometheus_client import Counter, Histogram
 
-from app.services.epg import get_channel_epg, get_epg
-from app.config import EPG_TTL_SECONDS
+from app.services.cache import LRUCache
+from app.services.epg import epg_data_age, get_channel_epg, load_epg_data, load_epg_fragments
+from app.services.executor import run_cpu
+from app.services.http_cache import etag_matches, strong_etag
+from app.services.refresh import data_age_headers
+from app.config import EPG_TTL_SECONDS, EPG_QUERY_CACHE_MAX_BYTES, EPG_QUERY_SLOT_SECONDS
 
 
 router = APIRouter(prefix="/catalog", tags=["catalog"])
@@ -21,8 +25,12 @@ def _epg_source() -> str:
 
 
 # Cache por parâmetros (query-aware) para o endpoint global /catalog/epg
-_QUERY_CACHE: Dict[str, Tuple[float, Dict[str, Any], str]] = {}
+# LRU com orçamento de bytes; valores: (corpo JSON, ETag)
 _CACHE_TTL = float(EPG_TTL_SECONDS)
+_QUERY_CACHE = LRUCache("epg_query", max_bytes=EPG_QUERY_CACHE_MAX_BYTES, ttl=_CACHE_TTL)
+# Remoção periódica das entradas vencidas (não só quando a mesma chave é consultada)
+_PURGE_INTERVAL_SECONDS = min(_CACHE_TTL, 30.0)
+_last_purge = 0.0
 
 # Métricas Prometheus para observabilidade de /catalog/epg
 EPG_QUERY_CACHE_TOTAL = Counter(
@@ -60,6 +68,36 @@ def _dt_to_iso(dt: Optional[datetime]) -> Optional[str]:
     return dt.astimezone(timezone.utc).isoformat()
 
 
+def _snap(dt: Optional[datetime], up: bool) -> Optional[datetime]:
+    # Alinha ao início (start) ou fim (end) do slot de EPG_QUERY_SLOT_SECONDS, em UTC
+    if dt is None or EPG_QUERY_SLOT_SECONDS <= 0:
+        return dt
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    slots = dt.timestamp() / EPG_QUERY_SLOT_SECONDS
+    slot = math.ceil(slots) if up else math.floor(slots)
+    try:
+        return datetime.fromtimestamp(slot * EPG_QUERY_SLOT_SECONDS, tz=timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        # Slot fora da faixa de datetime (ex.: fim em 9999-12-31): mantém o instante pedido
+        return dt
+
+
+def _purge_expired(now_ts: float) -> None:
+    global _last_purge
+    if now_ts - _last_purge >= _PURGE_INTERVAL_SECONDS:
+        _last_purge = now_ts
+        _QUERY_CACHE.purge_expired()
+
+
+def _dt_to_ts(dt: Optional[datetime]) -> Optional[float]:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
 def _make_cache_key(
     base_hash: str,
     start: Optional[datetime],
@@ -88,14 +126,24 @@ async def epg_catalog(
     offset_per_channel: int = Query(default=0, ge=0, description="Deslocamento por canal"),
 ):
     source = _epg_source()
+    # Janela alinhada aos slots: consultas com instantes vizinhos compartilham a
+    # mesma entrada de cache (e o filtro usa a mesma janela alinhada)
+    start = _snap(start, up=False)
+    end = _snap(end, up=True)
     try:
-        data = await get_epg(source)
-        # Base hash do EPG normalizado para invalidar cache quando conteúdo mudar
-        base_payload = json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")
-        base_hash = hashlib.sha256(base_payload).hexdigest()
-
-        # Consultar cache por parâmetros
+        epg_data = await load_epg_data(source)
+        age_headers = data_age_headers(epg_data_age(source))
+        # Base hash = SHA-256 do XMLTV, calculado uma vez no carregamento do guia
+        base_hash = epg_data.content_hash
+        if not base_hash:
+            raise RuntimeError(f"Guia EPG carregado sem hash de conteúdo: {source}")
+
+        # Chave do cache e ETag derivadas de (base hash, parâmetros normalizados):
+        # a resposta é determinística, então não é preciso serializá-la para o ETag
         cache_key = _make_cache_key(base_hash, start, end, limit_per_channel, offset_per_channel)
+        etag = strong_etag(hashlib.sha256(cache_key.encode("utf-8")).hexdigest())
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag, **age_headers})
         now_ts = time.time()
         # Registrar uso de filtros/paginação
         has_start = "yes" if start is not None else "no"
@@ -114,50 +162,28 @@ async def epg_catalog(
         except Exception:
             pass
 
+        _purge_expired(now_ts)
         cached = _QUERY_CACHE.get(cache_key)
-        if cached and (now_ts - cached[0]) < _CACHE_TTL:
-            cached_data, cached_etag = cached[1], cached[2]
-            inm = request.headers.get("if-none-match")
-            if inm == cached_etag:
-                EPG_QUERY_CACHE_TOTAL.labels(result="hit").inc()
-                return Response(status_code=304)
+        if cached is not None:
             EPG_QUERY_CACHE_TOTAL.labels(result="hit").inc()
-            return JSONResponse(content=cached_data, headers={"ETag": cached_etag})
+            return Response(content=cached[0], media_type="application/json", headers={"ETag": cached[1], **age_headers})
         else:
             EPG_QUERY_CACHE_TOTAL.labels(result="miss").inc()
-        # Aplicar filtros globais por intervalo e paginação por canal
-        if start is not None or end is not None or limit_per_channel is not None or offset_per_channel:
-            # Normalizar timezone (assume UTC se ausente)
-            ref_start = start if (start is None or start.tzinfo) else start.replace(tzinfo=timezone.utc)
-            ref_end = end if (end is None or end.tzinfo) else end.replace(tzinfo=timezone.utc)
-            programs = data.get("programs", {})
-            new_programs: Dict[str, List[Dict[str, Any]]] = {}
-            for cid, plist in programs.items():
-                filtered: List[Dict[str, Any]] = []
-                for p in plist:
-                    s = _to_dt(p.get("start"))
-                    e = _to_dt(p.get("stop"))
-                    if not s or not e:
-                        continue
-                    if ref_start and e <= ref_start:
-                        continue
-                    if ref_end and s >= ref_end:
-                        continue
-                    filtered.append(p)
-                # Paginação por canal
-                start_idx = offset_per_channel if offset_per_channel >= 0 else 0
-                end_idx = start_idx + limit_per_channel if (limit_per_channel is not None) else None
-                new_programs[cid] = filtered[start_idx:end_idx]
-            data = {**data, "programs": new_programs}
-
-        payload = json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")
-        etag = hashlib.sha256(payload).hexdigest()
-        inm = request.headers.get("if-none-match")
-        if inm == etag:
-            return Response(status_code=304)
+        # Resposta montada por concatenação dos fragmentos JSON pré-serializados
+        # (busca binária da janela em cada canal), fora do event loop
+        fragments = await load_epg_fragments(source)
+        body = await run_cpu(
+            "epg_filter",
+            fragments.render,
+            _dt_to_ts(start),
+            _dt_to_ts(end),
+            limit_per_channel,
+            offset_per_channel,
+            stateful=True,
+        )
         # Armazenar no cache por parâmetros
-        _QUERY_CACHE[cache_key] = (now_ts, data, etag)
-        return JSONResponse(content=data, headers={"ETag": etag})
+        _QUERY_CACHE.set(cache_key, (body, etag), size=len(body))
+        return Response(content=body, media_type="application/json", headers={"ETag": etag, **age_headers})
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=f"Arquivo EPG não encontrado: {e}")
 
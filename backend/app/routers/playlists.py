@@ -7,7 +7,8 @@ from sqlmodel import Session, select
 from app.db import get_session
 from app.models import Playlist, AuditLog
 from app.routers.auth import get_current_user, UserProfile
-from app.services.m3u import load_m3u_text, parse_m3u
+from app.services.m3u import load_m3u_channels
+from app.services.refresh import SOURCE_ERRORS
 
 
 router = APIRouter(prefix="/playlists", tags=["playlists"])
@@ -193,9 +194,8 @@ async def reload_playlist(
     if not item or item.owner_username != current_user.username:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Playlist não encontrada")
     try:
-        text = await load_m3u_text(item.url, force=True)
-        channels = parse_m3u(text)
-    except Exception as e:
+        channels = await load_m3u_channels(item.url, force=True)
+    except SOURCE_ERRORS as e:
         raise HTTPException(status_code=500, detail=f"Falha ao carregar lista: {e}")
 
     # Contagem por grupo
@@ -0,0 +1,145 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional
+
+from app.observability import (
+    CACHE_BYTES,
+    CACHE_ENTRIES,
+    CACHE_EVICTIONS_TOTAL,
+    CACHE_EXPIRED_TOTAL,
+    CACHE_REQUESTS_TOTAL,
+)
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    size: int
+    ts: float
+    expires_at: float
+
+
+class LRUCache:
+    """Cache LRU em memória com orçamento de bytes e TTL por entrada.
+
+    Entradas expiradas não são devolvidas por `get`, mas permanecem
+    disponíveis via `peek` até serem despejadas pelo orçamento de bytes.
+    """
+
+    def __init__(self, name: str, max_bytes: int, ttl: float):
+        self.name = name
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl = float(ttl)
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.time():
+            self.misses += 1
+            CACHE_REQUESTS_TOTAL.labels(cache=self.name, result="miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        CACHE_REQUESTS_TOTAL.labels(cache=self.name, result="hit").inc()
+        return entry.value
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        # Não altera ordem LRU nem contadores; inclui entradas expiradas
+        return self._entries.get(key)
+
+    def set(self, key: Hashable, value: Any, size: int, ttl: Optional[float] = None, ts: Optional[float] = None) -> None:
+        # `ts`: instante de origem dos dados (padrão: agora); o TTL conta a partir de agora
+        size = max(0, int(size))
+        self.pop(key)
+        if size > self.max_bytes:
+            # Maior que o orçamento inteiro: não vale a pena armazenar
+            self._publish()
+            return
+        now = time.time()
+        ttl_eff = self.ttl if ttl is None else float(ttl)
+        self._entries[key] = CacheEntry(value=value, size=size, ts=now if ts is None else ts, expires_at=now + ttl_eff)
+        self._bytes += size
+        self._evict()
+        self._publish()
+
+    def touch(self, key: Hashable, ttl: Optional[float] = None) -> bool:
+        # Renova uma entrada existente (ex.: fonte revalidada com 304) sem trocar o valor
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        now = time.time()
+        entry.ts = now
+        entry.expires_at = now + (self.ttl if ttl is None else float(ttl))
+        self._entries.move_to_end(key)
+        return True
+
+    def resize(self, key: Hashable, size: int) -> None:
+        # Atualiza o tamanho contabilizado (ex.: após derivar dados da entrada)
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        size = max(0, int(size))
+        self._bytes += size - entry.size
+        entry.size = size
+        self._evict()
+        self._publish()
+
+    def pop(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            self._publish()
+        return entry
+
+    def purge_expired(self) -> int:
+        """Remove já as entradas com TTL vencido (em vez de esperar o despejo); devolve quantas."""
+        now = time.time()
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            self._bytes -= self._entries.pop(key).size
+        if expired:
+            CACHE_EXPIRED_TOTAL.labels(cache=self.name).inc(len(expired))
+            self._publish()
+        return len(expired)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+        self._publish()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _evict(self) -> None:
+        # Remove as entradas menos recentemente usadas até caber no orçamento
+        while self._bytes > self.max_bytes and self._entries:
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= old.size
+            self.evictions += 1
+            CACHE_EVICTIONS_TOTAL.labels(cache=self.name).inc()
+
+    def _publish(self) -> None:
+        CACHE_BYTES.labels(cache=self.name).set(self._bytes)
+        CACHE_ENTRIES.labels(cache=self.name).set(len(self._entries))
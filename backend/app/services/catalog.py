@@ -1,95 +1,260 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import re
+import unicodedata
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from app.services.m3u import load_m3u_text, parse_m3u
-from app.services.epg import get_epg
+from app.config import CATALOG_VIEW_CACHE_MAX_BYTES, CATALOG_VIEW_TTL_SECONDS
+from app.services.cache import LRUCache
+from app.services.executor import run_cpu
+from app.services.m3u import Channel, channels_for_entry, load_m3u_channels, load_m3u_entry
+from app.services.epg import EPGData, load_epg_data
+from app.services.now_next import now_next_all
 
 
-def _to_dt(iso_str: Optional[str]) -> Optional[datetime]:
-    if not iso_str:
-        return None
-    s = iso_str.replace("Z", "+00:00")
-    try:
-        return datetime.fromisoformat(s)
-    except Exception:
-        return None
+# Chave de ordenação por número para canais sem dígitos no tvg_id
+_NO_NUMBER = (1, 0)
+
+
+class ChannelIndex:
+    """Índices pré-computados sobre a playlist parseada para busca e paginação.
+
+    Depende apenas do conteúdo do M3U; é compartilhado pelas visões de
+    todos os minutos/EPGs que usam a mesma playlist.
+    """
+
+    SORT_KEYS = ("name", "group", "number")
+
+    def __init__(self, channels: List[Channel]):
+        self.haystack: List[str] = []
+        self.group_keys: List[str] = []
+        self.categories: List[str] = []
+        self.by_group: Dict[str, List[int]] = {}
+        self.by_category: Dict[str, List[int]] = {}
+        name_keys: List[str] = []
+        numbers: List[Tuple[int, int]] = []
+        for i, ch in enumerate(channels):
+            name = _fold(ch.get("name"))
+            group = _fold(ch.get("group"))
+            cat = classify_channel(name, group)
+            gkey = (ch.get("group") or "").strip().lower()
+            self.haystack.append(name + "\n" + group)
+            self.group_keys.append(gkey)
+            self.categories.append(cat)
+            self.by_group.setdefault(gkey, []).append(i)
+            self.by_category.setdefault(cat, []).append(i)
+            name_keys.append(name)
+            digits = "".join(c for c in str(ch.get("tvg_id") or "") if c.isdigit())
+            # Sem número no tvg_id: depois de todos os numerados (inclusive "0")
+            numbers.append((0, int(digits)) if digits else _NO_NUMBER)
+        n = len(channels)
+        orders = {
+            "name": sorted(range(n), key=name_keys.__getitem__),
+            "group": sorted(range(n), key=self.group_keys.__getitem__),
+            "number": sorted(range(n), key=numbers.__getitem__),
+        }
+        self.orders = orders
+        # Posição de cada item em cada ordenação (para ordenar subconjuntos)
+        self.ranks: Dict[str, List[int]] = {}
+        for key, order in orders.items():
+            rank = [0] * n
+            for pos, idx in enumerate(order):
+                rank[idx] = pos
+            self.ranks[key] = rank
+
+    def __len__(self) -> int:
+        return len(self.haystack)
+
+    def estimated_size(self) -> int:
+        """Bytes aproximados das estruturas do índice (a playlist já é contada no cache do M3U)."""
+        folded = sum(len(h) for h in self.haystack) + sum(len(g) for g in self.group_keys)
+        return folded + _INDEX_ITEM_BYTES * len(self)
+
+    def select(
+        self,
+        q: Optional[str] = None,
+        group: Optional[str] = None,
+        category: Optional[str] = None,
+        sort: Optional[str] = None,
+    ) -> List[int]:
+        sort_key = sort if sort in self.SORT_KEYS else None
+        gkey = group.strip().lower() if group else None
+        cat = category if category and category != "all" else None
+        needle = _fold(q) if q else ""
+
+        if gkey is None and cat is None and not needle:
+            return list(self.orders[sort_key]) if sort_key else list(range(len(self)))
+
+        # Começar pelo menor conjunto candidato disponível
+        if gkey is not None:
+            candidates = self.by_group.get(gkey, [])
+        elif cat is not None:
+            candidates = self.by_category.get(cat, [])
+        else:
+            candidates = range(len(self))
+        selected = [
+            i
+            for i in candidates
+            if (cat is None or self.categories[i] == cat)
+            and (gkey is None or self.group_keys[i] == gkey)
+            and (not needle or needle in self.haystack[i])
+        ]
+        if sort_key:
+            selected.sort(key=self.ranks[sort_key].__getitem__)
+        return selected
+
+
+@dataclass
+class CatalogView:
+    body: bytes
+    etag: str
+    # JSON de cada canal, na ordem da playlist (montagem de páginas)
+    fragments: List[bytes]
+    index: ChannelIndex
+
+    def page(
+        self,
+        q: Optional[str] = None,
+        group: Optional[str] = None,
+        category: Optional[str] = None,
+        sort: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[bytes, int, Optional[int]]:
+        """Retorna (corpo JSON, total filtrado, próximo offset ou None)."""
+        selected = self.index.select(q=q, group=group, category=category, sort=sort)
+        total = len(selected)
+        offset = max(0, offset)
+        end = total if limit is None else min(total, offset + limit)
+        body = b"[" + b",".join(self.fragments[i] for i in selected[offset:end]) + b"]"
+        next_offset = end if end < total else None
+        return body, total, next_offset
+
+
+# Visões materializadas por (hash M3U, hash EPG, minuto de referência);
+# compartilhadas por todos os usuários que apontam para o mesmo conteúdo
+_VIEW_CACHE = LRUCache("catalog_view", max_bytes=CATALOG_VIEW_CACHE_MAX_BYTES, ttl=CATALOG_VIEW_TTL_SECONDS)
+_VIEW_BUCKET_SECONDS = 60
+_CHANNEL_FIELDS = ("name", "url", "tvg_id", "group", "logo")
+_EPG_FIELDS = ("id", "name", "icon")
+_PROGRAM_FIELDS = ("title", "description", "start", "stop")
+# Índices de busca por hash do M3U
+_INDEX_CACHE = LRUCache("catalog_index", max_bytes=CATALOG_VIEW_CACHE_MAX_BYTES, ttl=CATALOG_VIEW_TTL_SECONDS)
+# Overhead aproximado por canal indexado (ordens, ranks, grupos/categorias, objetos str)
+_INDEX_ITEM_BYTES = 200
+
+# Mesmas heurísticas da UI (classifyChannel) para live/movies/series
+_MOVIES_GROUP_RE = re.compile(r"(movie|filme|filmes|movies|cinema|vod)")
+_MOVIES_NAME_RE = re.compile(r"(filme|filmes|movie|cinema|vod)")
+_SERIES_GROUP_RE = re.compile(r"(series|serie|seriados|serial|seres)")
+_SERIES_NAME_RE = re.compile(r"(series|serie|episodio|temporada)")
+
+
+def _fold(s: Optional[str]) -> str:
+    # Minúsculas sem acentos (equivalente ao normalizeString da UI)
+    if not s:
+        return ""
+    decomposed = unicodedata.normalize("NFD", s)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
 
 
-async def get_enriched_channels(m3u_source: str, epg_source: str, force: bool = False) -> List[Dict[str, Any]]:
-    text = await load_m3u_text(m3u_source, force=force)
-    channels = parse_m3u(text)
+def classify_channel(name_folded: str, group_folded: str) -> str:
+    if _MOVIES_GROUP_RE.search(group_folded) or _MOVIES_NAME_RE.search(name_folded):
+        return "movies"
+    if _SERIES_GROUP_RE.search(group_folded) or _SERIES_NAME_RE.search(name_folded):
+        return "series"
+    return "live"
 
-    epg = await get_epg(epg_source)
-    epg_channels_raw: Dict[str, Dict[str, Any]] = epg.get("channels", {})
-    # Helpers de normalização
-    def _norm(s: Optional[str]) -> Optional[str]:
-        return s.strip().lower() if isinstance(s, str) else None
 
-    # Mapear por id case-insensitive e por nome normalizado (fallback)
-    epg_by_id = {k.lower(): v for k, v in epg_channels_raw.items()}
-    epg_by_name: Dict[str, Dict[str, Any]] = {}
-    for cid, info in epg_channels_raw.items():
-        nm = _norm(info.get("name"))
-        if nm:
-            epg_by_name[nm] = info
+def _norm(s: Optional[str]) -> Optional[str]:
+    return s.strip().lower() if isinstance(s, str) else None
+
+
+def _enrich(
+    channels: List[Channel],
+    epg: EPGData,
+    include_now: bool,
+    ref_time: Optional[datetime],
+) -> List[Dict[str, Any]]:
+    now_ts = 0.0
+    if include_now:
+        now = ref_time.astimezone(timezone.utc) if ref_time else datetime.now(timezone.utc)
+        now_ts = now.timestamp()
 
     enriched: List[Dict[str, Any]] = []
+    # Canais casados por id: now/next calculado em lote no fim
+    matched: List[int] = []
+    matched_keys: List[str] = []
     for ch in channels:
         tvg_id = ch.get("tvg_id")
         key = tvg_id.lower() if isinstance(tvg_id, str) else None
-        epg_info = epg_by_id.get(key) if key else None
-        if not epg_info:
+        # Associação por id case-insensitive
+        epg_info = epg.channels_by_key.get(key) if key else None
+        if epg_info is not None:
+            matched.append(len(enriched))
+            matched_keys.append(key)
+        else:
             # Fallback por nome quando tvg-id estiver ausente ou não casar
             name_norm = _norm(ch.get("name"))
             if name_norm:
-                epg_info = epg_by_name.get(name_norm)
-        item = {
-            **ch,
-            "epg": epg_info,  # pode ser None
-        }
+                epg_info = epg.channels_by_name.get(name_norm)
+        item = {k: ch.get(k) for k in _CHANNEL_FIELDS}
+        item["epg"] = epg_info  # pode ser None
+        if include_now:
+            item["current"] = None
+            item["next"] = None
         enriched.append(item)
+    if include_now and matched:
+        for pos, (current, upcoming) in zip(matched, now_next_all(epg, matched_keys, now_ts)):
+            enriched[pos]["current"] = current
+            enriched[pos]["next"] = upcoming
     return enriched
 
 
-async def get_now(m3u_source: str, epg_source: str, ref_time: Optional[datetime] = None) -> List[Dict[str, Any]]:
-    epg = await get_epg(epg_source)
-    channels_raw = epg.get("channels", {})
-    programs_raw = epg.get("programs", {})
-    channels = {k.lower(): v for k, v in channels_raw.items()}
-    programs = {k.lower(): v for k, v in programs_raw.items()}
+async def build_catalog(
+    m3u_source: str,
+    epg_source: str,
+    force: bool = False,
+    include_now: bool = False,
+    ref_time: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Canais do M3U enriquecidos com EPG (e current/next) em uma única passada."""
+    channels = await load_m3u_channels(m3u_source, force=force)
+    epg = await load_epg_data(epg_source)
+    # Enriquecimento (e a tabela de now/next, criada sob demanda) fora do event loop
+    return await run_cpu("catalog_enrich", _enrich, channels, epg, include_now, ref_time, stateful=True)
+
 
+async def get_now(m3u_source: str, epg_source: str, ref_time: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    epg = await load_epg_data(epg_source)
     now = ref_time.astimezone(timezone.utc) if ref_time else datetime.now(timezone.utc)
 
     # Carregar m3u para ordenar conforme a lista do usuário e mapear tvg_id
-    m3u_text = await load_m3u_text(m3u_source, force=False)
-    m3u_channels = parse_m3u(m3u_text)
+    m3u_channels = await load_m3u_channels(m3u_source, force=False)
+    # Consulta (e a tabela de now/next, criada sob demanda) fora do event loop
+    return await run_cpu("now_next", _now_items, m3u_channels, epg, now.timestamp(), stateful=True)
 
-    results: List[Dict[str, Any]] = []
+
+def _now_items(m3u_channels: List[Channel], epg: EPGData, now_ts: float) -> List[Dict[str, Any]]:
+    channels = epg.channels_by_key
+    rows: List[Tuple[Any, str]] = []
     for ch in m3u_channels:
         tvg_id = ch.get("tvg_id")
         key = tvg_id.lower() if isinstance(tvg_id, str) else None
         if not key or key not in channels:
             continue
-        plist = programs.get(key, [])
-        current = None
-        upcoming = None
-        for p in plist:
-            s = _to_dt(p.get("start"))
-            e = _to_dt(p.get("stop"))
-            if not s or not e:
-                continue
-            if s <= now < e:
-                current = p
-            if s > now and upcoming is None:
-                upcoming = p
-            if current and upcoming:
-                break
+        rows.append((ch, key))
 
+    results: List[Dict[str, Any]] = []
+    # now/next de todos os canais numa única consulta (vetorizada quando há NumPy)
+    for (ch, key), (current, upcoming) in zip(rows, now_next_all(epg, [k for _, k in rows], now_ts)):
         results.append(
             {
-                "tvg_id": tvg_id,
+                "tvg_id": ch.get("tvg_id"),
                 "name": ch.get("name"),
                 "logo": ch.get("logo") or channels.get(key, {}).get("icon"),
                 "current": current,
@@ -98,3 +263,80 @@ async def get_now(m3u_source: str, epg_source: str, ref_time: Optional[datetime]
         )
 
     return results
+
+
+def _pick(src: Optional[Dict[str, Any]], fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    if not src:
+        return None
+    return {k: src.get(k) for k in fields}
+
+
+def _serialize_item(it: Dict[str, Any]) -> Dict[str, Any]:
+    # Mesmo formato de EnrichedChannelResponse
+    out = {k: it.get(k) for k in _CHANNEL_FIELDS}
+    out["epg"] = _pick(it.get("epg"), _EPG_FIELDS)
+    out["current"] = _pick(it.get("current"), _PROGRAM_FIELDS)
+    out["next"] = _pick(it.get("next"), _PROGRAM_FIELDS)
+    return out
+
+
+async def get_catalog_view(
+    m3u_source: str,
+    epg_source: str,
+    force: bool = False,
+    include_now: bool = False,
+    ref_time: Optional[datetime] = None,
+) -> CatalogView:
+    """Catálogo enriquecido já serializado em JSON.
+
+    Recalcula apenas quando muda o conteúdo do M3U, do EPG ou o instante de
+    referência de current/next: "agora" é calculado no início do minuto; um
+    `ref_time` explícito é usado exato (mesmo resultado de /catalog/now).
+    """
+    entry = await load_m3u_entry(m3u_source, force=force)
+    epg = await load_epg_data(epg_source)
+    view_time: Optional[datetime] = None
+    moment: Optional[Tuple[str, float]] = None
+    if include_now:
+        if ref_time is not None:
+            view_time = ref_time.astimezone(timezone.utc)
+            moment = ("at", view_time.timestamp())
+        else:
+            bucket = int(datetime.now(timezone.utc).timestamp() // _VIEW_BUCKET_SECONDS)
+            view_time = datetime.fromtimestamp(bucket * _VIEW_BUCKET_SECONDS, tz=timezone.utc)
+            moment = ("minute", bucket)
+    key = (entry.content_hash, epg.content_hash, moment)
+    view: Optional[CatalogView] = _VIEW_CACHE.get(key)
+    if view is not None:
+        return view
+
+    channels = await channels_for_entry(m3u_source, entry)
+    index: Optional[ChannelIndex] = _INDEX_CACHE.get(entry.content_hash)
+    build_index = index is None
+    # Índice, enriquecimento e serialização fora do event loop
+    index, body, fragments = await run_cpu(
+        "catalog_view", _render_view, channels, epg, include_now, view_time, index, stateful=True
+    )
+    if build_index:
+        _INDEX_CACHE.set(entry.content_hash, index, size=index.estimated_size())
+    etag = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+    view = CatalogView(body=body, etag=etag, fragments=fragments, index=index)
+    _VIEW_CACHE.set(key, view, size=2 * len(body))
+    return view
+
+
+def _render_view(
+    channels: List[Channel],
+    epg: EPGData,
+    include_now: bool,
+    view_time: Optional[datetime],
+    index: Optional[ChannelIndex],
+) -> Tuple[ChannelIndex, bytes, List[bytes]]:
+    if index is None:
+        index = ChannelIndex(channels)
+    items = _enrich(channels, epg, include_now, view_time)
+    fragments = [
+        json.dumps(_serialize_item(it), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for it in items
+    ]
+    return index, b"[" + b",".join(fragments) + b"]", fragments
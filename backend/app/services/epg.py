@@ -1,23 +1,304 @@
 import asyncio
-import time
-from dataclasses import dataclass
-from datetime import datetime
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Collection, Dict, List, Optional, Tuple
+import xml.etree.ElementTree as ET
 
 import httpx
-import xmltodict
-from app.config import EPG_TTL_SECONDS, EPG_FETCH_RETRIES, FETCH_BACKOFF_SECONDS
+from app.config import (
+    EPG_TTL_SECONDS,
+    EPG_FETCH_RETRIES,
+    FETCH_BACKOFF_SECONDS,
+    EPG_CACHE_MAX_BYTES,
+    EPG_MAX_STALE_SECONDS,
+    EPG_INGEST_PROCESSES,
+    EPG_INGEST_MIN_BYTES,
+    SNAPSHOT_REFRESH_ON_START,
+)
+from app.services import epg_store, snapshot
+from app.services.cache import LRUCache
+from app.services.executor import ExecutorBusy, admit_cpu, cpu_executor, run_cpu
+from app.services.refresh import SourceNotModified, SourceValidators, StaleWhileRevalidate
+from app.services.singleflight import SingleFlight
+from app.services.xmltv_time import lookup_epoch, parse_xmltv_time
+
+
+# Horário ISO normalizado -> epoch, calculados juntos no parse do XMLTV
+Epochs = Dict[str, int]
+
+
+class ProgramIndex:
+    """Programas de um canal ordenados por início, com arrays numéricos (epoch).
+
+    Construído uma vez no carregamento do EPG, com os epochs já calculados no
+    parse (`epochs`); consultas de now/next usam busca binária e não fazem
+    parsing de datas.
+    """
+
+    __slots__ = ("starts", "stops", "max_stops", "items")
+
+    def __init__(self, programs: List[Dict[str, Any]], epochs: Optional[Epochs] = None):
+        rows = []
+        for p in programs:
+            s = lookup_epoch(p.get("start"), epochs)
+            e = lookup_epoch(p.get("stop"), epochs)
+            if s is None or e is None:
+                continue
+            rows.append((s, e, p))
+        rows.sort(key=lambda r: r[0])
+        self.starts = array("d", (r[0] for r in rows))
+        self.stops = array("d", (r[1] for r in rows))
+        self.items: List[Dict[str, Any]] = [r[2] for r in rows]
+        # Máximo acumulado dos fins: permite saber em O(1) se algum programa
+        # anterior ainda cobre o instante (grades com sobreposição)
+        self.max_stops = array("d")
+        running = float("-inf")
+        for e in self.stops:
+            running = e if e > running else running
+            self.max_stops.append(running)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def item(self, pos: int) -> Dict[str, Any]:
+        return self.items[pos]
+
+    def to_state(self, programs: List[Dict[str, Any]]) -> Tuple[bytes, bytes, bytes, bytes]:
+        # Arrays do índice + posição de cada item na lista de programas (snapshot)
+        position = {id(p): i for i, p in enumerate(programs)}
+        positions = array("q", (position[id(p)] for p in self.items))
+        return self.starts.tobytes(), self.stops.tobytes(), self.max_stops.tobytes(), positions.tobytes()
+
+    @classmethod
+    def from_state(cls, programs: List[Dict[str, Any]], state: Tuple[bytes, bytes, bytes, bytes]) -> "ProgramIndex":
+        index = cls.__new__(cls)
+        starts, stops, max_stops, positions = (array(code) for code in ("d", "d", "d", "q"))
+        starts.frombytes(state[0])
+        stops.frombytes(state[1])
+        max_stops.frombytes(state[2])
+        positions.frombytes(state[3])
+        index.starts, index.stops, index.max_stops = starts, stops, max_stops
+        index.items = [programs[i] for i in positions]
+        return index
+
+    def now_next(self, ts: float) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        i = bisect_right(self.starts, ts)
+        upcoming = self.items[i] if i < len(self.items) else None
+        current = None
+        j = i - 1
+        if j >= 0 and self.max_stops[j] > ts:
+            # Programa de início mais recente que ainda cobre o instante
+            while j >= 0:
+                if self.stops[j] > ts:
+                    current = self.items[j]
+                    break
+                j -= 1
+        return current, upcoming
 
 
 @dataclass
-class EPGCache:
-    content: Optional[Dict[str, Any]] = None
-    ts: float = 0.0
+class EPGData:
+    channels: Dict[str, Dict[str, Any]]
+    programs: Dict[str, List[Dict[str, Any]]]
+    # Índices por id de canal em minúsculas (associação case-insensitive)
+    channels_by_key: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Nome normalizado (lowercase/trim) -> canal, usado como fallback
+    channels_by_name: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    index: Dict[str, ProgramIndex] = field(default_factory=dict)
+    # SHA-256 do XMLTV de origem (identifica o conteúdo para caches derivados)
+    content_hash: str = ""
+    # ETag/Last-Modified da fonte remota, reenviados como GET condicional
+    validators: Optional[SourceValidators] = None
+    # Epochs do parse (vazio quando restaurado de snapshot ou lido do guia compilado)
+    epochs: Epochs = field(default_factory=dict, repr=False, compare=False)
+    # Guia compilado em mmap (EPG_STORE_DIR): `programs`/`index` leem do arquivo
+    store: Optional[epg_store.EPGStore] = None
+    # Tabela vetorizada de now/next (NumPy), criada sob demanda
+    now_next_table: Optional[Any] = field(default=None, repr=False, compare=False)
+    # JSON pré-serializado para /catalog/epg (EPGFragments): sob demanda em memória,
+    # ou fatias do arquivo mapeado com o guia compilado
+    fragments: Optional["EPGFragments"] = field(default=None, repr=False, compare=False)
+
+
+def _build_epg_data(
+    channels: Dict[str, Dict[str, Any]],
+    programs: Dict[str, List[Dict[str, Any]]],
+    content_hash: str = "",
+    validators: Optional[SourceValidators] = None,
+    index_state: Optional[Dict[str, Tuple[bytes, bytes, bytes, bytes]]] = None,
+    epochs: Optional[Epochs] = None,
+) -> EPGData:
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for info in channels.values():
+        nm = info.get("name")
+        if isinstance(nm, str) and nm.strip():
+            by_name[nm.strip().lower()] = info
+    return EPGData(
+        channels=channels,
+        programs=programs,
+        channels_by_key={k.lower(): v for k, v in channels.items()},
+        channels_by_name=by_name,
+        content_hash=content_hash,
+        validators=validators,
+        epochs=epochs or {},
+        index={
+            k.lower(): ProgramIndex(v, epochs) if index_state is None else ProgramIndex.from_state(v, index_state[k])
+            for k, v in programs.items()
+        },
+    )
+
+
+class EPGFragments:
+    """Guia pré-serializado em JSON para montar respostas de /catalog/epg.
+
+    Cada canal tem os programas serializados num blob (`{p0},{p1},...`) com
+    a tabela de offsets de cada item e os instantes (epoch) de início/fim.
+    Filtros e paginação viram uma busca binária e uma fatia do blob; o mesmo
+    vale para recortes por dia ou qualquer janela. O formato é idêntico ao do
+    `JSONResponse` (sem espaços, UTF-8). Com o guia compilado (`from_store`),
+    blobs e colunas são fatias do arquivo mapeado, sem cópia no processo.
+    """
+
+    __slots__ = ("channels", "keys", "blobs", "offsets", "starts", "stops", "contiguous", "size")
+
+    def __init__(
+        self,
+        channels: Dict[str, Dict[str, Any]],
+        programs: Dict[str, List[Dict[str, Any]]],
+        epochs: Optional[Epochs] = None,
+    ):
+        self.channels = epg_store.json_bytes(channels)
+        self.keys: List[bytes] = []
+        self.blobs: List[Any] = []
+        # Offsets de cada item no blob (n + 1 entradas; vírgula separadora após cada item)
+        self.offsets: List[Any] = []
+        self.starts: List[Any] = []
+        self.stops: List[Any] = []
+        # Canal com todos os programas datados e inícios/fins não decrescentes:
+        # os programas de qualquer janela formam um intervalo contíguo
+        self.contiguous: List[bool] = []
+        size = len(self.channels)
+        for cid, lst in programs.items():
+            parts = [epg_store.json_bytes(p) for p in lst]
+            offsets = array("q", [0])
+            for part in parts:
+                offsets.append(offsets[-1] + len(part) + 1)
+            starts = array("q", (_epoch_or_missing(p.get("start"), epochs) for p in lst))
+            stops = array("q", (_epoch_or_missing(p.get("stop"), epochs) for p in lst))
+            blob = b",".join(parts)
+            self.keys.append(epg_store.json_bytes(cid))
+            self.blobs.append(blob)
+            self.offsets.append(offsets)
+            self.starts.append(starts)
+            self.stops.append(stops)
+            self.contiguous.append(epg_store.is_contiguous(starts, stops))
+            size += len(blob) + 24 * (len(lst) + 1) + _ITEM_OVERHEAD_BYTES
+        self.size = size
+
+    @classmethod
+    def from_store(cls, store: epg_store.EPGStore, channels: Dict[str, Dict[str, Any]]) -> "EPGFragments":
+        fragments = cls.__new__(cls)
+        fragments.channels = epg_store.json_bytes(channels)
+        fragments.keys, fragments.blobs, fragments.offsets = [], [], []
+        fragments.starts, fragments.stops, fragments.contiguous = [], [], []
+        size = len(fragments.channels)
+        for ch in range(store.channel_count):
+            blob, offsets = store.program_json(ch)
+            fragments.keys.append(epg_store.json_bytes(store.channel_id(ch)))
+            fragments.blobs.append(blob)
+            fragments.offsets.append(offsets)
+            fragments.starts.append(store.program_columns(ch, "p_start"))
+            fragments.stops.append(store.program_columns(ch, "p_stop"))
+            fragments.contiguous.append(store.is_contiguous(ch))
+            # Só as chaves e as referências ficam no processo; o resto está no arquivo
+            size += len(fragments.keys[-1]) + _ITEM_OVERHEAD_BYTES
+        fragments.size = size
+        return fragments
+
+    def _slice(self, c: int, a: int, b: int) -> Any:
+        if a >= b:
+            return b""
+        offsets = self.offsets[c]
+        return self.blobs[c][offsets[a]:offsets[b] - 1]
+
+    def _select(self, c: int, start_ts: Optional[float], end_ts: Optional[float]) -> Any:
+        # Programas datados que se sobrepõem a [start, end)
+        starts, stops = self.starts[c], self.stops[c]
+        if self.contiguous[c]:
+            a = bisect_right(stops, start_ts) if start_ts is not None else 0
+            b = bisect_left(starts, end_ts) if end_ts is not None else len(starts)
+            return range(a, max(a, b))
+        missing = epg_store.NO_TIME
+        return [
+            i
+            for i in range(len(starts))
+            if starts[i] != missing
+            and stops[i] != missing
+            and (start_ts is None or stops[i] > start_ts)
+            and (end_ts is None or starts[i] < end_ts)
+        ]
+
+    def render(
+        self,
+        start_ts: Optional[float],
+        end_ts: Optional[float],
+        limit_per_channel: Optional[int],
+        offset_per_channel: int,
+    ) -> bytes:
+        """Corpo JSON de /catalog/epg para a janela/paginação informadas."""
+        filtered = start_ts is not None or end_ts is not None or limit_per_channel is not None or offset_per_channel
+        end_idx = offset_per_channel + limit_per_channel if limit_per_channel is not None else None
+        out = [b'{"channels":', self.channels, b',"programs":{']
+        for c, key in enumerate(self.keys):
+            if c:
+                out.append(b",")
+            out.append(key)
+            out.append(b":[")
+            if not filtered:
+                out.append(self._slice(c, 0, len(self.offsets[c]) - 1))
+            else:
+                rows = self._select(c, start_ts, end_ts)[offset_per_channel:end_idx]
+                if isinstance(rows, range):
+                    out.append(self._slice(c, rows.start, rows.stop))
+                else:
+                    out.append(b",".join(self._slice(c, i, i + 1) for i in rows))
+            out.append(b"]")
+        out.append(b"}}")
+        return b"".join(out)
+
+
+def _epoch_or_missing(iso_str: Optional[str], epochs: Optional[Epochs]) -> int:
+    # Epoch inteiro (mesmo critério do guia compilado); NO_TIME se sem horário válido
+    ts = lookup_epoch(iso_str, epochs)
+    return epg_store.NO_TIME if ts is None else int(ts)
+
 
+# (channels, programs, hash do conteúdo bruto, epochs dos horários)
+ParsedXMLTV = Tuple[Dict[str, Dict[str, Any]], Dict[str, List[Dict[str, Any]]], str, Epochs]
+# ParsedXMLTV + validadores HTTP da fonte
+ParsedEPG = Tuple[Dict[str, Dict[str, Any]], Dict[str, List[Dict[str, Any]]], str, Epochs, Optional[SourceValidators]]
 
-_CACHE = EPGCache()
+# Cache por fonte com a estrutura já normalizada (não o dict bruto do XMLTV)
 _TTL_SECONDS = float(EPG_TTL_SECONDS)
+_CACHE = LRUCache("epg", max_bytes=EPG_CACHE_MAX_BYTES, ttl=_TTL_SECONDS)
+_FLIGHT = SingleFlight("epg")
+_FRAGMENT_FLIGHT = SingleFlight("epg_fragments")
+_SWR = StaleWhileRevalidate("epg", max_stale=EPG_MAX_STALE_SECONDS)
+# Overhead aproximado por canal/programa normalizado (dict + chaves)
+_ITEM_OVERHEAD_BYTES = 400
+# Entrada da tabela de epochs (a string ISO é a mesma dos programas)
+_EPOCH_ENTRY_BYTES = 100
+# Tamanho dos blocos lidos/baixados ao alimentar o parser incremental
+_CHUNK_SIZE = 1024 * 1024
+# Blocos por processo na ingestão paralela (equilibra programas de tamanhos diferentes)
+_INGEST_CHUNKS_PER_PROCESS = 2
 
 
 def _backend_base_dir() -> Path:
@@ -25,34 +306,131 @@ def _backend_base_dir() -> Path:
     return Path(__file__).resolve().parents[2]
 
 
-def _parse_xmltv_time(value: str) -> Optional[str]:
-    if not value:
-        return None
-    value = value.strip()
-    # Common XMLTV formats: YYYYmmddHHMMSS Z, or without timezone
-    fmts = ["%Y%m%d%H%M%S %z", "%Y%m%d%H%M%S"]
-    for fmt in fmts:
+class XMLTVStreamParser:
+    """Parser incremental de XMLTV.
+
+    Recebe o documento em blocos (`feed`) e converte cada `<channel>` e
+    `<programme>` direto para a estrutura normalizada, descartando os
+    elementos já processados. O pico de memória acompanha o resultado,
+    não o tamanho do XML.
+    """
+
+    def __init__(self) -> None:
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root: Optional[ET.Element] = None
+        self._depth = 0
+        self._hash = hashlib.sha256()
+        self.channels: Dict[str, Dict[str, Any]] = {}
+        self.programs: Dict[str, List[Dict[str, Any]]] = {}
+        # Horários brutos já convertidos: o fim de um programa costuma ser o
+        # início do seguinte, e a grade se repete entre canais
+        self._times: Dict[Optional[str], Optional[str]] = {}
+        # Epoch de cada ISO gerado, calculado no mesmo parse (índices não reconvertem)
+        self.epochs: Epochs = {}
+
+    @property
+    def content_hash(self) -> str:
+        # SHA-256 do documento bruto recebido até aqui
+        return self._hash.hexdigest()
+
+    def feed(self, data: bytes) -> None:
+        self._hash.update(data)
+        self._parser.feed(data)
+        self._drain()
+
+    def close(self) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+        self._parser.close()
+        self._drain()
+        # Ordenar programas por início quando possível
+        for lst in self.programs.values():
+            lst.sort(key=lambda x: (x.get("start") or ""))
+        return self.channels, self.programs
+
+    def _drain(self) -> None:
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                if self._depth == 0:
+                    self._root = elem
+                self._depth += 1
+                continue
+            self._depth -= 1
+            if self._depth != 1:
+                continue
+            # Filho direto de <tv> concluído
+            if elem.tag == "channel":
+                self._add_channel(elem)
+            elif elem.tag == "programme":
+                self._add_programme(elem)
+            if self._root is not None:
+                self._root.clear()
+
+    def _add_channel(self, elem: ET.Element) -> None:
+        cid = elem.get("id")
+        if not cid:
+            return
+        icon_el = elem.find("icon")
+        self.channels[cid] = {
+            "id": cid,
+            "name": _child_text(elem, "display-name"),
+            "icon": icon_el.get("src") if icon_el is not None else None,
+        }
+        self.programs.setdefault(cid, [])
+
+    def _add_programme(self, elem: ET.Element) -> None:
+        cid = elem.get("channel")
+        if not cid:
+            return
+        item = {
+            "title": _child_text(elem, "title"),
+            "description": _child_text(elem, "desc"),
+            "start": self._time(elem.get("start")),
+            "stop": self._time(elem.get("stop")),
+        }
+        self.programs.setdefault(cid, []).append(item)
+
+    def _time(self, raw: Optional[str]) -> Optional[str]:
         try:
-            dt = datetime.strptime(value, fmt)
-            # Quando sem timezone, considerar UTC
-            if dt.tzinfo is None:
-                return dt.isoformat() + "Z"
-            return dt.isoformat()
-        except Exception:
-            continue
-    return None
+            return self._times[raw]
+        except KeyError:
+            parsed = parse_xmltv_time(raw)
+            if parsed is None:
+                self._times[raw] = None
+                return None
+            iso, self.epochs[iso] = parsed
+            self._times[raw] = iso
+            return iso
+
+
+def _child_text(elem: ET.Element, tag: str) -> Optional[str]:
+    # Primeiro filho com a tag; texto sem espaços nas pontas (None se vazio)
+    child = elem.find(tag)
+    if child is None or child.text is None:
+        return None
+    text = child.text.strip()
+    return text or None
 
 
-async def _fetch_remote(url: str) -> str:
+async def _fetch_remote(
+    url: str,
+    validators: Optional[SourceValidators],
+    consume: Callable[[httpx.Response], Awaitable[Any]],
+) -> Tuple[Any, Optional[SourceValidators]]:
+    # GET (condicional, com retries) entregando o corpo a `consume`
+    headers = validators.request_headers() if validators is not None else {}
     attempts = max(1, int(EPG_FETCH_RETRIES))
     backoff = float(FETCH_BACKOFF_SECONDS)
     last_err: Optional[Exception] = None
     async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
         for i in range(attempts):
             try:
-                resp = await client.get(url)
-                resp.raise_for_status()
-                return resp.text
+                async with client.stream("GET", url, headers=headers) as resp:
+                    if resp.status_code == 304 and headers:
+                        raise SourceNotModified(url)
+                    resp.raise_for_status()
+                    return await consume(resp), SourceValidators.from_headers(resp.headers)
+            except (SourceNotModified, ExecutorBusy):
+                # 304 ou executor cheio: não é falha de rede, não repete o download
+                raise
             except Exception as e:
                 last_err = e
                 if i < attempts - 1:
@@ -61,113 +439,426 @@ async def _fetch_remote(url: str) -> str:
                     raise last_err
 
 
-def _read_local(path_like: str) -> str:
-    base = _backend_base_dir()
-    candidate = (base / path_like).resolve()
-    if not candidate.exists():
-        raise FileNotFoundError(str(candidate))
-    return candidate.read_text(encoding="utf-8")
-
-
-async def load_xmltv(source: str) -> Dict[str, Any]:
-    now = time.time()
-    if _CACHE.content and (now - _CACHE.ts) < _TTL_SECONDS:
-        return _CACHE.content
-
-    if source.startswith("http://") or source.startswith("https://"):
-        raw = await _fetch_remote(source)
-    else:
-        raw = _read_local(source)
-
-    data = xmltodict.parse(raw)
-    _CACHE.content = data
-    _CACHE.ts = now
-    return data
+async def _parse_response(resp: httpx.Response) -> ParsedXMLTV:
+    if _parallel_ingest_enabled():
+        # Ingestão paralela precisa de acesso aleatório: baixa para arquivo temporário
+        return await _ingest_download(resp)
+    # Admitido uma vez na fila do executor: os blocos seguintes não são recusados no meio do download
+    admit_cpu("epg_parse")
+    parser = XMLTVStreamParser()
+    async for chunk in resp.aiter_bytes(_CHUNK_SIZE):
+        # Parse de cada bloco fora do event loop (parser com estado: sempre em thread)
+        await run_cpu("epg_parse", parser.feed, chunk, stateful=True, admitted=True)
+    channels, programs = await run_cpu("epg_parse", parser.close, stateful=True, admitted=True)
+    return channels, programs, parser.content_hash, parser.epochs
 
 
-def _normalize_epg(data: Dict[str, Any]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
-    tv = data.get("tv", {}) if isinstance(data, dict) else {}
-    channels_src = tv.get("channel", [])
-    progs_src = tv.get("programme", [])
+async def _parse_remote(url: str, validators: Optional[SourceValidators] = None) -> ParsedEPG:
+    (channels, programs, content_hash, epochs), fresh_validators = await _fetch_remote(url, validators, _parse_response)
+    return channels, programs, content_hash, epochs, fresh_validators
 
-    # Garantir listas
-    if isinstance(channels_src, dict):
-        channels_src = [channels_src]
-    if isinstance(progs_src, dict):
-        progs_src = [progs_src]
 
+def _resolve_local(path_like: str) -> Path:
+    base = _backend_base_dir()
+    candidate = (base / path_like).resolve()
+    if not candidate.exists():
+        raise FileNotFoundError(str(candidate))
+    return candidate
+
+
+def _parse_path(path: Path) -> ParsedXMLTV:
+    parser = XMLTVStreamParser()
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    channels, programs = parser.close()
+    return channels, programs, parser.content_hash, parser.epochs
+
+
+def _parse_local(path_like: str) -> ParsedEPG:
+    channels, programs, content_hash, epochs = _parse_path(_resolve_local(path_like))
+    return channels, programs, content_hash, epochs, None
+
+
+def _parallel_ingest_enabled() -> bool:
+    return EPG_INGEST_PROCESSES > 1
+
+
+async def _spool(resp: httpx.Response) -> Path:
+    # Corpo da resposta num arquivo temporário (removido por quem chamou)
+    fd, tmp_name = tempfile.mkstemp(prefix="xmltv-", suffix=".xml")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in resp.aiter_bytes(_CHUNK_SIZE):
+                # Escrita em disco numa thread: não bloqueia o event loop
+                await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        _unlink(Path(tmp_name))
+        raise
+    return Path(tmp_name)
+
+
+def _unlink(path: Path) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+async def _ingest_download(resp: httpx.Response) -> ParsedXMLTV:
+    path = await _spool(resp)
+    try:
+        return await _ingest_file(path)
+    finally:
+        _unlink(path)
+
+
+async def _ingest_file(path: Path) -> ParsedXMLTV:
+    if not _parallel_ingest_enabled() or path.stat().st_size < EPG_INGEST_MIN_BYTES:
+        return await run_cpu("epg_parse", _parse_path, path)
+    processes = EPG_INGEST_PROCESSES
+    ranges, declaration, content_hash = await run_cpu(
+        "epg_parse", _plan_ingest, path, processes * _INGEST_CHUNKS_PER_PROCESS
+    )
+    last = len(ranges) - 1
+    jobs = []
+    for i, (start, end) in enumerate(ranges):
+        # Cada bloco vira um documento <tv> válido: o primeiro já traz o cabeçalho
+        # original, o último já traz o fechamento
+        prefix = b"" if i == 0 else declaration + b"<tv>"
+        suffix = b"" if i == last else b"</tv>"
+        jobs.append((str(path), start, end, prefix, suffix))
+    try:
+        parts = await cpu_executor.map_processes("epg_ingest", _parse_range, jobs, processes)
+    except ET.ParseError:
+        # Documento que não pode ser dividido (ex.: entidades no DOCTYPE): parse sequencial
+        return await run_cpu("epg_parse", _parse_path, path)
+    channels, programs, epochs = await run_cpu("epg_parse", _merge_parts, parts, stateful=True)
+    return channels, programs, content_hash, epochs
+
+
+def _plan_ingest(path: Path, chunks: int) -> Tuple[List[Tuple[int, int]], bytes, str]:
+    """Faixas de bytes iniciadas em `<programme`, declaração XML e SHA-256 do arquivo."""
+    size = path.stat().st_size
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        head = f.read(4096)
+        f.seek(0)
+        while True:
+            block = f.read(_CHUNK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+        bounds = [0]
+        for i in range(1, max(1, chunks)):
+            pos = _next_programme(f, max(size * i // chunks, bounds[-1] + 1))
+            if pos is None:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    declaration = b""
+    if head.startswith(b"\xef\xbb\xbf"):
+        head = head[3:]
+    if head.startswith(b"<?xml"):
+        end = head.find(b"?>")
+        if end != -1:
+            declaration = head[: end + 2]
+    ranges = [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+    return ranges, declaration, digest.hexdigest()
+
+
+def _next_programme(f: Any, offset: int) -> Optional[int]:
+    # Próxima abertura de <programme> a partir de `offset` (None se não houver)
+    marker = b"<programme"
+    f.seek(offset)
+    carry = b""
+    base = offset
+    while True:
+        block = f.read(_CHUNK_SIZE)
+        if not block:
+            return None
+        data = carry + block
+        pos = data.find(marker)
+        while pos != -1:
+            after = data[pos + len(marker): pos + len(marker) + 1]
+            if not after:
+                break
+            if after in (b" ", b">", b"\t", b"\r", b"\n", b"/"):
+                return base + pos
+            pos = data.find(marker, pos + 1)
+        # Mantém o fim do bloco para não perder um marcador partido
+        keep = len(marker)
+        base += len(data) - keep
+        carry = data[-keep:]
+
+
+def _parse_range(
+    path: str, start: int, end: int, prefix: bytes, suffix: bytes
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[Dict[str, Any]]], Epochs]:
+    # Roda em processo separado: normaliza um bloco do XMLTV
+    parser = XMLTVStreamParser()
+    parser.feed(prefix)
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            parser.feed(chunk)
+    parser.feed(suffix)
+    channels, programs = parser.close()
+    return channels, programs, parser.epochs
+
+
+def _merge_parts(
+    parts: List[Tuple[Dict[str, Dict[str, Any]], Dict[str, List[Dict[str, Any]]], Epochs]],
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[Dict[str, Any]]], Epochs]:
+    # Mesma ordem/estrutura do parse sequencial: blocos em ordem de documento e
+    # merge estável das listas (já ordenadas por início em cada bloco)
     channels: Dict[str, Dict[str, Any]] = {}
+    pieces: Dict[str, List[List[Dict[str, Any]]]] = {}
+    epochs: Epochs = {}
+    for part_channels, part_programs, part_epochs in parts:
+        channels.update(part_channels)
+        epochs.update(part_epochs)
+        for cid, lst in part_programs.items():
+            pieces.setdefault(cid, []).append(lst)
     programs: Dict[str, List[Dict[str, Any]]] = {}
-
-    for ch in channels_src:
-        cid = ch.get("@id")
-        if not cid:
-            continue
-        display = ch.get("display-name")
-        if isinstance(display, list):
-            display_name = display[0].get("#text") if isinstance(display[0], dict) else str(display[0])
-        elif isinstance(display, dict):
-            display_name = display.get("#text")
+    for cid, lists in pieces.items():
+        if len(lists) == 1:
+            programs[cid] = lists[0]
         else:
-            display_name = display
+            programs[cid] = list(heapq.merge(*lists, key=lambda x: (x.get("start") or "")))
+    return channels, programs, epochs
 
-        icon = None
-        icon_field = ch.get("icon")
-        if isinstance(icon_field, dict):
-            icon = icon_field.get("@src")
-        elif isinstance(icon_field, list) and icon_field:
-            icon = icon_field[0].get("@src") if isinstance(icon_field[0], dict) else None
 
-        channels[cid] = {"id": cid, "name": display_name, "icon": icon}
-        programs[cid] = []
-
-    for p in progs_src:
-        cid = p.get("@channel")
-        if not cid:
-            continue
-        title_field = p.get("title")
-        if isinstance(title_field, dict):
-            title = title_field.get("#text")
-        elif isinstance(title_field, list) and title_field:
-            title = title_field[0].get("#text") if isinstance(title_field[0], dict) else str(title_field[0])
-        else:
-            title = title_field
-
-        desc_field = p.get("desc")
-        if isinstance(desc_field, dict):
-            description = desc_field.get("#text")
-        elif isinstance(desc_field, list) and desc_field:
-            description = desc_field[0].get("#text") if isinstance(desc_field[0], dict) else str(desc_field[0])
+async def parse_xmltv_source(source: str, validators: Optional[SourceValidators] = None) -> ParsedEPG:
+    """Baixa/lê e normaliza o XMLTV; levanta SourceNotModified se a fonte responder 304."""
+    if source.startswith("http://") or source.startswith("https://"):
+        return await _parse_remote(source, validators)
+    if _parallel_ingest_enabled():
+        channels, programs, content_hash, epochs = await _ingest_file(_resolve_local(source))
+        return channels, programs, content_hash, epochs, None
+    # Leitura + parse completos num worker (thread ou processo)
+    return await run_cpu("epg_parse", _parse_local, source)
+
+
+def _estimate_size(channels: Dict[str, Dict[str, Any]], programs: Dict[str, List[Dict[str, Any]]]) -> int:
+    # Estimativa grosseira: overhead por item + tamanho das strings
+    total = 0
+    for info in channels.values():
+        total += _ITEM_OVERHEAD_BYTES + sum(len(v) for v in info.values() if isinstance(v, str))
+    for lst in programs.values():
+        for p in lst:
+            total += _ITEM_OVERHEAD_BYTES + sum(len(v) for v in p.values() if isinstance(v, str))
+    return total
+
+
+async def load_epg_data(source: str, force: bool = False) -> EPGData:
+    """EPG normalizado da fonte; a normalização roda uma vez por atualização do cache."""
+    # Cache -> (stale-while-revalidate) -> download/parse coalescido
+    return await _SWR.load(_CACHE, _FLIGHT, source, lambda: _refresh_epg(source, force=force), force=force)
+
+
+def epg_data_age(source: str) -> Optional[float]:
+    """Segundos desde a última atualização do guia (None se nunca carregado)."""
+    return _SWR.age(_CACHE, source)
+
+
+async def _refresh_epg(source: str, force: bool = False) -> EPGData:
+    cached = _CACHE.peek(source)
+    previous: Optional[EPGData] = cached.value if cached is not None else None
+    # Recarga forçada: GET incondicional (um 304 manteria a versão em cache)
+    previous_validators = previous.validators if previous is not None and not force else None
+    try:
+        if epg_store.enabled():
+            data, size = await _refresh_store(source, previous_validators)
         else:
-            description = desc_field
-
-        start = _parse_xmltv_time(p.get("@start"))
-        stop = _parse_xmltv_time(p.get("@stop"))
-
-        item = {
-            "title": title,
-            "description": description,
-            "start": start,
-            "stop": stop,
-        }
-        programs.setdefault(cid, []).append(item)
+            channels, programs, content_hash, epochs, validators = await parse_xmltv_source(source, previous_validators)
+            data, size = await run_cpu(
+                "epg_index", _index_epg, channels, programs, content_hash, epochs, validators, stateful=True
+            )
+    except SourceNotModified:
+        # 304: renova o TTL sem baixar nem parsear o guia novamente
+        snapshot.touch("epg", source)
+        if not _CACHE.touch(source):
+            _CACHE.set(source, previous, size=cached.size)
+        return previous
+    _CACHE.set(source, data, size=size)
+    snapshot.save_in_background("epg", source, data.content_hash, lambda: _snapshot_data(data))
+    return data
 
-    # Ordenar programas por início quando possível
-    for cid, lst in programs.items():
-        lst.sort(key=lambda x: (x.get("start") or ""))
 
-    return channels, programs
+def _snapshot_data(data: EPGData) -> Tuple[Any, ...]:
+    # Guia normalizado + arrays dos índices, para restaurar sem reparsear datas
+    v = data.validators
+    if data.store is not None:
+        # Guia compilado já está em disco: o snapshot só aponta para o arquivo
+        return (
+            "store",
+            v.etag if v is not None else None,
+            v.last_modified if v is not None else None,
+        )
+    index_state = {}
+    for cid, lst in data.programs.items():
+        index = data.index.get(cid.lower())
+        index_state[cid] = (index if index is not None else ProgramIndex(lst, data.epochs)).to_state(lst)
+    return (
+        data.channels,
+        data.programs,
+        index_state,
+        v.etag if v is not None else None,
+        v.last_modified if v is not None else None,
+    )
+
+
+def _data_from_snapshot(snap: snapshot.Snapshot) -> Tuple[EPGData, int]:
+    if snap.data[0] == "store":
+        _, etag, last_modified = snap.data
+        validators = SourceValidators(etag, last_modified) if (etag or last_modified) else None
+        store = epg_store.EPGStore(epg_store.store_path(snap.content_hash))
+        return _data_from_store(store, validators)
+    channels, programs, index_state, etag, last_modified = snap.data
+    validators = SourceValidators(etag, last_modified) if (etag or last_modified) else None
+    data = _build_epg_data(channels, programs, snap.content_hash, validators, index_state)
+    return data, _estimate_size(channels, programs)
+
+
+async def restore_snapshots(refresh_sources: Collection[str] = ()) -> int:
+    """Carrega no cache os guias gravados em snapshot (startup); devolve quantos.
+
+    Só as fontes em `refresh_sources` (as configuradas) são atualizadas em segundo plano.
+    """
+    restored = 0
+    for snap in await snapshot.load_snapshots("epg"):
+        if snap.source in _CACHE:
+            continue
+        try:
+            data, size = await run_cpu("snapshot_load", _data_from_snapshot, snap, stateful=True)
+        except (OSError, ValueError):
+            # Guia compilado removido/incompatível: a fonte é carregada sob demanda
+            continue
+        # Expira relativo a quando foi salvo: snapshot antigo cai no stale-while-revalidate
+        _CACHE.set(snap.source, data, size=size, ts=snap.saved_at, ttl=snap.remaining_ttl(_CACHE.ttl))
+        restored += 1
+        if SNAPSHOT_REFRESH_ON_START and snap.source in refresh_sources:
+            _SWR.refresh_in_background(_FLIGHT, snap.source, lambda s=snap.source: _refresh_epg(s))
+    return restored
+
+
+def _index_epg(
+    channels: Dict[str, Dict[str, Any]],
+    programs: Dict[str, List[Dict[str, Any]]],
+    content_hash: str,
+    epochs: Epochs,
+    validators: Optional[SourceValidators],
+) -> Tuple[EPGData, int]:
+    # Índices de busca/now-next e tamanho estimado, numa única tarefa do executor
+    data = _build_epg_data(channels, programs, content_hash, validators, epochs=epochs)
+    return data, _estimate_size(channels, programs) + _EPOCH_ENTRY_BYTES * len(epochs)
+
+
+def _data_from_store(store: epg_store.EPGStore, validators: Optional[SourceValidators]) -> Tuple[EPGData, int]:
+    programs = epg_store.StorePrograms(store)
+    channels = programs.channels()
+    data = _build_epg_data(channels, {}, store.content_hash, validators)
+    # Programas e índices ficam no arquivo mapeado (compartilhado entre workers);
+    # o cache do processo só guarda canais e os objetos de acesso
+    data.programs = programs
+    data.index = programs.indexes()
+    data.store = store
+    # JSON de /catalog/epg também lido do arquivo (sem cópia privada por worker)
+    data.fragments = EPGFragments.from_store(store, channels)
+    return data, _estimate_size(channels, {}) + _ITEM_OVERHEAD_BYTES * len(programs) + data.fragments.size
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while True:
+            block = f.read(_CHUNK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _open_store(path: Path) -> Optional[epg_store.EPGStore]:
+    # Arquivo já compilado (por este ou outro worker); None se ausente/incompatível
+    try:
+        store = epg_store.EPGStore(path)
+    except (OSError, ValueError):
+        return None
+    try:
+        # Marca como em uso para a limpeza de arquivos antigos
+        os.utime(path)
+    except OSError:
+        pass
+    return store
+
+
+async def _load_store(path: Path) -> epg_store.EPGStore:
+    """Abre o guia compilado do XMLTV em `path`, compilando apenas se ainda não existir."""
+    content_hash = await run_cpu("epg_hash", _file_sha256, path)
+    target = epg_store.store_path(content_hash)
+    store = await run_cpu("epg_store", _open_store, target, stateful=True)
+    if store is not None:
+        return store
+    channels, programs, content_hash, epochs = await _ingest_file(path)
+    await run_cpu("epg_store", epg_store.compile_store, target, channels, programs, content_hash, epochs)
+    await run_cpu("epg_store", epg_store.prune, target)
+    return await run_cpu("epg_store", epg_store.EPGStore, target, stateful=True)
+
+
+async def _refresh_store(source: str, validators: Optional[SourceValidators]) -> Tuple[EPGData, int]:
+    if source.startswith("http://") or source.startswith("https://"):
+        path, validators = await _fetch_remote(source, validators, _spool)
+        try:
+            store = await _load_store(path)
+        finally:
+            _unlink(path)
+    else:
+        store = await _load_store(_resolve_local(source))
+        validators = None
+    return await run_cpu("epg_index", _data_from_store, store, validators, stateful=True)
 
 
 async def get_epg(source: str) -> Dict[str, Any]:
-    data = await load_xmltv(source)
-    channels, programs = _normalize_epg(data)
-    return {"channels": channels, "programs": programs}
+    data = await load_epg_data(source)
+    programs = data.programs
+    if not isinstance(programs, dict):
+        # Guia compilado: materializa todos os canais (resposta completa)
+        programs = await run_cpu("epg_store", dict, programs, stateful=True)
+    return {"channels": data.channels, "programs": programs}
+
+
+async def load_epg_fragments(source: str) -> EPGFragments:
+    """JSON pré-serializado do guia atual; montado uma vez por versão do guia."""
+    data = await load_epg_data(source)
+    if data.fragments is not None:
+        return data.fragments
+    fragments = await _FRAGMENT_FLIGHT.do(
+        (source, data.content_hash),
+        lambda: run_cpu("epg_fragments", EPGFragments, data.channels, data.programs, data.epochs, stateful=True),
+    )
+    if data.fragments is None:
+        data.fragments = fragments
+        cached = _CACHE.peek(source)
+        if cached is not None and cached.value is data:
+            _CACHE.resize(source, cached.size + fragments.size)
+    return data.fragments
 
 
 async def get_channel_epg(source: str, channel_id: str) -> Dict[str, Any]:
-    epg = await get_epg(source)
-    channel = epg["channels"].get(channel_id)
+    # Lê só o canal pedido (no guia compilado, direto do arquivo mapeado)
+    data = await load_epg_data(source)
+    channel = data.channels.get(channel_id)
     if not channel:
         return {"channel": None, "programs": []}
-    return {"channel": channel, "programs": epg["programs"].get(channel_id, [])}
+    return {"channel": channel, "programs": data.programs.get(channel_id, [])}
@@ -0,0 +1,359 @@
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config import EPG_STORE_DIR, EPG_STORE_RETENTION_SECONDS
+from app.services.xmltv_time import lookup_epoch
+
+
+# Guia normalizado compilado num arquivo colunar somente leitura, aberto via mmap:
+# todos os workers compartilham a mesma cópia física no page cache.
+#
+# Layout (little-endian, tudo alinhado em 8 bytes):
+#   cabeçalho | colunas de canais | offsets de programas/índice por canal |
+#   colunas de programas | índice now/next | offsets das strings |
+#   offsets do JSON dos programas | blob UTF-8 | JSON dos programas
+# Colunas são int64; strings são ids na tabela de offsets (-1 = None). O JSON
+# de cada programa (mesma serialização do JSONResponse, seguido de vírgula)
+# alimenta as respostas de /catalog/epg direto do arquivo mapeado.
+STORE_VERSION = 2
+_MAGIC = b"WPEPGCOL"
+_HEADER = struct.Struct("<8sII32sQQQQQQ")
+_SUFFIX = ".epgcol"
+# Epoch ausente (programa sem start/stop válido)
+NO_TIME = -(2 ** 63)
+_NO_STRING = -1
+
+_CHANNEL_COLUMNS = ("ch_id", "ch_name", "ch_icon", "ch_decl", "ch_contiguous")
+_PROGRAM_COLUMNS = ("p_start", "p_stop", "p_title", "p_desc", "p_start_iso", "p_stop_iso")
+_INDEX_COLUMNS = ("ix_row", "ix_start", "ix_stop", "ix_max_stop")
+
+
+def enabled() -> bool:
+    return bool(EPG_STORE_DIR)
+
+
+def store_path(content_hash: str) -> Path:
+    # Endereçado pelo conteúdo: workers que carregam o mesmo XMLTV reaproveitam o arquivo
+    return Path(EPG_STORE_DIR or ".") / f"epg-{content_hash[:32]}{_SUFFIX}"
+
+
+def _epoch(iso_str: Optional[str], epochs: Optional[Dict[str, int]]) -> Optional[int]:
+    ts = lookup_epoch(iso_str, epochs)
+    return None if ts is None else int(ts)
+
+
+def json_bytes(value: Any) -> bytes:
+    # Mesma serialização do JSONResponse do Starlette
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def is_contiguous(starts: Any, stops: Any) -> bool:
+    """Todos datados e inícios/fins não decrescentes: qualquer janela é um intervalo contíguo."""
+    prev_start = prev_stop = NO_TIME
+    for s, e in zip(starts, stops):
+        if s == NO_TIME or e == NO_TIME or s < prev_start or e < prev_stop:
+            return False
+        prev_start, prev_stop = s, e
+    return True
+
+
+def compile_store(
+    path: Path,
+    channels: Dict[str, Dict[str, Any]],
+    programs: Dict[str, List[Dict[str, Any]]],
+    content_hash: str,
+    epochs: Optional[Dict[str, int]] = None,
+) -> Path:
+    """Grava o guia no formato colunar de forma atômica (arquivo temporário + rename).
+
+    `epochs` é a tabela ISO -> epoch do parser; sem ela os horários são reconvertidos.
+    """
+    strings: Dict[str, int] = {}
+    blob = bytearray()
+    str_off = array("q", [0])
+
+    def sid(value: Optional[str]) -> int:
+        if value is None:
+            return _NO_STRING
+        found = strings.get(value)
+        if found is None:
+            found = strings[value] = len(strings)
+            blob.extend(value.encode("utf-8"))
+            str_off.append(len(blob))
+        return found
+
+    cols = {name: array("q") for name in _CHANNEL_COLUMNS + _PROGRAM_COLUMNS + _INDEX_COLUMNS}
+    json_blob = bytearray()
+    json_off = array("q", [0])
+    prog_off = array("q", [0])
+    idx_off = array("q", [0])
+    declared = {cid: rank for rank, cid in enumerate(channels)}
+    # Ordem dos canais = ordem de `programs` (inclui os declarados em <channel>)
+    ordered = list(programs) + [cid for cid in channels if cid not in programs]
+    for cid in ordered:
+        info = channels.get(cid) or {}
+        cols["ch_id"].append(sid(cid))
+        cols["ch_name"].append(sid(info.get("name")))
+        cols["ch_icon"].append(sid(info.get("icon")))
+        cols["ch_decl"].append(declared.get(cid, -1))
+        base = len(cols["p_start"])
+        rows = []
+        for i, p in enumerate(programs.get(cid, ())):
+            start = _epoch(p.get("start"), epochs)
+            stop = _epoch(p.get("stop"), epochs)
+            cols["p_start"].append(NO_TIME if start is None else start)
+            cols["p_stop"].append(NO_TIME if stop is None else stop)
+            cols["p_title"].append(sid(p.get("title")))
+            cols["p_desc"].append(sid(p.get("description")))
+            cols["p_start_iso"].append(sid(p.get("start")))
+            cols["p_stop_iso"].append(sid(p.get("stop")))
+            json_blob.extend(json_bytes(p))
+            json_blob.extend(b",")
+            json_off.append(len(json_blob))
+            if start is not None and stop is not None:
+                rows.append((start, stop, base + i))
+        cols["ch_contiguous"].append(int(is_contiguous(cols["p_start"][base:], cols["p_stop"][base:])))
+        # Mesmo critério do ProgramIndex: só programas datados, ordenação estável por início
+        rows.sort(key=lambda r: r[0])
+        running = NO_TIME
+        for start, stop, row in rows:
+            running = stop if stop > running else running
+            cols["ix_row"].append(row)
+            cols["ix_start"].append(start)
+            cols["ix_stop"].append(stop)
+            cols["ix_max_stop"].append(running)
+        prog_off.append(len(cols["p_start"]))
+        idx_off.append(len(cols["ix_row"]))
+
+    try:
+        digest = bytes.fromhex(content_hash)
+    except ValueError:
+        digest = b""
+    header = _HEADER.pack(
+        _MAGIC,
+        STORE_VERSION,
+        0,
+        digest.ljust(32, b"\0")[:32],
+        len(ordered),
+        len(cols["p_start"]),
+        len(cols["ix_row"]),
+        len(strings),
+        len(blob),
+        len(json_blob),
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(header)
+        for name in _CHANNEL_COLUMNS:
+            f.write(cols[name].tobytes())
+        f.write(prog_off.tobytes())
+        f.write(idx_off.tobytes())
+        for name in _PROGRAM_COLUMNS + _INDEX_COLUMNS:
+            f.write(cols[name].tobytes())
+        f.write(str_off.tobytes())
+        f.write(json_off.tobytes())
+        f.write(bytes(blob))
+        f.write(bytes(json_blob))
+    os.replace(tmp, path)
+    return path
+
+
+def prune(keep: Path) -> int:
+    """Remove arquivos compilados sem uso recente; devolve quantos foram removidos."""
+    removed = 0
+    cutoff = time.time() - EPG_STORE_RETENTION_SECONDS
+    for path in keep.parent.glob(f"epg-*{_SUFFIX}"):
+        if path == keep:
+            continue
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except OSError:
+            # Em uso (Windows) ou removido por outro worker
+            continue
+    return removed
+
+
+class EPGStore:
+    """Guia compilado aberto via mmap; programas são materializados sob demanda."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, digest, n_ch, n_prog, n_idx, n_str, blob_len, json_len = _HEADER.unpack_from(
+                self._mm, 0
+            )
+        except struct.error:
+            magic, version = b"", 0
+        if magic != _MAGIC or version != STORE_VERSION:
+            self._mm.close()
+            raise ValueError(f"Arquivo de EPG compilado incompatível: {self.path}")
+        self.content_hash = digest.hex()
+        self.channel_count = n_ch
+        self.program_count = n_prog
+        view = memoryview(self._mm)
+        pos = _HEADER.size
+
+        def column(count: int) -> memoryview:
+            nonlocal pos
+            mv = view[pos:pos + 8 * count].cast("q")
+            pos += 8 * count
+            return mv
+
+        cols: Dict[str, memoryview] = {}
+        for name in _CHANNEL_COLUMNS:
+            cols[name] = column(n_ch)
+        self._prog_off = column(n_ch + 1)
+        self._idx_off = column(n_ch + 1)
+        for name in _PROGRAM_COLUMNS:
+            cols[name] = column(n_prog)
+        for name in _INDEX_COLUMNS:
+            cols[name] = column(n_idx)
+        self._str_off = column(n_str + 1)
+        self._json_off = column(n_prog + 1)
+        self._blob = view[pos:pos + blob_len]
+        pos += blob_len
+        self._json = view[pos:pos + json_len]
+        self._cols = cols
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id < 0:
+            return None
+        return str(self._blob[self._str_off[string_id]:self._str_off[string_id + 1]], "utf-8")
+
+    def channel_id(self, ch: int) -> str:
+        return self.string(self._cols["ch_id"][ch]) or ""
+
+    def channel_info(self, ch: int) -> Dict[str, Any]:
+        return {
+            "id": self.channel_id(ch),
+            "name": self.string(self._cols["ch_name"][ch]),
+            "icon": self.string(self._cols["ch_icon"][ch]),
+        }
+
+    def declaration_rank(self, ch: int) -> int:
+        # Posição do <channel> no documento (-1: canal só referenciado por programas)
+        return self._cols["ch_decl"][ch]
+
+    def is_contiguous(self, ch: int) -> bool:
+        return bool(self._cols["ch_contiguous"][ch])
+
+    def program_columns(self, ch: int, name: str) -> memoryview:
+        # Fatia (sem cópia) de uma coluna de programas do canal, na ordem da grade
+        return self._cols[name][self._prog_off[ch]:self._prog_off[ch + 1]]
+
+    def program_json(self, ch: int) -> Tuple[memoryview, memoryview]:
+        """(JSON de todos os programas, offsets absolutos do canal: n + 1 entradas)."""
+        return self._json, self._json_off[self._prog_off[ch]:self._prog_off[ch + 1] + 1]
+
+    def program(self, row: int) -> Dict[str, Any]:
+        c = self._cols
+        return {
+            "title": self.string(c["p_title"][row]),
+            "description": self.string(c["p_desc"][row]),
+            "start": self.string(c["p_start_iso"][row]),
+            "stop": self.string(c["p_stop_iso"][row]),
+        }
+
+    def programs(self, ch: int) -> List[Dict[str, Any]]:
+        return [self.program(row) for row in range(self._prog_off[ch], self._prog_off[ch + 1])]
+
+    def index_size(self, ch: int) -> int:
+        return self._idx_off[ch + 1] - self._idx_off[ch]
+
+    def index_column(self, ch: int, name: str) -> memoryview:
+        # Fatia (sem cópia) de uma coluna do índice now/next do canal
+        return self._cols[name][self._idx_off[ch]:self._idx_off[ch + 1]]
+
+    def index_item(self, ch: int, pos: int) -> Dict[str, Any]:
+        return self.program(self._cols["ix_row"][self._idx_off[ch] + pos])
+
+    def now_next(self, ch: int, ts: float) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        c = self._cols
+        lo, hi = self._idx_off[ch], self._idx_off[ch + 1]
+        i = bisect_right(c["ix_start"], ts, lo, hi)
+        upcoming = self.program(c["ix_row"][i]) if i < hi else None
+        current = None
+        j = i - 1
+        if j >= lo and c["ix_max_stop"][j] > ts:
+            # Programa de início mais recente que ainda cobre o instante
+            while j >= lo:
+                if c["ix_stop"][j] > ts:
+                    current = self.program(c["ix_row"][j])
+                    break
+                j -= 1
+        return current, upcoming
+
+
+class StoreProgramIndex:
+    """Mesma interface do ProgramIndex, lendo os arrays direto do arquivo mapeado."""
+
+    __slots__ = ("_store", "_ch")
+
+    def __init__(self, store: EPGStore, ch: int):
+        self._store = store
+        self._ch = ch
+
+    def __len__(self) -> int:
+        return self._store.index_size(self._ch)
+
+    @property
+    def starts(self) -> memoryview:
+        return self._store.index_column(self._ch, "ix_start")
+
+    @property
+    def stops(self) -> memoryview:
+        return self._store.index_column(self._ch, "ix_stop")
+
+    @property
+    def max_stops(self) -> memoryview:
+        return self._store.index_column(self._ch, "ix_max_stop")
+
+    def item(self, pos: int) -> Dict[str, Any]:
+        return self._store.index_item(self._ch, pos)
+
+    def now_next(self, ts: float) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        return self._store.now_next(self._ch, ts)
+
+
+class StorePrograms(Mapping):
+    """Programas por id de canal, materializados do arquivo apenas quando acessados."""
+
+    def __init__(self, store: EPGStore):
+        self.store = store
+        self._rows = {store.channel_id(ch): ch for ch in range(store.channel_count)}
+
+    def __getitem__(self, cid: str) -> List[Dict[str, Any]]:
+        return self.store.programs(self._rows[cid])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def indexes(self) -> Dict[str, StoreProgramIndex]:
+        return {cid.lower(): StoreProgramIndex(self.store, ch) for cid, ch in self._rows.items()}
+
+    def channels(self) -> Dict[str, Dict[str, Any]]:
+        # Canais declarados, na ordem do documento
+        declared = sorted(
+            (self.store.declaration_rank(ch), ch) for ch in self._rows.values() if self.store.declaration_rank(ch) >= 0
+        )
+        channels: Dict[str, Dict[str, Any]] = {}
+        for _, ch in declared:
+            info = self.store.channel_info(ch)
+            channels[info["id"]] = info
+        return channels
@@ -0,0 +1,151 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from app.config import CPU_EXECUTOR_KIND, CPU_EXECUTOR_WORKERS, CPU_EXECUTOR_MAX_QUEUE
+from app.observability import (
+    CPU_EXECUTOR_PENDING,
+    CPU_TASK_QUEUE_WAIT_SECONDS,
+    CPU_TASK_RUN_SECONDS,
+    CPU_TASKS_REJECTED_TOTAL,
+)
+
+
+class ExecutorBusy(RuntimeError):
+    """Fila do executor cheia: a etapa CPU-bound não foi aceita (HTTP 503)."""
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    # forkserver/spawn em vez de fork: o processo do servidor tem threads (pool,
+    # clientes HTTP) e um fork com locks presos pode travar o processo filho
+    methods = multiprocessing.get_all_start_methods()
+    method = "forkserver" if "forkserver" in methods else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+
+def _timed(fn: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[float, float, Any]:
+    # Roda no worker (thread ou processo): devolve início, duração e resultado
+    started = time.time()
+    result = fn(*args)
+    return started, time.time() - started, result
+
+
+class CPUExecutor:
+    """Executa etapas CPU-bound fora do event loop.
+
+    `kind` escolhe o pool: "thread", "process" ou "inline" (roda no próprio
+    loop). Tarefas `stateful` (métodos de objetos vivos, resultados grandes
+    demais para serializar) sempre usam threads, mesmo com kind="process".
+    Com mais de `max_queue` tarefas aguardando worker, `run` levanta
+    ExecutorBusy em vez de enfileirar. Etapas divididas em várias tarefas
+    (parse em blocos de um download) passam pelo limite uma vez, em `admit`,
+    e enviam os blocos com `admitted=True`: não são recusadas no meio.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 4, max_queue: int = 32):
+        self.kind = kind if kind in ("thread", "process", "inline") else "thread"
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.pending = 0
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        # Pool dedicado à ingestão paralela (tamanho próprio, ver map_processes)
+        self._ingest: Optional[ProcessPoolExecutor] = None
+        self._ingest_workers = 0
+
+    def _pool(self, stateful: bool) -> Executor:
+        if self.kind == "process" and not stateful:
+            if self._processes is None:
+                self._processes = _process_pool(self.workers)
+            return self._processes
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu")
+        return self._threads
+
+    def admit(self, stage: str) -> None:
+        """Levanta ExecutorBusy se a fila estiver cheia."""
+        if self.kind != "inline" and self.pending - self.workers >= self.max_queue:
+            CPU_TASKS_REJECTED_TOTAL.labels(stage=stage).inc()
+            raise ExecutorBusy(f"Executor ocupado ({self.pending} tarefas pendentes)")
+
+    async def run(
+        self, stage: str, fn: Callable[..., Any], *args: Any, stateful: bool = False, admitted: bool = False
+    ) -> Any:
+        if self.kind == "inline":
+            _, elapsed, result = _timed(fn, args)
+            CPU_TASK_RUN_SECONDS.labels(stage=stage).observe(elapsed)
+            return result
+        if not admitted:
+            self.admit(stage)
+        self.pending += 1
+        CPU_EXECUTOR_PENDING.set(self.pending)
+        submitted = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            started, elapsed, result = await loop.run_in_executor(self._pool(stateful), _timed, fn, args)
+        finally:
+            self.pending -= 1
+            CPU_EXECUTOR_PENDING.set(self.pending)
+        CPU_TASK_QUEUE_WAIT_SECONDS.labels(stage=stage).observe(max(0.0, started - submitted))
+        CPU_TASK_RUN_SECONDS.labels(stage=stage).observe(elapsed)
+        return result
+
+    async def map_processes(
+        self, stage: str, fn: Callable[..., Any], arg_list: Sequence[Tuple[Any, ...]], processes: int
+    ) -> List[Any]:
+        """Executa `fn(*args)` para cada tupla de `arg_list` em `processes` processos.
+
+        Usado por etapas que se dividem em blocos independentes (ex.: ingestão
+        de XMLTV grande). A etapa é admitida uma vez (não é recusada no meio),
+        mas cada bloco conta como tarefa pendente até terminar: enquanto os
+        blocos ocupam a fila, novas tarefas recebem ExecutorBusy.
+        """
+        self.admit(stage)
+        if self._ingest is None or self._ingest_workers != processes:
+            if self._ingest is not None:
+                self._ingest.shutdown(wait=False)
+            self._ingest = _process_pool(max(1, processes))
+            self._ingest_workers = processes
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+
+        async def job(args: Tuple[Any, ...]) -> Tuple[float, float, Any]:
+            self.pending += 1
+            CPU_EXECUTOR_PENDING.set(self.pending)
+            try:
+                return await loop.run_in_executor(self._ingest, _timed, fn, args)
+            finally:
+                self.pending -= 1
+                CPU_EXECUTOR_PENDING.set(self.pending)
+
+        outcomes = await asyncio.gather(*(job(args) for args in arg_list))
+        for started, elapsed, _ in outcomes:
+            CPU_TASK_QUEUE_WAIT_SECONDS.labels(stage=stage).observe(max(0.0, started - submitted))
+            CPU_TASK_RUN_SECONDS.labels(stage=stage).observe(elapsed)
+        return [result for _, _, result in outcomes]
+
+    def shutdown(self) -> None:
+        for pool in (self._threads, self._processes, self._ingest):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = None
+        self._processes = None
+        self._ingest = None
+        self._ingest_workers = 0
+
+
+cpu_executor = CPUExecutor(CPU_EXECUTOR_KIND, CPU_EXECUTOR_WORKERS, CPU_EXECUTOR_MAX_QUEUE)
+
+
+async def run_cpu(
+    stage: str, fn: Callable[..., Any], *args: Any, stateful: bool = False, admitted: bool = False
+) -> Any:
+    """Atalho para `cpu_executor.run` (ver CPUExecutor)."""
+    return await cpu_executor.run(stage, fn, *args, stateful=stateful, admitted=admitted)
+
+
+def admit_cpu(stage: str) -> None:
+    """Atalho para `cpu_executor.admit` (ver CPUExecutor)."""
+    cpu_executor.admit(stage)
@@ -0,0 +1,24 @@
+from typing import Optional
+
+
+# Validação condicional (ETag/If-None-Match) das respostas dos routers
+
+
+def strong_etag(digest: str) -> str:
+    """ETag forte (valor entre aspas) a partir de um hash do conteúdo."""
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Se o If-None-Match da requisição cobre `etag` (lista, `*` e W/; comparação fraca)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
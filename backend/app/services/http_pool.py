@@ -0,0 +1,143 @@
+import asyncio
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, Optional, Set, Tuple
+
+import httpx
+
+from app.config import (
+    PROXY_VERIFY_TLS,
+    PROXY_TRUST_ENV,
+    PROXY_MAX_CONNECTIONS,
+    PROXY_MAX_KEEPALIVE_CONNECTIONS,
+    PROXY_MAX_CONNECTIONS_PER_HOST,
+    PROXY_KEEPALIVE_EXPIRY_SECONDS,
+    PROXY_HTTP2,
+)
+
+
+# HTTP/2 requer o pacote opcional `h2`
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class HTTPClientPool:
+    """Clientes httpx de longa duração, um por configuração de saída.
+
+    A chave é (proxy de saída, verificação TLS, trust_env). Os clientes são
+    criados sob demanda e fechados no shutdown da aplicação (lifespan) ou
+    quando o event loop muda. Os semáforos por host só existem enquanto há
+    requisições em andamento ou aguardando para aquele host.
+    """
+
+    def __init__(self) -> None:
+        self._clients: Dict[Tuple[Optional[str], bool, bool], httpx.AsyncClient] = {}
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        # Requisições usando (ou aguardando) o semáforo de cada host
+        self._host_users: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing: Set["asyncio.Future[None]"] = set()
+
+    def _check_loop(self) -> None:
+        # Conexões ficam presas ao event loop em que foram abertas
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            stale = list(self._clients.values())
+            previous = self._loop
+            self._clients = {}
+            self._host_slots = {}
+            self._host_users = {}
+            self._loop = loop
+            if stale:
+                self._close_stale(stale, previous, loop)
+
+    def _close_stale(
+        self,
+        clients: Iterable[httpx.AsyncClient],
+        previous: Optional[asyncio.AbstractEventLoop],
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        # Clientes do loop anterior: fechados no próprio loop se ainda estiver rodando
+        # (outra thread); senão, melhor esforço a partir do loop atual
+        if previous is not None and previous.is_running() and not previous.is_closed():
+            asyncio.run_coroutine_threadsafe(_close_clients(clients), previous)
+            return
+        task = loop.create_task(_close_clients(clients))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def get(self, proxy_url: Optional[str] = None) -> httpx.AsyncClient:
+        self._check_loop()
+        key = (proxy_url, PROXY_VERIFY_TLS, PROXY_TRUST_ENV)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = self._create(proxy_url)
+            self._clients[key] = client
+        return client
+
+    def _create(self, proxy_url: Optional[str]) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=PROXY_MAX_CONNECTIONS,
+            max_keepalive_connections=PROXY_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=PROXY_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        http2 = PROXY_HTTP2 and _HTTP2_AVAILABLE
+        transport = None
+        if proxy_url:
+            # httpx >=0.28 remove 'proxies' e usa transport com proxy
+            transport = httpx.AsyncHTTPTransport(
+                proxy=proxy_url,
+                verify=PROXY_VERIFY_TLS,
+                http2=http2,
+                limits=limits,
+                trust_env=PROXY_TRUST_ENV,
+            )
+        return httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(20.0),
+            verify=PROXY_VERIFY_TLS,
+            http2=http2,
+            limits=limits,
+            transport=transport,
+            trust_env=PROXY_TRUST_ENV,
+        )
+
+    @asynccontextmanager
+    async def host_slot(self, host: str) -> AsyncIterator[None]:
+        # Limite de requisições simultâneas por host de origem
+        self._check_loop()
+        if PROXY_MAX_CONNECTIONS_PER_HOST <= 0:
+            yield
+            return
+        sem = self._host_slots.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(PROXY_MAX_CONNECTIONS_PER_HOST)
+            self._host_slots[host] = sem
+        slots, users = self._host_slots, self._host_users
+        users[host] = users.get(host, 0) + 1
+        try:
+            async with sem:
+                yield
+        finally:
+            users[host] -= 1
+            if not users[host]:
+                # Host ocioso: descarta o semáforo (o dict não cresce com cada origem já vista)
+                del users[host]
+                slots.pop(host, None)
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients = {}
+        self._host_slots = {}
+        self._host_users = {}
+        await _close_clients(clients)
+
+
+async def _close_clients(clients: Iterable[httpx.AsyncClient]) -> None:
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception:
+            pass
+
+
+proxy_clients = HTTPClientPool()
@@ -1,95 +1,476 @@
+import hashlib
 import os
-import re
-import time
 import asyncio
-from typing import Any, Dict, List, Optional, Tuple
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Collection, Dict, Iterator, List, Optional, Tuple
 
 import httpx
-from app.config import M3U_TTL_SECONDS, M3U_FETCH_RETRIES, FETCH_BACKOFF_SECONDS
+from app.config import (
+    M3U_TTL_SECONDS,
+    M3U_FETCH_RETRIES,
+    FETCH_BACKOFF_SECONDS,
+    M3U_CACHE_MAX_BYTES,
+    M3U_MAX_STALE_SECONDS,
+    SNAPSHOT_REFRESH_ON_START,
+)
+from app.services import snapshot
+from app.services.cache import LRUCache
+from app.services.executor import ExecutorBusy, admit_cpu, run_cpu
+from app.services.refresh import SourceNotModified, SourceValidators, StaleWhileRevalidate
+from app.services.singleflight import SingleFlight
 
 
-_cache_text: Optional[str] = None
-_cache_source: Optional[str] = None
-_cache_ts: float = 0.0
+@dataclass
+class M3UEntry:
+    text: str
+    # SHA-256 do texto (ETag e chave de caches derivados)
+    content_hash: str
+    channels: Optional[List["Channel"]] = None
+    # ETag/Last-Modified da fonte remota, reenviados como GET condicional
+    validators: Optional[SourceValidators] = None
+
+
+# Cache por fonte (URL/caminho) com orçamento de bytes, TTL e despejo LRU
 _M3U_TTL_SECONDS = float(M3U_TTL_SECONDS)
+_CACHE = LRUCache("m3u", max_bytes=M3U_CACHE_MAX_BYTES, ttl=_M3U_TTL_SECONDS)
+_FLIGHT = SingleFlight("m3u")
+# Parse sob demanda de uma entrada, coalescido por (fonte, hash do texto)
+_PARSE_FLIGHT = SingleFlight("m3u_parse")
+_SWR = StaleWhileRevalidate("m3u", max_stale=M3U_MAX_STALE_SECONDS)
+# Overhead aproximado por canal parseado (registro com slots + objetos str)
+_CHANNEL_OVERHEAD_BYTES = 270
+# Tamanho dos blocos (caracteres) entregues ao parser incremental
+_CHUNK_SIZE = 1024 * 1024
 
 
 def _parse_extinf(line: str) -> Tuple[Dict[str, str], str]:
+    """Atributos `chave="valor"` e nome de uma linha `#EXTINF`, em uma única varredura.
+
+    Vírgulas dentro de valores entre aspas não encerram os atributos: o nome
+    é o texto após a primeira vírgula fora de aspas.
+    """
     attrs: Dict[str, str] = {}
-    # Extrai chave="valor" incluindo chaves com hífen
-    for key, val in re.findall(r'([\w-]+)="(.*?)"', line):
-        attrs[key] = val
-    # Nome do canal fica após a última vírgula
-    name_match = re.search(r",\s*(.*)$", line)
-    name = name_match.group(1).strip() if name_match else ""
-    return attrs, name
-
-
-def parse_m3u(text: str) -> List[Dict[str, Any]]:
-    channels: List[Dict[str, Any]] = []
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        if line.startswith("#EXTINF"):
-            attrs, name = _parse_extinf(line)
-            # Próxima linha deve ser a URL
-            url = ""
-            if i + 1 < len(lines):
-                url = lines[i + 1]
-                i += 1
-            channels.append(
-                {
-                    "name": name,
-                    "url": url,
-                    "tvg_id": attrs.get("tvg-id"),
-                    "group": attrs.get("group-title"),
-                    "logo": attrs.get("tvg-logo"),
-                    "raw_extinf": line,
-                }
-            )
-        i += 1
-    return channels
+    find = line.find
+    pos = 0
+    comma = find(",")
+    while True:
+        if comma != -1 and comma < pos:
+            # A vírgula anterior estava dentro de aspas
+            comma = find(",", pos)
+        quote = find('"', pos)
+        if comma != -1 and (quote == -1 or comma < quote):
+            return attrs, line[comma + 1:].strip()
+        if quote == -1:
+            # Sem vírgula fora de aspas: linha sem nome
+            return attrs, ""
+        close = find('"', quote + 1)
+        if close == -1:
+            # Aspas sem fechamento: sem mais atributos; o nome é o texto após a
+            # primeira vírgula seguinte (como na implementação com regex)
+            comma = find(",", quote + 1)
+            return attrs, line[comma + 1:].strip() if comma != -1 else ""
+        if quote > 0 and line[quote - 1] == "=":
+            # Chave imediatamente antes de `="` (letras, dígitos, "_" e "-")
+            start = max(line.rfind(" ", pos, quote) + 1, pos)
+            key = line[start:quote - 1]
+            if not key.replace("-", "").replace("_", "").isalnum():
+                key = _key_suffix(key)
+            if key:
+                attrs[key] = line[quote + 1:close]
+        pos = close + 1
 
 
-async def load_m3u_text(source: str, force: bool = False) -> str:
-    global _cache_text, _cache_source, _cache_ts
-    now = time.time()
-    if (
-        not force
-        and _cache_text is not None
-        and source == _cache_source
-        and (now - _cache_ts) < _M3U_TTL_SECONDS
+def _key_suffix(token: str) -> str:
+    # Maior sufixo do token formado só por caracteres válidos de chave
+    k = len(token)
+    while k > 0 and (token[k - 1].isalnum() or token[k - 1] in "_-"):
+        k -= 1
+    return token[k:]
+
+
+class Channel(Mapping):
+    """Canal parseado de uma playlist, em registro compacto (`__slots__`).
+
+    Expõe os mesmos campos do antigo dict (`name`, `url`, `tvg_id`, `group`,
+    `logo`, `raw_extinf`) via interface de Mapping. `group`/`logo` são
+    internados por playlist e a linha `#EXTINF` original não é copiada:
+    é recortada do texto da playlist apenas quando `raw_extinf` é pedido.
+    """
+
+    __slots__ = ("name", "url", "tvg_id", "group", "logo", "_text", "_span")
+
+    FIELDS = ("name", "url", "tvg_id", "group", "logo", "raw_extinf")
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        tvg_id: Optional[str],
+        group: Optional[str],
+        logo: Optional[str],
+        text: str,
+        start: int,
+        length: int,
     ):
-        return _cache_text
+        self.name = name
+        self.url = url
+        self.tvg_id = tvg_id
+        self.group = group
+        self.logo = logo
+        self._text = text
+        # Início e tamanho da linha #EXTINF no texto, em um único inteiro
+        self._span = (start << 32) | length
+
+    @property
+    def raw_extinf(self) -> str:
+        start = self._span >> 32
+        return self._text[start:start + (self._span & 0xFFFFFFFF)]
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self.FIELDS:
+            return getattr(self, key)
+        return default
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __repr__(self) -> str:
+        return f"Channel({dict(self)!r})"
+
+
+class M3UStreamParser:
+    """Parser incremental de M3U.
+
+    Recebe o texto em blocos (`feed`) e devolve os canais concluídos em cada
+    bloco; apenas a linha incompleta e o `#EXTINF` pendente ficam em memória.
+    A URL de um canal é a próxima linha não vazia após o `#EXTINF`.
+
+    Quando `text` é o documento completo que será alimentado, os canais
+    referenciam a linha `#EXTINF` por posição nesse texto, sem cópia.
+    """
+
+    def __init__(self, text: Optional[str] = None) -> None:
+        self._text = text
+        self._tail = ""
+        # Posição (no documento) do início de `_tail`
+        self._offset = 0
+        self._pending: Optional[Tuple[str, int]] = None
+        # Tabela de internação de grupos/logos (repetidos em muitas entradas)
+        self._strings: Dict[str, str] = {}
+
+    def feed(self, data: str) -> List[Channel]:
+        out: List[Channel] = []
+        parts = (self._tail + data).splitlines(keepends=True)
+        self._tail = ""
+        if parts and not parts[-1].endswith("\n"):
+            # Linha possivelmente incompleta (inclui "\r" de um "\r\n" partido entre blocos)
+            self._tail = parts.pop()
+        pos = self._offset
+        for part in parts:
+            self._line(part, pos, out)
+            pos += len(part)
+        self._offset = pos
+        return out
+
+    def close(self) -> List[Channel]:
+        out: List[Channel] = []
+        if self._tail:
+            self._line(self._tail, self._offset, out)
+            self._offset += len(self._tail)
+            self._tail = ""
+        if self._pending is not None:
+            # #EXTINF sem URL no fim do arquivo
+            out.append(self._channel(self._pending, ""))
+            self._pending = None
+        return out
+
+    def _line(self, raw: str, pos: int, out: List[Channel]) -> None:
+        line = raw.strip()
+        if not line:
+            return
+        if self._pending is not None:
+            out.append(self._channel(self._pending, line))
+            self._pending = None
+        elif line.startswith("#EXTINF"):
+            self._pending = (line, pos + len(raw) - len(raw.lstrip()))
+
+    def _channel(self, pending: Tuple[str, int], url: str) -> Channel:
+        extinf, start = pending
+        attrs, name = _parse_extinf(extinf)
+        if self._text is None:
+            # Sem documento de referência: o registro guarda a própria linha
+            text, start = extinf, 0
+        else:
+            text = self._text
+        return Channel(
+            name=name,
+            url=url,
+            tvg_id=attrs.get("tvg-id"),
+            group=self._intern(attrs.get("group-title")),
+            logo=self._intern(attrs.get("tvg-logo")),
+            text=text,
+            start=start,
+            length=len(extinf),
+        )
+
+    def _intern(self, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        return self._strings.setdefault(value, value)
+
+
+def parse_m3u(text: str) -> List[Channel]:
+    # Mesmo parser incremental do streaming, em fatias do texto (sem cópia linha a linha)
+    parser = M3UStreamParser(text)
+    channels: List[Channel] = []
+    for pos in range(0, len(text), _CHUNK_SIZE):
+        channels.extend(parser.feed(text[pos:pos + _CHUNK_SIZE]))
+    channels.extend(parser.close())
+    return channels
+
+
+def _parse_with_size(text: str) -> Tuple[List[Channel], int]:
+    channels = parse_m3u(text)
+    return channels, _estimate_channels_size(channels)
+
+
+def _estimate_channels_size(channels: List[Channel]) -> int:
+    # Estimativa grosseira: overhead do registro + strings próprias; grupos/logos
+    # internados contam uma vez e raw_extinf já está no texto da playlist
+    total = 0
+    shared: Dict[int, int] = {}
+    for ch in channels:
+        total += _CHANNEL_OVERHEAD_BYTES + len(ch.name) + len(ch.url) + len(ch.tvg_id or "")
+        for v in (ch.group, ch.logo):
+            if v is not None:
+                shared[id(v)] = len(v)
+    return total + sum(shared.values())
+
 
-    if source.startswith("http://") or source.startswith("https://"):
+def _is_remote(source: str) -> bool:
+    return source.startswith("http://") or source.startswith("https://")
+
+
+def _local_path(source: str) -> str:
+    # Caminho relativo à pasta backend
+    # __file__ = backend/app/services/m3u.py -> subir três níveis até backend
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    return os.path.join(base_dir, source)
+
+
+async def _fetch_m3u(
+    source: str, validators: Optional[SourceValidators] = None
+) -> Tuple[str, Optional[SourceValidators]]:
+    """Texto da playlist e validadores HTTP; levanta SourceNotModified em 304."""
+    if _is_remote(source):
+        headers = validators.request_headers() if validators is not None else {}
         attempts = max(1, int(M3U_FETCH_RETRIES))
         backoff = float(FETCH_BACKOFF_SECONDS)
         last_err: Optional[Exception] = None
         async with httpx.AsyncClient(timeout=20, follow_redirects=True) as client:
             for i in range(attempts):
                 try:
-                    resp = await client.get(source)
+                    resp = await client.get(source, headers=headers)
+                    if resp.status_code == 304 and headers:
+                        raise SourceNotModified(source)
                     resp.raise_for_status()
-                    text = resp.text
-                    break
+                    return resp.text, SourceValidators.from_headers(resp.headers)
+                except SourceNotModified:
+                    raise
                 except Exception as e:
                     last_err = e
                     if i < attempts - 1:
                         await asyncio.sleep(backoff * (2 ** i))
                     else:
                         raise last_err
-    else:
-        # Caminho relativo à pasta backend
-        rel_path = source
-        # __file__ = backend/app/services/m3u.py -> subir três níveis até backend
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        file_path = os.path.join(base_dir, rel_path)
-        with open(file_path, "r", encoding="utf-8") as f:
-            text = f.read()
-
-    _cache_text = text
-    _cache_source = source
-    _cache_ts = now
-    return text
+    with open(_local_path(source), "r", encoding="utf-8") as f:
+        return f.read(), None
+
+
+async def iter_m3u_channels(source: str) -> AsyncIterator[Channel]:
+    """Canais da fonte à medida que são parseados, sem materializar a playlist.
+
+    Usa a lista já parseada quando a fonte está no cache; caso contrário lê
+    o corpo HTTP (ou o arquivo) em blocos, com memória limitada ao bloco.
+    Nesse caso o cache não é preenchido de propósito: guardar a playlist
+    exigiria manter o texto inteiro, que é o que o streaming evita. Fontes
+    frias são baixadas e parseadas a cada stream até que outra rota as carregue.
+    """
+    cached: Optional[M3UEntry] = _CACHE.get(source)
+    if cached is not None:
+        for ch in await channels_for_entry(source, cached):
+            yield ch
+        return
+    # Admitido uma vez na fila do executor: os blocos seguintes não são recusados no meio
+    admit_cpu("m3u_parse")
+    parser = M3UStreamParser()
+    if _is_remote(source):
+        attempts = max(1, int(M3U_FETCH_RETRIES))
+        backoff = float(FETCH_BACKOFF_SECONDS)
+        async with httpx.AsyncClient(timeout=20, follow_redirects=True) as client:
+            for i in range(attempts):
+                yielded = False
+                try:
+                    async with client.stream("GET", source) as resp:
+                        resp.raise_for_status()
+                        async for chunk in resp.aiter_text(_CHUNK_SIZE):
+                            for ch in await run_cpu("m3u_parse", parser.feed, chunk, stateful=True, admitted=True):
+                                yielded = True
+                                yield ch
+                    for ch in parser.close():
+                        yield ch
+                    return
+                except ExecutorBusy:
+                    raise
+                except Exception:
+                    # Só repete enquanto nada foi entregue ao consumidor
+                    if yielded or i >= attempts - 1:
+                        raise
+                    parser = M3UStreamParser()
+                    await asyncio.sleep(backoff * (2 ** i))
+        return
+    # Leitura do arquivo e parse de cada bloco no executor (fora do event loop)
+    f = await asyncio.to_thread(open, _local_path(source), "r", encoding="utf-8")
+    with f:
+        while True:
+            batch = await run_cpu("m3u_parse", _read_and_feed, f, parser, stateful=True, admitted=True)
+            if batch is None:
+                break
+            for ch in batch:
+                yield ch
+    for ch in parser.close():
+        yield ch
+
+
+def _read_and_feed(f: Any, parser: "M3UStreamParser") -> Optional[List[Channel]]:
+    # Próximo bloco do arquivo já parseado; None no fim do arquivo
+    chunk = f.read(_CHUNK_SIZE)
+    if not chunk:
+        return None
+    return parser.feed(chunk)
+
+
+async def load_m3u_entry(source: str, force: bool = False) -> M3UEntry:
+    # Cache -> (stale-while-revalidate) -> busca coalescida
+    return await _SWR.load(_CACHE, _FLIGHT, source, lambda: _refresh_entry(source, force=force), force=force)
+
+
+def m3u_data_age(source: str) -> Optional[float]:
+    """Segundos desde a última atualização da playlist (None se nunca carregada)."""
+    return _SWR.age(_CACHE, source)
+
+
+async def _refresh_entry(source: str, force: bool = False) -> M3UEntry:
+    cached = _CACHE.peek(source)
+    previous: Optional[M3UEntry] = cached.value if cached is not None else None
+    # Recarga forçada: GET incondicional (um 304 manteria a versão em cache)
+    validators = previous.validators if previous is not None and not force else None
+    try:
+        text, validators = await _fetch_m3u(source, validators)
+    except SourceNotModified:
+        # 304: renova o TTL e mantém texto e canais já parseados
+        snapshot.touch("m3u", source)
+        if not _CACHE.touch(source):
+            _CACHE.set(source, previous, size=cached.size)
+        return previous
+    entry = M3UEntry(
+        text=text,
+        content_hash=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        validators=validators,
+    )
+    _CACHE.set(source, entry, size=len(text))
+    return entry
+
+
+async def load_m3u_text(source: str, force: bool = False) -> str:
+    entry = await load_m3u_entry(source, force=force)
+    return entry.text
+
+
+async def load_m3u_channels(source: str, force: bool = False) -> List[Channel]:
+    """Canais parseados da fonte, reaproveitando o parse enquanto a entrada estiver no cache."""
+    entry = await load_m3u_entry(source, force=force)
+    return await channels_for_entry(source, entry)
+
+
+async def channels_for_entry(source: str, entry: M3UEntry) -> List[Channel]:
+    # Parse sob demanda fora do event loop, guardado na própria entrada do cache
+    if entry.channels is None:
+        channels, size = await _PARSE_FLIGHT.do(
+            (source, entry.content_hash),
+            # stateful: os registros referenciam o texto da entrada (não copiar para outro processo)
+            lambda: run_cpu("m3u_parse", _parse_with_size, entry.text, stateful=True),
+        )
+        if entry.channels is None:
+            entry.channels = channels
+            _CACHE.resize(source, len(entry.text) + size)
+            cached = _CACHE.peek(source)
+            snapshot.save_in_background(
+                "m3u",
+                source,
+                entry.content_hash,
+                lambda: _snapshot_data(entry),
+                saved_at=cached.ts if cached is not None else None,
+            )
+    return entry.channels
+
+
+def _snapshot_data(entry: M3UEntry) -> Tuple[Any, ...]:
+    # Texto, validadores e canais em colunas (strings internadas continuam compartilhadas)
+    channels = entry.channels or []
+    v = entry.validators
+    return (
+        entry.text,
+        v.etag if v is not None else None,
+        v.last_modified if v is not None else None,
+        [c.name for c in channels],
+        [c.url for c in channels],
+        [c.tvg_id for c in channels],
+        [c.group for c in channels],
+        [c.logo for c in channels],
+        [c._span for c in channels],
+    )
+
+
+def _entry_from_snapshot(snap: snapshot.Snapshot) -> Optional[Tuple[M3UEntry, int]]:
+    text, etag, last_modified, names, urls, tvg_ids, groups, logos, spans = snap.data
+    if hashlib.sha256(text.encode("utf-8")).hexdigest() != snap.content_hash:
+        return None
+    channels = [
+        Channel(name, url, tvg_id, group, logo, text, span >> 32, span & 0xFFFFFFFF)
+        for name, url, tvg_id, group, logo, span in zip(names, urls, tvg_ids, groups, logos, spans)
+    ]
+    validators = SourceValidators(etag, last_modified) if (etag or last_modified) else None
+    entry = M3UEntry(text=text, content_hash=snap.content_hash, channels=channels, validators=validators)
+    return entry, len(text) + _estimate_channels_size(channels)
+
+
+async def restore_snapshots(refresh_sources: Collection[str] = ()) -> int:
+    """Carrega no cache as playlists gravadas em snapshot (startup); devolve quantas.
+
+    Só as fontes em `refresh_sources` (as configuradas) são atualizadas em
+    segundo plano; as demais (playlists de usuários) são atualizadas sob demanda.
+    """
+    restored = 0
+    for snap in await snapshot.load_snapshots("m3u"):
+        if snap.source in _CACHE:
+            continue
+        result = await run_cpu("snapshot_load", _entry_from_snapshot, snap, stateful=True)
+        if result is None:
+            continue
+        entry, size = result
+        # Expira relativo a quando foi salvo: snapshot antigo cai no stale-while-revalidate
+        _CACHE.set(snap.source, entry, size=size, ts=snap.saved_at, ttl=snap.remaining_ttl(_CACHE.ttl))
+        restored += 1
+        if SNAPSHOT_REFRESH_ON_START and snap.source in refresh_sources:
+            _SWR.refresh_in_background(_FLIGHT, snap.source, lambda s=snap.source: _refresh_entry(s))
+    return restored
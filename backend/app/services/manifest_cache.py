@@ -0,0 +1,42 @@
+from typing import Awaitable, Callable, Optional
+
+from app.config import (
+    PROXY_MANIFEST_CACHE_MAX_BYTES,
+    PROXY_MANIFEST_TTL_FRACTION,
+    PROXY_MANIFEST_DEFAULT_TTL_SECONDS,
+)
+from app.services.cache import LRUCache
+from app.services.singleflight import SingleFlight
+
+
+class ManifestCache:
+    """Playlists HLS reescritas, por URL de origem, com TTL curto.
+
+    O TTL é uma fração do #EXT-X-TARGETDURATION, então o player continua
+    vendo a janela ao vivo atualizada; requisições concorrentes pela mesma
+    playlist são coalescidas em uma única busca no upstream.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.cache = LRUCache("hls_manifests", max_bytes=max_bytes, ttl=PROXY_MANIFEST_DEFAULT_TTL_SECONDS)
+        self.flight = SingleFlight("hls_manifests")
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache.max_bytes > 0
+
+    def get(self, url: str) -> Optional[str]:
+        return self.cache.get(url)
+
+    def put(self, url: str, body: str, target_duration: Optional[float]) -> None:
+        if target_duration and target_duration > 0:
+            ttl = float(target_duration) * PROXY_MANIFEST_TTL_FRACTION
+        else:
+            ttl = PROXY_MANIFEST_DEFAULT_TTL_SECONDS
+        self.cache.set(url, body, size=len(body), ttl=ttl)
+
+    async def coalesce(self, url: str, fn: Callable[[], Awaitable]):
+        return await self.flight.do(url, fn)
+
+
+manifest_cache = ManifestCache(PROXY_MANIFEST_CACHE_MAX_BYTES)
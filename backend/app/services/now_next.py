@@ -0,0 +1,129 @@
+import importlib.util
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from app.config import EPG_VECTORIZED_NOW_NEXT
+from app.services.epg import EPGData
+
+
+# NumPy é opcional: sem o pacote, now/next continua por canal (busca binária)
+_NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+if _NUMPY_AVAILABLE:
+    import numpy as np
+
+NowNext = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+def vectorized_enabled() -> bool:
+    return _NUMPY_AVAILABLE and EPG_VECTORIZED_NOW_NEXT
+
+
+class NowNextTable:
+    """Programas datados de todos os canais em arrays planos (canal, início, fim).
+
+    Os índices por canal já estão ordenados por início; concatenados com a
+    chave `canal * span + início`, o array global fica ordenado e uma única
+    chamada de `searchsorted` responde now/next de todos os canais (e de
+    vários instantes) de uma vez.
+    """
+
+    def __init__(self, index: Mapping[str, Any]):
+        self._indexes = list(index.values())
+        self._slots = {key: i for i, key in enumerate(index)}
+        n = len(self._indexes)
+        counts = np.fromiter((len(ix) for ix in self._indexes), dtype=np.int64, count=n)
+        self._offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._offsets[1:])
+        starts = self._concat("starts", np.int64)
+        self._stops = self._concat("stops", np.float64)
+        self._max_stops = self._concat("max_stops", np.float64)
+        self._base = int(starts.min()) if starts.size else 0
+        self._span = int(starts.max()) - self._base + 1 if starts.size else 1
+        channel = np.repeat(np.arange(n, dtype=np.int64), counts)
+        self._keys = channel * self._span + (starts - self._base)
+        # Índices em memória: lista plana de itens alinhada aos arrays (acesso direto);
+        # guia compilado (mmap): itens materializados do arquivo sob demanda
+        self._items: Optional[List[Dict[str, Any]]] = None
+        if all(hasattr(ix, "items") for ix in self._indexes):
+            self._items = [item for ix in self._indexes for item in ix.items]
+
+    def _concat(self, attr: str, dtype: Any) -> "np.ndarray":
+        parts = [np.asarray(getattr(ix, attr)).astype(dtype, copy=False) for ix in self._indexes if len(ix)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+    def lookup_many(self, keys: Sequence[str], times: Sequence[float]) -> List[List[NowNext]]:
+        """now/next para cada instante (linhas) x canal (colunas); canal desconhecido -> (None, None)."""
+        slots = np.fromiter((self._slots.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+        t = np.asarray(times, dtype=np.float64)[:, None]
+        known = slots >= 0
+        safe = np.where(known, slots, 0)
+        lo = self._offsets[safe][None, :]
+        hi = self._offsets[safe + 1][None, :]
+        # bisect_right(starts, ts) == bisect_right(starts, floor(ts)) com inícios inteiros;
+        # o clip mantém a consulta dentro da faixa do próprio canal
+        tq = np.clip(np.floor(t) - self._base, -1, self._span - 1).astype(np.int64)
+        i = np.searchsorted(self._keys, safe[None, :] * self._span + tq, side="right")
+        has_next = known & (i < hi)
+        j = i - 1
+        has_prev = known & (j >= lo)
+        jj = np.where(has_prev, j, 0)
+        if self._keys.size:
+            covered = has_prev & (self._max_stops[jj] > t)
+            direct = covered & (self._stops[jj] > t)
+        else:
+            covered = direct = has_prev
+        # Posição global do programa atual/próximo (-1: nenhum)
+        current = np.where(direct, j, -1)
+        upcoming = np.where(has_next, i, -1)
+        # Grade com sobreposição: recua até o programa que ainda cobre o instante
+        # (o máximo acumulado dos fins garante que existe um dentro do canal)
+        pending = covered & ~direct
+        k = j
+        while pending.any():
+            k = np.where(pending, k - 1, k)
+            hit = pending & (self._stops[np.maximum(k, 0)] > t)
+            current = np.where(hit, k, current)
+            pending &= ~hit & (k > lo)
+        if self._items is not None:
+            items = self._items
+            return [
+                [(items[c] if c >= 0 else None, items[n] if n >= 0 else None) for c, n in zip(cur_row, next_row)]
+                for cur_row, next_row in zip(current.tolist(), upcoming.tolist())
+            ]
+        # Guia compilado: materializa a partir do índice do canal
+        indexes = [self._indexes[s] if s >= 0 else None for s in slots.tolist()]
+        bases = lo[0].tolist()
+        return [
+            [
+                (
+                    index.item(c - base) if c >= 0 else None,
+                    index.item(n - base) if n >= 0 else None,
+                )
+                for index, base, c, n in zip(indexes, bases, cur_row, next_row)
+            ]
+            for cur_row, next_row in zip(current.tolist(), upcoming.tolist())
+        ]
+
+    def lookup(self, keys: Sequence[str], ts: float) -> List[NowNext]:
+        return self.lookup_many(keys, [ts])[0]
+
+
+def _table(epg: EPGData) -> "NowNextTable":
+    # Construída uma vez por versão do guia (EPGData fica imutável no cache)
+    table = epg.now_next_table
+    if table is None:
+        table = NowNextTable(epg.index)
+        epg.now_next_table = table
+    return table
+
+
+def now_next_many(epg: EPGData, keys: Sequence[str], times: Sequence[float]) -> List[List[NowNext]]:
+    """now/next dos canais `keys` (ids em minúsculas) em cada instante de `times`."""
+    if vectorized_enabled():
+        return _table(epg).lookup_many(keys, times)
+    indexes = [epg.index.get(k) for k in keys]
+    return [[ix.now_next(ts) if ix is not None else (None, None) for ix in indexes] for ts in times]
+
+
+def now_next_all(epg: EPGData, keys: Sequence[str], ts: float) -> List[NowNext]:
+    """now/next dos canais `keys` (ids em minúsculas) no instante `ts`."""
+    return now_next_many(epg, keys, [ts])[0]
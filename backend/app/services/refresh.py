@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+import httpx
+
+from app.config import (
+    SOURCE_STALE_WHILE_REVALIDATE,
+    REFRESH_FAILURE_BACKOFF_SECONDS,
+    REFRESH_FAILURE_BACKOFF_MAX_SECONDS,
+)
+from app.observability import SOURCE_DATA_AGE_SECONDS, SOURCE_REFRESH_TOTAL, STALE_SERVED_TOTAL
+from app.services.cache import LRUCache
+from app.services.singleflight import SingleFlight
+
+
+logger = logging.getLogger("webplay")
+
+# Atualizações em segundo plano pendentes (canceladas no shutdown)
+_TASKS: "Set[asyncio.Task[Any]]" = set()
+
+
+class SourceNotModified(Exception):
+    """A fonte remota respondeu 304: o conteúdo em cache continua válido."""
+
+
+# Falhas ao baixar, ler ou parsear uma fonte (M3U/XMLTV), que as rotas convertem
+# em erro HTTP. ExecutorBusy (fila cheia) fica de fora: vira 503 no handler global.
+SOURCE_ERRORS: Tuple[type, ...] = (httpx.HTTPError, OSError, ValueError, SyntaxError)
+
+
+@dataclass
+class SourceValidators:
+    """Validadores HTTP da última resposta completa de uma fonte remota."""
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @classmethod
+    def from_headers(cls, headers: Any) -> Optional["SourceValidators"]:
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if not etag and not last_modified:
+            return None
+        return cls(etag=etag, last_modified=last_modified)
+
+    def request_headers(self) -> Dict[str, str]:
+        # Cabeçalhos de GET condicional para a próxima atualização
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class StaleWhileRevalidate:
+    """Política de atualização de fontes cacheadas (M3U/EPG).
+
+    Com a política ativa, uma entrada expirada há no máximo `max_stale`
+    segundos continua sendo servida enquanto uma tarefa em segundo plano
+    a atualiza. Falhas de atualização aplicam backoff exponencial por fonte;
+    passado o limite de staleness, o chamador volta a aguardar a busca.
+    """
+
+    def __init__(self, name: str, max_stale: float, enabled: bool = SOURCE_STALE_WHILE_REVALIDATE):
+        self.name = name
+        self.max_stale = float(max_stale)
+        self.enabled = enabled
+        # fonte -> (falhas consecutivas, próxima tentativa permitida)
+        self._failures: Dict[Hashable, Tuple[int, float]] = {}
+
+    async def load(
+        self,
+        cache: LRUCache,
+        flight: SingleFlight,
+        key: str,
+        refresh: Callable[[], Awaitable[Any]],
+        force: bool = False,
+    ) -> Any:
+        if not force:
+            value = cache.get(key)
+            if value is not None:
+                self._observe_age(cache, key)
+                return value
+            if self.enabled:
+                entry = cache.peek(key)
+                if entry is not None and time.time() - entry.expires_at <= self.max_stale:
+                    STALE_SERVED_TOTAL.labels(name=self.name).inc()
+                    self._schedule(flight, key, refresh)
+                    self._observe_age(cache, key)
+                    return entry.value
+        # Chamadores concorrentes aguardam a mesma busca
+        value = await flight.do(key, refresh)
+        self._failures.pop(key, None)
+        self._observe_age(cache, key)
+        return value
+
+    def refresh_in_background(self, flight: SingleFlight, key: str, refresh: Callable[[], Awaitable[Any]]) -> None:
+        """Agenda uma atualização da fonte sem aguardar (ex.: após restaurar um snapshot)."""
+        self._schedule(flight, key, refresh)
+
+    def age(self, cache: LRUCache, key: str) -> Optional[float]:
+        # Segundos desde a última atualização bem-sucedida da fonte
+        entry = cache.peek(key)
+        if entry is None:
+            return None
+        return max(0.0, time.time() - entry.ts)
+
+    def _observe_age(self, cache: LRUCache, key: str) -> None:
+        age = self.age(cache, key)
+        if age is not None:
+            SOURCE_DATA_AGE_SECONDS.labels(name=self.name).set(age)
+
+    def _schedule(self, flight: SingleFlight, key: str, refresh: Callable[[], Awaitable[Any]]) -> None:
+        if key in flight:
+            return
+        failure = self._failures.get(key)
+        if failure is not None and time.time() < failure[1]:
+            return
+        task = asyncio.ensure_future(self._refresh(flight, key, refresh))
+        _TASKS.add(task)
+        task.add_done_callback(_TASKS.discard)
+
+    async def _refresh(self, flight: SingleFlight, key: str, refresh: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await flight.do(key, refresh)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            count = self._failures.get(key, (0, 0.0))[0] + 1
+            delay = min(
+                float(REFRESH_FAILURE_BACKOFF_MAX_SECONDS),
+                float(REFRESH_FAILURE_BACKOFF_SECONDS) * (2 ** (count - 1)),
+            )
+            self._failures[key] = (count, time.time() + delay)
+            SOURCE_REFRESH_TOTAL.labels(name=self.name, result="error").inc()
+            logger.warning(
+                "msg=source_refresh_failed name=%s source=%s failures=%s retry_in_s=%.0f error=%s",
+                self.name,
+                key,
+                count,
+                delay,
+                e,
+            )
+            return
+        self._failures.pop(key, None)
+        SOURCE_REFRESH_TOTAL.labels(name=self.name, result="ok").inc()
+
+
+def data_age_headers(*ages: Optional[float]) -> Dict[str, str]:
+    """Cabeçalho X-Data-Age (segundos) com a idade da fonte mais antiga usada na resposta."""
+    known = [a for a in ages if a is not None]
+    if not known:
+        return {}
+    return {"X-Data-Age": str(int(max(known)))}
+
+
+async def cancel_background_refreshes() -> None:
+    tasks = list(_TASKS)
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except BaseException:
+            pass
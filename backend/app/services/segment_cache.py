@@ -0,0 +1,225 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from app.config import (
+    PROXY_SEGMENT_CACHE_MAX_BYTES,
+    PROXY_SEGMENT_CACHE_DIR,
+    PROXY_SEGMENT_CACHE_DISK_MAX_BYTES,
+    PROXY_SEGMENT_TTL_FACTOR,
+    PROXY_SEGMENT_DEFAULT_TTL_SECONDS,
+)
+from app.observability import CACHE_BYTES, CACHE_EVICTIONS_TOTAL, CACHE_REQUESTS_TOTAL
+from app.services.cache import LRUCache
+from app.services.singleflight import SingleFlight
+
+
+@dataclass
+class CachedSegment:
+    body: bytes
+    content_type: str
+
+
+class DiskSegmentStore:
+    """Segundo nível em disco, LRU por bytes; o índice fica em memória.
+
+    Cada processo (worker) usa o próprio subdiretório `<directory>/<pid>`, então
+    `max_bytes` vale por worker. Leituras, escritas e remoções de arquivos rodam
+    em thread; o índice só é alterado no event loop. Na inicialização, arquivos
+    de execuções anteriores (processos que não existem mais) são apagados.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.root = directory
+        self.directory = os.path.join(directory, str(os.getpid()))
+        self.max_bytes = max(0, int(max_bytes))
+        # chave -> (tamanho, expira_em, content-type)
+        self._index: "OrderedDict[str, Tuple[int, float, str]]" = OrderedDict()
+        self._bytes = 0
+        _clear_stale(directory, self.directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".seg")
+
+    async def get(self, key: str) -> Optional[CachedSegment]:
+        meta = self._index.get(key)
+        if meta is None:
+            return None
+        size, expires_at, ctype = meta
+        if expires_at <= time.time():
+            await self._unlink(self._remove(key))
+            return None
+        try:
+            body = await asyncio.to_thread(_read_file, self._path(key))
+        except OSError:
+            # Arquivo removido/substituído enquanto era lido: só descarta a mesma entrada
+            if self._index.get(key) is meta:
+                await self._unlink(self._remove(key))
+            return None
+        if key in self._index:
+            self._index.move_to_end(key)
+        return CachedSegment(body=body, content_type=ctype)
+
+    async def put(self, key: str, seg: CachedSegment, ttl: float) -> None:
+        size = len(seg.body)
+        if size > self.max_bytes:
+            return
+        await self._unlink(self._remove(key))
+        try:
+            await asyncio.to_thread(_write_file, self.directory, self._path(key), seg.body)
+        except OSError:
+            return
+        previous = self._index.pop(key, None)
+        if previous is not None:
+            # Outro put da mesma chave terminou durante a escrita: o arquivo agora é este
+            self._bytes -= previous[0]
+        self._index[key] = (size, time.time() + ttl, seg.content_type)
+        self._bytes += size
+        evicted = []
+        while self._bytes > self.max_bytes and self._index:
+            evicted += self._remove(next(iter(self._index)))
+            CACHE_EVICTIONS_TOTAL.labels(cache="hls_segments_disk").inc()
+        CACHE_BYTES.labels(cache="hls_segments_disk").set(self._bytes)
+        await self._unlink(evicted)
+
+    def _remove(self, key: str) -> List[str]:
+        # Tira a chave do índice (no loop); devolve o arquivo a apagar
+        meta = self._index.pop(key, None)
+        if meta is None:
+            return []
+        self._bytes -= meta[0]
+        return [self._path(key)]
+
+    async def _unlink(self, paths: List[str]) -> None:
+        if paths:
+            await asyncio.to_thread(_unlink_all, paths)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file(directory: str, path: str, body: bytes) -> None:
+    # Arquivo temporário único + rename: leitores nunca veem um segmento parcial
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+    except BaseException:
+        _unlink_all([tmp])
+        raise
+
+
+def _unlink_all(paths: Iterable[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name != "posix":
+        # Sem sinal 0 fora de POSIX: mantém o diretório (pode ser de outro worker)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _clear_stale(root: str, own: str) -> None:
+    """Apaga segmentos sem índice: o diretório deste pid e os de processos encerrados."""
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(root, name)
+        if os.path.isdir(path):
+            if path != own and (not name.isdigit() or _pid_alive(int(name))):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+        elif name.endswith((".seg", ".tmp")):
+            # Layout anterior (arquivos direto no diretório)
+            _unlink_all([path])
+
+
+class SegmentCache:
+    """Cache de segmentos HLS por URL de origem, com coalescência de misses.
+
+    Com N espectadores no mesmo canal ao vivo, cada segmento é buscado uma
+    única vez no upstream e servido da memória (ou do disco) para os demais.
+    """
+
+    # Limite de dicas de TTL guardadas (segmentos vistos em playlists)
+    MAX_TTL_HINTS = 50000
+
+    def __init__(self, max_bytes: int, directory: Optional[str] = None, disk_max_bytes: int = 0):
+        self.memory = LRUCache("hls_segments", max_bytes=max_bytes, ttl=PROXY_SEGMENT_DEFAULT_TTL_SECONDS)
+        self.disk = DiskSegmentStore(directory, disk_max_bytes) if directory else None
+        self.flight = SingleFlight("hls_segments")
+        self._ttl_hints: "OrderedDict[str, float]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory.max_bytes > 0
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def register_playlist(self, segment_urls: Iterable[str], target_duration: Optional[float]) -> None:
+        # TTL derivado do #EXT-X-TARGETDURATION da playlist que referenciou o segmento
+        if not target_duration or target_duration <= 0:
+            return
+        ttl = float(target_duration) * PROXY_SEGMENT_TTL_FACTOR
+        for url in segment_urls:
+            self._ttl_hints[url] = ttl
+            self._ttl_hints.move_to_end(url)
+        while len(self._ttl_hints) > self.MAX_TTL_HINTS:
+            self._ttl_hints.popitem(last=False)
+
+    def ttl_for(self, url: str) -> float:
+        return self._ttl_hints.get(url, PROXY_SEGMENT_DEFAULT_TTL_SECONDS)
+
+    async def get(self, url: str) -> Optional[CachedSegment]:
+        key = self._key(url)
+        seg: Optional[CachedSegment] = self.memory.get(key)
+        if seg is not None or self.disk is None:
+            return seg
+        seg = await self.disk.get(key)
+        result = "hit" if seg is not None else "miss"
+        CACHE_REQUESTS_TOTAL.labels(cache="hls_segments_disk", result=result).inc()
+        if seg is not None:
+            self.memory.set(key, seg, size=len(seg.body), ttl=self.ttl_for(url))
+        return seg
+
+    async def put(self, url: str, seg: CachedSegment) -> None:
+        key = self._key(url)
+        ttl = self.ttl_for(url)
+        self.memory.set(key, seg, size=len(seg.body), ttl=ttl)
+        if self.disk is not None:
+            await self.disk.put(key, seg, ttl)
+
+    async def coalesce(self, url: str, fn: Callable[[], Awaitable]):
+        return await self.flight.do(self._key(url), fn)
+
+
+segment_cache = SegmentCache(
+    PROXY_SEGMENT_CACHE_MAX_BYTES,
+    directory=PROXY_SEGMENT_CACHE_DIR,
+    disk_max_bytes=PROXY_SEGMENT_CACHE_DISK_MAX_BYTES,
+)
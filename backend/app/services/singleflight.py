@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app.observability import SINGLEFLIGHT_COALESCED_TOTAL
+
+
+class SingleFlight:
+    """Coalesce chamadas concorrentes pela mesma chave em uma única execução.
+
+    A primeira chamada dispara `fn()` numa task; as demais aguardam o mesmo
+    resultado (ou exceção). O cancelamento de um chamador não cancela a
+    busca compartilhada.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.coalesced = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self.coalesced += 1
+            SINGLEFLIGHT_COALESCED_TOTAL.labels(name=self.name).inc()
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Evita aviso de exceção não recuperada quando todos os chamadores saíram
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import logging
+import marshal
+import os
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+from app.config import SNAPSHOT_DIR, SNAPSHOT_MAX_AGE_SECONDS, SNAPSHOT_MAX_FILES
+from app.services.executor import run_cpu
+
+
+logger = logging.getLogger("webplay")
+
+# Cabeçalho: magic, versão do formato, tipo ("m3u"/"epg"), instante da gravação,
+# SHA-256 do conteúdo de origem, CRC32 e tamanho do payload (marshal + zlib)
+_MAGIC = b"WPSNAP"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("<6sH4sd32sIQ")
+
+# Gravações em andamento (aguardadas no shutdown)
+_PENDING: "Set[asyncio.Task[Any]]" = set()
+
+
+@dataclass
+class Snapshot:
+    kind: str
+    source: str
+    content_hash: str
+    saved_at: float
+    data: Any
+
+    def remaining_ttl(self, ttl: float) -> float:
+        """TTL que ainda resta aos dados, contado de `saved_at` (0 se já venceu)."""
+        return max(0.0, ttl - (time.time() - self.saved_at))
+
+
+def enabled() -> bool:
+    return bool(SNAPSHOT_DIR)
+
+
+def snapshot_path(kind: str, source: str) -> Path:
+    name = hashlib.sha256(f"{kind}:{source}".encode("utf-8")).hexdigest()[:32]
+    return Path(SNAPSHOT_DIR or ".") / f"{kind}-{name}.snap"
+
+
+def write_snapshot(kind: str, source: str, content_hash: str, data: Any, saved_at: Optional[float] = None) -> Path:
+    """Grava o snapshot de forma atômica (arquivo temporário + rename)."""
+    payload = zlib.compress(marshal.dumps((source, data)), 1)
+    try:
+        digest = bytes.fromhex(content_hash)
+    except ValueError:
+        digest = b""
+    header = _HEADER.pack(
+        _MAGIC,
+        SNAPSHOT_VERSION,
+        kind.encode("ascii"),
+        time.time() if saved_at is None else saved_at,
+        digest.ljust(32, b"\0")[:32],
+        zlib.crc32(payload),
+        len(payload),
+    )
+    path = snapshot_path(kind, source)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    # Somente o dono lê: URLs de provedores costumam trazer credenciais
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp, path)
+    return path
+
+
+def touch(kind: str, source: str) -> None:
+    """Marca o snapshot da fonte como em uso (mtime), sem regravá-lo."""
+    if not enabled():
+        return
+    try:
+        os.utime(snapshot_path(kind, source))
+    except OSError:
+        pass
+
+
+def prune(kind: str) -> List[Path]:
+    """Aplica a retenção (idade e quantidade) e devolve os snapshots mantidos, mais recentes primeiro."""
+    cutoff = time.time() - SNAPSHOT_MAX_AGE_SECONDS
+    kept: List[Tuple[float, Path]] = []
+    for path in list_snapshots(kind):
+        try:
+            mtime = path.stat().st_mtime
+            if SNAPSHOT_MAX_AGE_SECONDS > 0 and mtime < cutoff:
+                path.unlink()
+                continue
+        except OSError:
+            continue
+        kept.append((mtime, path))
+    kept.sort(reverse=True)
+    if SNAPSHOT_MAX_FILES > 0:
+        for _, path in kept[SNAPSHOT_MAX_FILES:]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        kept = kept[:SNAPSHOT_MAX_FILES]
+    return [path for _, path in kept]
+
+
+def read_snapshot(path: Path) -> Optional[Snapshot]:
+    """Snapshot válido do arquivo, ou None (formato/versão incompatível ou corrompido)."""
+    with path.open("rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            return None
+        magic, version, kind, saved_at, digest, crc, length = _HEADER.unpack(header)
+        if magic != _MAGIC or version != SNAPSHOT_VERSION:
+            return None
+        payload = f.read(length)
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        return None
+    source, data = marshal.loads(zlib.decompress(payload))
+    content_hash = digest.hex() if digest.strip(b"\0") else ""
+    return Snapshot(kind=kind.rstrip(b"\0").decode("ascii"), source=source, content_hash=content_hash, saved_at=saved_at, data=data)
+
+
+def list_snapshots(kind: str) -> List[Path]:
+    if not enabled():
+        return []
+    directory = Path(SNAPSHOT_DIR)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob(f"{kind}-*.snap"))
+
+
+async def load_snapshots(kind: str) -> List[Snapshot]:
+    snapshots: List[Snapshot] = []
+    for path in await run_cpu("snapshot_load", prune, kind, stateful=True):
+        try:
+            snap = await run_cpu("snapshot_load", read_snapshot, path, stateful=True)
+        except Exception as e:
+            logger.warning("msg=snapshot_load_failed path=%s error=%s", path, e)
+            continue
+        if snap is None or snap.kind != kind:
+            logger.warning("msg=snapshot_ignored path=%s reason=incompatible", path)
+            continue
+        snapshots.append(snap)
+    return snapshots
+
+
+def save_in_background(kind: str, source: str, content_hash: str, build: Callable[[], Any], saved_at: Optional[float] = None) -> None:
+    """Agenda a gravação do snapshot (serialização no executor, sem bloquear o chamador)."""
+    if not enabled():
+        return
+
+    def _write() -> Path:
+        path = write_snapshot(kind, source, content_hash, build(), saved_at)
+        prune(kind)
+        return path
+
+    async def _run() -> None:
+        try:
+            await run_cpu("snapshot_save", _write, stateful=True)
+        except Exception as e:
+            logger.warning("msg=snapshot_save_failed kind=%s source=%s error=%s", kind, source, e)
+
+    task = asyncio.ensure_future(_run())
+    _PENDING.add(task)
+    task.add_done_callback(_PENDING.discard)
+
+
+async def flush_snapshots() -> None:
+    # Aguarda gravações pendentes (shutdown)
+    if _PENDING:
+        await asyncio.gather(*list(_PENDING), return_exceptions=True)
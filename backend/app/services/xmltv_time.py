@@ -0,0 +1,88 @@
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+
+# Horários XMLTV no layout fixo `YYYYmmddHHMMSS` ou `YYYYmmddHHMMSS +HHMM`:
+# o ISO 8601 é montado por fatias de dígitos e validado por `fromisoformat`
+# (em C), sem strptime nem exceção por horário sem timezone. Qualquer outro
+# formato, ou campo fora de faixa, cai na implementação com strptime, então o
+# resultado é sempre o mesmo.
+_fromisoformat = datetime.fromisoformat
+
+
+def _legacy_parse_xmltv_time(value: str) -> Optional[str]:
+    if not value:
+        return None
+    value = value.strip()
+    # Common XMLTV formats: YYYYmmddHHMMSS Z, or without timezone
+    fmts = ["%Y%m%d%H%M%S %z", "%Y%m%d%H%M%S"]
+    for fmt in fmts:
+        try:
+            dt = datetime.strptime(value, fmt)
+            # Quando sem timezone, considerar UTC
+            if dt.tzinfo is None:
+                return dt.isoformat() + "Z"
+            return dt.isoformat()
+        except Exception:
+            continue
+    return None
+
+
+def parse_xmltv_time(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """(ISO 8601, epoch em segundos) de um horário XMLTV; None se inválido."""
+    if not value:
+        return None
+    v = value.strip()
+    n = len(v)
+    if n == 20:
+        if (
+            v[14] == " " and v[15] in "+-" and v.isascii() and v[:14].isdigit() and v[16:].isdigit()
+            and v[8:10] < "24" and v[18] < "6"
+        ):
+            iso = f"{v[0:4]}-{v[4:6]}-{v[6:8]}T{v[8:10]}:{v[10:12]}:{v[12:14]}{v[15:18]}:{v[18:20]}"
+            try:
+                # fromisoformat (C) valida os campos (hora 24 e minutos de offset
+                # >= 60 já excluídos: algumas versões os aceitam, o strptime não);
+                # offset -00:00 sai como +00:00, igual ao strptime
+                dt = _fromisoformat(iso)
+            except ValueError:
+                dt = None
+            if dt is not None:
+                if v[16:] == "0000":
+                    iso = iso[:19] + "+00:00"
+                return iso, int(dt.timestamp())
+    elif n == 14 and v.isascii() and v.isdigit() and v[8:10] < "24":
+        iso = f"{v[0:4]}-{v[4:6]}-{v[6:8]}T{v[8:10]}:{v[10:12]}:{v[12:14]}"
+        try:
+            dt = _fromisoformat(iso + "+00:00")
+        except ValueError:
+            dt = None
+        if dt is not None:
+            return iso + "Z", int(dt.timestamp())
+    # Layout diferente ou campo fora de faixa: mesmo resultado da implementação anterior
+    iso = _legacy_parse_xmltv_time(v)
+    if iso is None:
+        return None
+    return iso, int(_fromisoformat(iso.replace("Z", "+00:00")).timestamp())
+
+
+def iso_to_epoch(iso_str: Optional[str]) -> Optional[float]:
+    """Epoch de um horário ISO 8601 (None se vazio ou inválido)."""
+    if not iso_str:
+        return None
+    try:
+        return _fromisoformat(iso_str.replace("Z", "+00:00")).timestamp()
+    except Exception:
+        return None
+
+
+def lookup_epoch(iso_str: Optional[str], epochs: Optional[Dict[str, int]]) -> Optional[float]:
+    """Epoch de um horário normalizado, lido da tabela do parser (`epochs`) quando houver."""
+    if not iso_str:
+        return None
+    if epochs is not None:
+        ts = epochs.get(iso_str)
+        if ts is not None:
+            return ts
+    # Sem a tabela (ex.: snapshot restaurado) ou horário de outra origem
+    return iso_to_epoch(iso_str)
@@ -1,7 +1,59 @@
+import os
+import time
+from typing import Any, Callable, Tuple
+
 import pytest
 from app.services import rate_limit as rl
 
 
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: benchmark opcional, roda só com RUN_BENCHMARKS=1")
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.getenv("RUN_BENCHMARKS") == "1":
+        return
+    skip = pytest.mark.skip(reason="benchmark opcional: RUN_BENCHMARKS=1")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+class Bench:
+    """Medição e relatório dos benchmarks (`-s` mostra os números)."""
+
+    _SCALES = {"s": 1.0, "ms": 1e3, "MB": 1e-6}
+
+    @staticmethod
+    def seconds(fn: Callable[..., Any], *args: Any) -> float:
+        start = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - start
+
+    def compare(
+        self,
+        label: str,
+        baseline: Tuple[str, float],
+        current: Tuple[str, float],
+        unit: str = "ms",
+        min_ratio: float = 1.0,
+    ) -> float:
+        # Custos (tempo, memória): a versão atual precisa ser `min_ratio` vezes menor
+        scale = self._SCALES[unit]
+        ratio = baseline[1] / current[1]
+        print(
+            f"\n{label}: {baseline[0]}={baseline[1] * scale:,.1f} {unit} "
+            f"{current[0]}={current[1] * scale:,.1f} {unit} ({ratio:.2f}x)"
+        )
+        assert ratio > min_ratio
+        return ratio
+
+
+@pytest.fixture
+def bench():
+    return Bench()
+
+
 @pytest.fixture(autouse=True)
 def reset_rate_limit_state():
     # Antes do teste: nada a fazer
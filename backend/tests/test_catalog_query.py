@@ -0,0 +1,95 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+client = TestClient(app)
+
+
+def _playlist(path):
+    entries = [
+        ("1", "Notícias 24h", "News"),
+        ("2", "Ação Total", "Filmes de Ação"),
+        ("3", "Drama S01E01", "Séries Drama"),
+        ("10", "Esporte Clube", "Sports"),
+        ("", "Cinema Clássico", "VOD"),
+    ]
+    lines = ["#EXTM3U"]
+    for tvg_id, name, group in entries:
+        lines.append(f'#EXTINF:-1 tvg-id="{tvg_id}" group-title="{group}",{name}')
+        lines.append(f"http://stream.example.com/{name.replace(' ', '_')}.m3u8")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_enriched_filters_by_category_group_and_query(tmp_path, monkeypatch):
+    monkeypatch.setenv("M3U_SOURCE", _playlist(tmp_path / "query.m3u"))
+
+    r = client.get("/catalog/channels/enriched", params={"category": "movies", "sort": "name"})
+    assert r.status_code == 200
+    assert [c["name"] for c in r.json()] == ["Ação Total", "Cinema Clássico"]
+    assert r.headers["X-Total-Count"] == "2"
+
+    r = client.get("/catalog/channels/enriched", params={"category": "live"})
+    assert sorted(c["name"] for c in r.json()) == ["Esporte Clube", "Notícias 24h"]
+
+    r = client.get("/catalog/channels/enriched", params={"q": "noticias"})
+    assert [c["name"] for c in r.json()] == ["Notícias 24h"]
+
+    r = client.get("/catalog/channels/enriched", params={"group": "séries drama"})
+    assert [c["name"] for c in r.json()] == ["Drama S01E01"]
+
+    r = client.get("/catalog/channels/enriched", params={"sort": "number"})
+    assert [c["tvg_id"] for c in r.json()] == ["1", "2", "3", "10", ""]
+
+
+def test_sort_by_number_puts_missing_ids_last(tmp_path, monkeypatch):
+    path = tmp_path / "numbers.m3u"
+    lines = ["#EXTM3U"]
+    for i, tvg_id in enumerate(["", "7", "sem.numero", "0", "2", ""]):
+        lines.append(f'#EXTINF:-1 tvg-id="{tvg_id}",Canal {i}')
+        lines.append(f"http://stream.example.com/{i}.m3u8")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setenv("M3U_SOURCE", str(path))
+    r = client.get("/catalog/channels/enriched", params={"sort": "number"})
+    # "0" é um número como os outros; sem número ficam no fim, na ordem da playlist
+    assert [c["name"] for c in r.json()] == ["Canal 3", "Canal 4", "Canal 1", "Canal 0", "Canal 2", "Canal 5"]
+
+
+def test_enriched_cursor_pagination(tmp_path, monkeypatch):
+    monkeypatch.setenv("M3U_SOURCE", _playlist(tmp_path / "pages.m3u"))
+    full = client.get("/catalog/channels/enriched").json()
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/catalog/channels/enriched", params=params)
+        assert r.status_code == 200
+        assert r.headers["X-Total-Count"] == str(len(full))
+        seen.extend(r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == full
+
+    assert client.get("/catalog/channels/enriched", params={"cursor": "abc"}).status_code == 400
+
+
+def test_index_size_excludes_the_playlist_text():
+    from app.services import m3u
+    from app.services.catalog import ChannelIndex
+
+    def index_size(pad):
+        # URLs e logos ficam no texto (já contado no cache do M3U), não no índice
+        lines = ["#EXTM3U"]
+        for i in range(100):
+            lines.append(
+                f'#EXTINF:-1 tvg-id="{i}" tvg-logo="http://logo.example.com/{pad}.png" group-title="G",Canal {i}'
+            )
+            lines.append(f"http://stream.example.com/{pad}/{i}.ts")
+        return ChannelIndex(m3u.parse_m3u("\n".join(lines) + "\n")).estimated_size()
+
+    assert 0 < index_size("x") == index_size("x" * 1000)
@@ -0,0 +1,108 @@
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import m3u
+
+
+PLAYLIST = (
+    "#EXTM3U\n"
+    '  #EXTINF:-1 tvg-id="a" tvg-logo="http://logo/shared.png" group-title="News",Alpha\n'
+    "http://stream.example.com/a.m3u8\n"
+    '#EXTINF:-1 tvg-id="b" tvg-logo="http://logo/shared.png" group-title="News",Beta\r\n'
+    "http://stream.example.com/b.m3u8\r\n"
+)
+
+
+def _synthetic_playlist(n):
+    lines = ["#EXTM3U"]
+    for i in range(n):
+        lines.append(
+            f'#EXTINF:-1 tvg-id="ch{i}.br" tvg-name="Canal {i}" tvg-logo="http://logo.example.com/g{i % 50}.png" '
+            f'group-title="Grupo {i % 50}",Canal {i} HD'
+        )
+        lines.append(f"http://stream.example.com/live/user/pass/{i}.ts")
+    return "\n".join(lines) + "\n"
+
+
+def test_channel_record_exposes_dict_fields():
+    channels = m3u.parse_m3u(PLAYLIST)
+    a, b = channels
+    assert dict(a) == {
+        "name": "Alpha",
+        "url": "http://stream.example.com/a.m3u8",
+        "tvg_id": "a",
+        "group": "News",
+        "logo": "http://logo/shared.png",
+        "raw_extinf": '#EXTINF:-1 tvg-id="a" tvg-logo="http://logo/shared.png" group-title="News",Alpha',
+    }
+    assert b["raw_extinf"].endswith(",Beta")
+    assert a.get("missing", "x") == "x"
+    with pytest.raises(KeyError):
+        a["missing"]
+    # Strings repetidas são compartilhadas e o registro não tem __dict__
+    assert a.group is b.group and a.logo is b.logo
+    assert not hasattr(a, "__dict__")
+
+
+def test_raw_extinf_offsets_survive_chunking(monkeypatch):
+    monkeypatch.setattr(m3u, "_CHUNK_SIZE", 7)
+    text = _synthetic_playlist(40)
+    channels = m3u.parse_m3u(text)
+    assert len(channels) == 40
+    lines = text.splitlines()
+    for i, ch in enumerate(channels):
+        assert ch.raw_extinf == lines[1 + 2 * i]
+
+
+def test_channel_list_does_not_slice_raw_extinf(tmp_path, monkeypatch):
+    path = tmp_path / "list.m3u"
+    path.write_text(PLAYLIST, encoding="utf-8")
+    monkeypatch.setenv("M3U_SOURCE", str(path))
+
+    def no_slice(self):
+        raise AssertionError("raw_extinf não deveria ser recortado para a lista de canais")
+
+    monkeypatch.setattr(m3u.Channel, "raw_extinf", property(no_slice))
+    r = TestClient(app).get("/catalog/channels")
+    assert r.status_code == 200
+    assert [c["name"] for c in r.json()] == ["Alpha", "Beta"]
+    assert "raw_extinf" not in r.json()[0]
+
+
+@pytest.mark.benchmark
+def test_benchmark_channel_store_memory(bench):
+    text = _synthetic_playlist(100_000)
+
+    def legacy_dicts():
+        # Formato anterior: um dict por canal com cópia da linha #EXTINF
+        channels = []
+        lines = [l.strip() for l in text.splitlines() if l.strip()]
+        for i in range(1, len(lines), 2):
+            attrs, name = m3u._parse_extinf(lines[i])
+            channels.append(
+                {
+                    "name": name,
+                    "url": lines[i + 1],
+                    "tvg_id": attrs.get("tvg-id"),
+                    "group": attrs.get("group-title"),
+                    "logo": attrs.get("tvg-logo"),
+                    "raw_extinf": lines[i],
+                }
+            )
+        return channels
+
+    def measure(build):
+        tracemalloc.start()
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return result, size
+
+    dicts, dict_bytes = measure(legacy_dicts)
+    del dicts
+    records, record_bytes = measure(lambda: m3u.parse_m3u(text))
+    assert len(records) == 100_000
+    bench.compare("100k canais", ("dicts", dict_bytes), ("registros", record_bytes), unit="MB", min_ratio=2.0)
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import httpx
+
+from app.services import epg, m3u
+from app.services.cache import LRUCache
+
+
+PLAYLIST = (
+    "#EXTM3U\n"
+    '#EXTINF:-1 tvg-id="cond" group-title="News",Cond\n'
+    "http://stream.example.com/cond.m3u8\n"
+)
+
+GUIDE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<tv><channel id="cond"><display-name>Cond</display-name></channel>'
+    '<programme start="20250101080000 +0000" stop="20250101090000 +0000" channel="cond">'
+    "<title>Cond News</title></programme></tv>\n"
+)
+
+
+def _conditional_server(body, requests):
+    def handler(request):
+        requests.append(dict(request.headers))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(
+            200,
+            text=body,
+            headers={"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"},
+        )
+
+    return handler
+
+
+def _patch_client(monkeypatch, module, handler):
+    real_client = httpx.AsyncClient
+
+    def factory(*args, **kwargs):
+        kwargs["transport"] = httpx.MockTransport(handler)
+        return real_client(*args, **kwargs)
+
+    monkeypatch.setattr(module.httpx, "AsyncClient", factory)
+
+
+def test_m3u_revalidates_with_etag_and_keeps_parsed_channels(monkeypatch):
+    monkeypatch.setattr(m3u, "_CACHE", LRUCache("m3u_test", max_bytes=1024 * 1024, ttl=0.01))
+    requests = []
+    _patch_client(monkeypatch, m3u, _conditional_server(PLAYLIST, requests))
+    src = "http://provider.example.com/list.m3u"
+
+    async def scenario():
+        first = await m3u.load_m3u_channels(src)
+        await asyncio.sleep(0.02)
+        second = await m3u.load_m3u_channels(src)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert len(requests) == 2
+    assert "if-none-match" not in requests[0]
+    assert requests[1]["if-none-match"] == '"v1"'
+    assert requests[1]["if-modified-since"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+    # 304: mesma lista já parseada, TTL renovado
+    assert second is first
+    entry = m3u._CACHE.peek(src)
+    assert entry.expires_at > time.time()
+
+
+def test_epg_revalidates_and_skips_reparse(monkeypatch):
+    monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=0.01))
+    requests = []
+    _patch_client(monkeypatch, epg, _conditional_server(GUIDE, requests))
+    src = "http://provider.example.com/guide.xml"
+
+    async def scenario():
+        first = await epg.load_epg_data(src)
+        await asyncio.sleep(0.02)
+        second = await epg.load_epg_data(src)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert len(requests) == 2
+    assert requests[1]["if-none-match"] == '"v1"'
+    assert second is first
+    assert first.validators.etag == '"v1"'
+    assert first.programs["cond"][0]["title"] == "Cond News"
+
+
+def test_forced_playlist_reload_skips_validators(monkeypatch):
+    monkeypatch.setattr(m3u, "_CACHE", LRUCache("m3u_test", max_bytes=1024 * 1024, ttl=60))
+    requests = []
+    _patch_client(monkeypatch, m3u, _conditional_server(PLAYLIST, requests))
+    src = "http://provider.example.com/list.m3u"
+
+    async def scenario():
+        first = await m3u.load_m3u_channels(src)
+        return first, await m3u.load_m3u_channels(src, force=True)
+
+    first, forced = asyncio.run(scenario())
+    # GET incondicional: o servidor responde 200 e a lista é lida de novo (não um 304 no-op)
+    assert len(requests) == 2
+    assert "if-none-match" not in requests[1] and "if-modified-since" not in requests[1]
+    assert forced is not first and [dict(c) for c in forced] == [dict(c) for c in first]
+
+
+def test_forced_guide_reload_skips_validators(monkeypatch):
+    monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=60))
+    requests = []
+    _patch_client(monkeypatch, epg, _conditional_server(GUIDE, requests))
+    src = "http://provider.example.com/guide.xml"
+
+    async def scenario():
+        first = await epg.load_epg_data(src)
+        return first, await epg.load_epg_data(src, force=True)
+
+    first, forced = asyncio.run(scenario())
+    assert len(requests) == 2
+    assert "if-none-match" not in requests[1] and "if-modified-since" not in requests[1]
+    assert forced is not first and forced.validators.etag == '"v1"'
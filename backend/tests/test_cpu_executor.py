@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import epg, executor, m3u
+from app.services.cache import LRUCache
+from app.services.executor import CPUExecutor, ExecutorBusy
+
+
+def _spin(event):
+    # Etapa "CPU-bound" que só termina quando liberada
+    event.wait(5)
+    return threading.current_thread().name
+
+
+def test_thread_executor_keeps_loop_responsive():
+    pool = CPUExecutor("thread", workers=2, max_queue=4)
+    release = threading.Event()
+
+    async def scenario():
+        task = asyncio.ensure_future(pool.run("test", _spin, release))
+        ticks = 0
+        for _ in range(5):
+            await asyncio.sleep(0.005)
+            ticks += 1
+        assert pool.pending == 1
+        release.set()
+        return ticks, await task
+
+    ticks, thread_name = asyncio.run(scenario())
+    pool.shutdown()
+    assert ticks == 5
+    assert thread_name.startswith("cpu")
+    assert pool.pending == 0
+
+
+def test_full_queue_rejects_new_tasks():
+    pool = CPUExecutor("thread", workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.run("test", _spin, release))
+        queued = asyncio.ensure_future(pool.run("test", _spin, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ExecutorBusy):
+            await pool.run("test", _spin, release)
+        release.set()
+        await asyncio.gather(running, queued)
+
+    asyncio.run(scenario())
+    pool.shutdown()
+
+
+def test_admitted_stages_are_not_rejected_midway():
+    pool = CPUExecutor("thread", workers=1, max_queue=0)
+    try:
+        pool.admit("test")
+        # Outra tarefa ocupa o único worker: novas etapas são recusadas, blocos já admitidos não
+        pool.pending = 1
+        with pytest.raises(ExecutorBusy):
+            pool.admit("test")
+        assert asyncio.run(pool.run("test", pow, 2, 3, admitted=True)) == 8
+        with pytest.raises(ExecutorBusy):
+            asyncio.run(pool.run("test", pow, 2, 3))
+    finally:
+        pool.pending = 0
+        pool.shutdown()
+
+
+def test_process_jobs_count_against_the_queue():
+    pool = CPUExecutor("thread", workers=1, max_queue=1)
+
+    async def scenario():
+        ingest = asyncio.ensure_future(pool.map_processes("test", time.sleep, [(0.5,)] * 3, 2))
+        await asyncio.sleep(0.05)
+        # Cada bloco ocupa a fila até terminar: a etapa já admitida segue, novas tarefas não
+        assert pool.pending == 3
+        with pytest.raises(ExecutorBusy):
+            await pool.run("test", pow, 2, 3)
+        return await ingest
+
+    try:
+        assert asyncio.run(scenario()) == [None] * 3
+        assert pool.pending == 0
+        # Processos novos sem fork do servidor (threads/locks herdados)
+        assert pool._ingest._mp_context.get_start_method() in ("forkserver", "spawn")
+    finally:
+        pool.shutdown()
+
+
+def test_busy_executor_does_not_retry_remote_download(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request.url)
+        return httpx.Response(200, text='<?xml version="1.0"?><tv></tv>')
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        epg.httpx, "AsyncClient", lambda *a, **kw: real_client(*a, **{**kw, "transport": httpx.MockTransport(handler)})
+    )
+    monkeypatch.setattr(epg, "EPG_FETCH_RETRIES", 3)
+    monkeypatch.setattr(epg, "FETCH_BACKOFF_SECONDS", 0)
+    busy = CPUExecutor("thread", workers=1, max_queue=0)
+    busy.pending = 1
+    monkeypatch.setattr(executor, "cpu_executor", busy)
+    with pytest.raises(ExecutorBusy):
+        asyncio.run(epg.parse_xmltv_source("http://provider.example.com/guide.xml"))
+    # Executor cheio não é falha de rede: um único download, sem backoff
+    assert len(requests) == 1
+
+
+def test_process_executor_runs_picklable_functions():
+    pool = CPUExecutor("process", workers=1, max_queue=4)
+    try:
+        assert asyncio.run(pool.run("test", pow, 2, 10)) == 1024
+        # Tarefas stateful continuam em threads
+        assert asyncio.run(pool.run("test", threading.current_thread, stateful=True)).name.startswith("cpu")
+    finally:
+        pool.shutdown()
+
+
+def test_busy_executor_returns_503(tmp_path, monkeypatch):
+    monkeypatch.setattr(m3u, "_CACHE", LRUCache("m3u_test", max_bytes=1024 * 1024, ttl=60))
+    path = tmp_path / "busy.m3u"
+    path.write_text('#EXTM3U\n#EXTINF:-1 tvg-id="x",X\nhttp://stream.example.com/x.m3u8\n', encoding="utf-8")
+    monkeypatch.setenv("M3U_SOURCE", str(path))
+    busy = CPUExecutor("thread", workers=1, max_queue=0)
+    busy.pending = 1
+    monkeypatch.setattr(executor, "cpu_executor", busy)
+    client = TestClient(app)
+    r = client.get("/catalog/channels")
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
@@ -0,0 +1,66 @@
+import asyncio
+
+from app.services import epg
+from app.services.cache import LRUCache
+
+
+def _write_guide(path, channel_id, title):
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        "<tv>\n"
+        f'  <channel id="{channel_id}"><display-name>{channel_id}</display-name></channel>\n'
+        f'  <programme start="20250101080000 +0000" stop="20250101090000 +0000" channel="{channel_id}">\n'
+        f"    <title>{title}</title>\n"
+        "  </programme>\n"
+        "</tv>\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_epg_cache_is_keyed_by_source_and_normalizes_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=60))
+    calls = {"n": 0}
+    original = epg.parse_xmltv_source
+
+    async def counting(source, validators=None):
+        calls["n"] += 1
+        return await original(source, validators)
+
+    monkeypatch.setattr(epg, "parse_xmltv_source", counting)
+    src_a = _write_guide(tmp_path / "a.xml", "alpha", "Alpha News")
+    src_b = _write_guide(tmp_path / "b.xml", "beta", "Beta Sports")
+
+    async def scenario():
+        for _ in range(3):
+            a = await epg.get_epg(src_a)
+            b = await epg.get_epg(src_b)
+        return a, b
+
+    a, b = asyncio.run(scenario())
+    assert list(a["channels"]) == ["alpha"]
+    assert list(b["channels"]) == ["beta"]
+    assert b["programs"]["beta"][0]["title"] == "Beta Sports"
+    assert calls["n"] == 2
+    assert epg._CACHE.stats()["bytes"] > 0
+
+
+def test_concurrent_epg_loads_share_one_parse(tmp_path, monkeypatch):
+    monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=60))
+    calls = {"n": 0}
+    original = epg.parse_xmltv_source
+
+    async def slow_parse(source, validators=None):
+        calls["n"] += 1
+        await asyncio.sleep(0.01)
+        return await original(source, validators)
+
+    monkeypatch.setattr(epg, "parse_xmltv_source", slow_parse)
+    src = _write_guide(tmp_path / "herd.xml", "gamma", "Gamma")
+
+    async def scenario():
+        return await asyncio.gather(*(epg.load_epg_data(src) for _ in range(10)))
+
+    results = asyncio.run(scenario())
+    assert calls["n"] == 1
+    assert all(r is results[0] for r in results)
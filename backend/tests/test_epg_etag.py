@@ -0,0 +1,75 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import epg as epg_router
+from app.services import epg
+from app.services.cache import LRUCache
+
+
+client = TestClient(app)
+
+
+def _write_guide(path, title):
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n<tv>'
+        '<channel id="etag.one"><display-name>ETag</display-name></channel>'
+        '<programme start="20250101080000 +0000" stop="20250101090000 +0000" channel="etag.one">'
+        f"<title>{title}</title></programme></tv>\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_epg_etag_comes_from_load_time_hash(tmp_path, monkeypatch):
+    monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=60))
+    monkeypatch.setattr(epg_router, "_QUERY_CACHE", LRUCache("epg_query_test", max_bytes=1024 * 1024, ttl=60))
+    src = _write_guide(tmp_path / "guide.xml", "Primeiro")
+    monkeypatch.setenv("EPG_SOURCE", src)
+
+    async def no_guide(source):
+        raise AssertionError("o guia não deveria ser materializado para calcular o ETag")
+
+    monkeypatch.setattr(epg, "get_epg", no_guide)
+    params = {"start": "2025-01-01T07:00:00", "limit_per_channel": 5}
+    r1 = client.get("/catalog/epg", params=params)
+    assert r1.status_code == 200
+    etag = r1.headers["ETag"]
+    # Mesmo instante com timezone explícito: parâmetros normalizados, mesmo ETag
+    r2 = client.get("/catalog/epg", params={**params, "start": "2025-01-01T07:00:00+00:00"})
+    assert r2.headers["ETag"] == etag
+    r3 = client.get("/catalog/epg", params=params, headers={"If-None-Match": etag})
+    assert r3.status_code == 304
+    assert r3.headers["ETag"] == etag
+    # ETag forte entre aspas; If-None-Match com lista, W/ ou *
+    assert etag.startswith('"') and etag.endswith('"') and len(etag) == 66
+    for inm in (f'"outro", {etag}', f"W/{etag}", "*"):
+        assert client.get("/catalog/epg", params=params, headers={"If-None-Match": inm}).status_code == 304
+    assert client.get("/catalog/epg", params=params, headers={"If-None-Match": etag.strip('"')}).status_code == 200
+
+    # Conteúdo novo -> novo hash de carregamento -> novo ETag
+    monkeypatch.undo()
+    monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=60))
+    monkeypatch.setattr(epg_router, "_QUERY_CACHE", LRUCache("epg_query_test", max_bytes=1024 * 1024, ttl=60))
+    monkeypatch.setenv("EPG_SOURCE", _write_guide(tmp_path / "guide.xml", "Segundo"))
+    r4 = client.get("/catalog/epg", params=params, headers={"If-None-Match": etag})
+    assert r4.status_code == 200
+    assert r4.headers["ETag"] != etag
+    assert r4.json()["programs"]["etag.one"][0]["title"] == "Segundo"
+
+
+def test_epg_without_content_hash_is_an_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=60))
+    monkeypatch.setattr(epg_router, "_QUERY_CACHE", LRUCache("epg_query_test", max_bytes=1024 * 1024, ttl=60))
+    src = _write_guide(tmp_path / "guide.xml", "Sem hash")
+    monkeypatch.setenv("EPG_SOURCE", src)
+    original = epg.load_epg_data
+
+    async def without_hash(source):
+        data = await original(source)
+        data.content_hash = ""
+        return data
+
+    monkeypatch.setattr(epg_router, "load_epg_data", without_hash)
+    with pytest.raises(RuntimeError, match="sem hash"):
+        client.get("/catalog/epg")
@@ -0,0 +1,104 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.responses import JSONResponse
+
+from app.services import epg, epg_store
+
+
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _legacy_filter(data, start, end, limit_per_channel, offset_per_channel):
+    # Implementação anterior de /catalog/epg: dicts filtrados + JSONResponse
+    if start is None and end is None and limit_per_channel is None and not offset_per_channel:
+        return data
+    new_programs = {}
+    for cid, plist in data["programs"].items():
+        filtered = []
+        for p in plist:
+            s = datetime.fromisoformat(p["start"].replace("Z", "+00:00")) if p.get("start") else None
+            e = datetime.fromisoformat(p["stop"].replace("Z", "+00:00")) if p.get("stop") else None
+            if not s or not e:
+                continue
+            if start and e <= start:
+                continue
+            if end and s >= end:
+                continue
+            filtered.append(p)
+        end_idx = offset_per_channel + limit_per_channel if limit_per_channel is not None else None
+        new_programs[cid] = filtered[offset_per_channel:end_idx]
+    return {**data, "programs": new_programs}
+
+
+def _guide(n_channels, per_channel, seed=11):
+    rnd = random.Random(seed)
+    channels, programs = {}, {}
+    for c in range(n_channels):
+        cid = f"ch.{c}"
+        channels[cid] = {"id": cid, "name": f"Canal “{c}” São Paulo", "icon": None}
+        lst = []
+        t = BASE + timedelta(minutes=rnd.randrange(60))
+        for p in range(per_channel):
+            stop = t + timedelta(minutes=rnd.choice((15, 30, 60)))
+            tz = timezone(timedelta(hours=-3)) if c % 4 == 1 and p % 3 == 0 else timezone.utc
+            lst.append({
+                "title": f"Programa {p} — ação",
+                "description": None if p % 2 else 'Descrição com "aspas" e \\ barra',
+                "start": t.astimezone(tz).isoformat(),
+                "stop": stop.astimezone(tz).isoformat(),
+            })
+            t = stop
+        if c % 4 == 2:
+            lst.insert(1, {"title": "Sem horário", "description": None, "start": None, "stop": None})
+        if c % 4 == 3 and len(lst) > 2:
+            # Sobreposição: fim anterior ao do programa precedente
+            lst[2] = {**lst[2], "stop": lst[1]["stop"]}
+            lst[1] = {**lst[1], "stop": (BASE + timedelta(days=2)).isoformat()}
+        lst.sort(key=lambda x: (x.get("start") or ""))
+        programs[cid] = lst
+    return channels, programs
+
+
+def test_fragments_match_legacy_serialization(tmp_path):
+    channels, programs = _guide(12, 40)
+    data = {"channels": channels, "programs": programs}
+    fragments = epg.EPGFragments(channels, programs)
+    assert not all(fragments.contiguous) and any(fragments.contiguous)
+    # Mesmo JSON lido do guia compilado (fatias do arquivo mapeado)
+    store = epg_store.EPGStore(epg_store.compile_store(tmp_path / "g.epgcol", channels, programs, "ab" * 32))
+    mapped = epg.EPGFragments.from_store(store, channels)
+    assert mapped.contiguous == fragments.contiguous
+    assert all(isinstance(blob, memoryview) for blob in mapped.blobs)
+    rnd = random.Random(5)
+    cases = [(None, None, None, 0), (None, None, 3, 0), (None, None, None, 2)]
+    for _ in range(150):
+        start = BASE + timedelta(minutes=rnd.randrange(-60, 2000)) if rnd.random() < 0.8 else None
+        end = start + timedelta(minutes=rnd.randrange(0, 600)) if start and rnd.random() < 0.7 else None
+        cases.append((start, end, rnd.choice((None, 1, 5)), rnd.choice((0, 0, 2, 50))))
+    for start, end, limit, offset in cases:
+        expected = JSONResponse(content=_legacy_filter(data, start, end, limit, offset)).body
+        args = (start.timestamp() if start else None, end.timestamp() if end else None, limit, offset)
+        assert fragments.render(*args) == expected, (start, end, limit, offset)
+        assert mapped.render(*args) == expected, (start, end, limit, offset)
+
+
+@pytest.mark.benchmark
+def test_benchmark_fragment_assembly(bench):
+    channels, programs = _guide(500, 300)
+    data = {"channels": channels, "programs": programs}
+    fragments = epg.EPGFragments(channels, programs)
+    windows = [(BASE + timedelta(hours=h), BASE + timedelta(hours=h + 3)) for h in range(0, 48, 4)]
+
+    def legacy():
+        for start, end in windows:
+            JSONResponse(content=_legacy_filter(data, start, end, None, 0))
+
+    def current():
+        for start, end in windows:
+            fragments.render(start.timestamp(), end.timestamp(), None, 0)
+
+    bench.compare(
+        "500 canais x 12 janelas", ("dicts+json", bench.seconds(legacy)), ("fragmentos", bench.seconds(current))
+    )
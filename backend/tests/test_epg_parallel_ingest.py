@@ -0,0 +1,107 @@
+import asyncio
+import os
+
+import pytest
+
+from app.services import epg
+from app.services.executor import cpu_executor
+
+
+def _guide(n_channels, n_programs, declaration='<?xml version="1.0" encoding="UTF-8"?>\n', doctype=""):
+    parts = [declaration, doctype, '<tv generator-info-name="test">\n']
+    for c in range(n_channels):
+        parts.append(f'  <channel id="ch{c}"><display-name>Canal {c} – ação</display-name><icon src="http://logo/{c}.png"/></channel>\n')
+    for i in range(n_programs):
+        c = i % n_channels
+        # Fora de ordem dentro do canal para exercitar o merge ordenado
+        hour = (i * 7) % 24
+        parts.append(
+            f'  <programme start="202501{1 + (i % 28):02d}{hour:02d}0000 +0000" '
+            f'stop="202501{1 + (i % 28):02d}{hour:02d}3000 +0000" channel="ch{c}">'
+            f"<title>Programa {i}</title><desc>Descrição &amp; detalhes {i}</desc></programme>\n"
+        )
+        if i == n_programs // 2:
+            parts.append('  <channel id="late"><display-name>Tardio</display-name></channel>\n')
+    parts.append("</tv>\n")
+    return "".join(parts)
+
+
+def _ingest(path):
+    async def scenario():
+        return await epg._ingest_file(path)
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def parallel(monkeypatch):
+    monkeypatch.setattr(epg, "EPG_INGEST_PROCESSES", 2)
+    monkeypatch.setattr(epg, "EPG_INGEST_MIN_BYTES", 0)
+    monkeypatch.setattr(epg, "_INGEST_CHUNKS_PER_PROCESS", 4)
+    yield
+    cpu_executor.shutdown()
+
+
+def test_parallel_ingest_matches_sequential_parse(tmp_path, parallel):
+    path = tmp_path / "guide.xml"
+    path.write_text(_guide(5, 400), encoding="utf-8")
+    expected = epg._parse_path(path)
+    channels, programs, content_hash, epochs = _ingest(path)
+    assert content_hash == expected[2]
+    assert epochs == expected[3]
+    assert list(channels.items()) == list(expected[0].items())
+    assert list(programs.keys()) == list(expected[1].keys())
+    assert programs == expected[1]
+    assert "late" in channels
+
+
+def test_split_plan_starts_each_range_at_programme(tmp_path):
+    path = tmp_path / "guide.xml"
+    path.write_text(_guide(3, 100), encoding="utf-8")
+    ranges, declaration, _ = epg._plan_ingest(path, 6)
+    assert declaration == b'<?xml version="1.0" encoding="UTF-8"?>'
+    data = path.read_bytes()
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    for start, end in ranges[1:]:
+        assert data[start:start + len(b"<programme ")] == b"<programme "
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+def test_parallel_ingest_falls_back_when_document_cannot_be_split(tmp_path, parallel):
+    doctype = '<!DOCTYPE tv [<!ENTITY rede "Rede X">]>\n'
+    text = _guide(2, 50, doctype=doctype).replace("Programa 40<", "&rede; 40<")
+    path = tmp_path / "entities.xml"
+    path.write_text(text, encoding="utf-8")
+    channels, programs, _, _ = _ingest(path)
+    titles = [p["title"] for lst in programs.values() for p in lst]
+    assert "Rede X 40" in titles
+    assert programs == epg._parse_path(path)[1]
+
+
+@pytest.mark.benchmark
+def test_benchmark_parallel_ingest_scaling(tmp_path, monkeypatch, bench):
+    path = tmp_path / "big.xml"
+    path.write_text(_guide(500, 400_000), encoding="utf-8")
+    size_mb = path.stat().st_size / 1e6
+    expected = []
+    sequential = bench.seconds(lambda: expected.extend(epg._parse_path(path)))
+    monkeypatch.setattr(epg, "EPG_INGEST_MIN_BYTES", 0)
+    cores = os.cpu_count() or 1
+    try:
+        for processes in sorted({2, 4, cores}):
+            if processes > cores:
+                continue
+            monkeypatch.setattr(epg, "EPG_INGEST_PROCESSES", processes)
+            result = []
+            elapsed = bench.seconds(lambda: result.extend(_ingest(path)))
+            # Só relata o ganho: depende dos núcleos livres da máquina
+            bench.compare(
+                f"XMLTV {size_mb:.0f} MB, {processes} processos",
+                ("sequencial", sequential),
+                ("paralelo", elapsed),
+                unit="s",
+                min_ratio=0.0,
+            )
+            assert result[1] == expected[1]
+    finally:
+        cpu_executor.shutdown()
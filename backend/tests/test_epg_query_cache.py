@@ -0,0 +1,89 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import epg as epg_router
+from app.services import epg
+from app.services.cache import LRUCache
+
+
+client = TestClient(app)
+
+
+def _write_guide(path):
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n<tv>'
+        '<channel id="q.one"><display-name>Q</display-name></channel>'
+        '<programme start="20250101060000 +0000" stop="20250101070030 +0000" channel="q.one"><title>Manhã</title></programme>'
+        '<programme start="20250101070030 +0000" stop="20250101080000 +0000" channel="q.one"><title>Jornal</title></programme>'
+        "</tv>\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def _setup(tmp_path, monkeypatch, max_bytes=1024 * 1024):
+    monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=60))
+    cache = LRUCache("epg_query_test", max_bytes=max_bytes, ttl=60)
+    monkeypatch.setattr(epg_router, "_QUERY_CACHE", cache)
+    monkeypatch.setenv("EPG_SOURCE", _write_guide(tmp_path / "guide.xml"))
+    return cache
+
+
+def test_purge_expired_removes_entries_proactively():
+    cache = LRUCache("purge_test", max_bytes=1000, ttl=60)
+    cache.set("velha", 1, size=10, ttl=-1)
+    cache.set("nova", 2, size=10)
+    assert cache.purge_expired() == 1
+    assert "velha" not in cache and "nova" in cache
+    assert cache.stats()["bytes"] == 10
+
+
+def test_nearby_windows_share_one_slot_aligned_entry(tmp_path, monkeypatch):
+    cache = _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(epg_router, "EPG_QUERY_SLOT_SECONDS", 60)
+    r1 = client.get("/catalog/epg", params={"start": "2025-01-01T07:00:40Z", "end": "2025-01-01T07:30:10Z"})
+    r2 = client.get("/catalog/epg", params={"start": "2025-01-01T07:00:05Z", "end": "2025-01-01T07:30:59Z"})
+    assert r1.status_code == r2.status_code == 200
+    assert r1.headers["ETag"] == r2.headers["ETag"]
+    assert len(cache) == 1
+    # O filtro usa a janela alinhada (07:00–07:31): "Manhã" termina às 07:00:30
+    assert [p["title"] for p in r1.json()["programs"]["q.one"]] == ["Manhã", "Jornal"]
+
+
+def test_snapping_keeps_instants_at_the_datetime_limits(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(epg_router, "EPG_QUERY_SLOT_SECONDS", 60)
+    r = client.get("/catalog/epg", params={"start": "0001-01-01T00:00:30Z", "end": "9999-12-31T23:59:30Z"})
+    assert r.status_code == 200
+    assert [p["title"] for p in r.json()["programs"]["q.one"]] == ["Manhã", "Jornal"]
+
+
+def test_windows_are_exact_without_slots(tmp_path, monkeypatch):
+    cache = _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(epg_router, "EPG_QUERY_SLOT_SECONDS", 0)
+    r1 = client.get("/catalog/epg", params={"start": "2025-01-01T07:00:40Z", "end": "2025-01-01T07:30:10Z"})
+    r2 = client.get("/catalog/epg", params={"start": "2025-01-01T07:00:05Z", "end": "2025-01-01T07:30:59Z"})
+    assert [p["title"] for p in r1.json()["programs"]["q.one"]] == ["Jornal"]
+    assert [p["title"] for p in r2.json()["programs"]["q.one"]] == ["Manhã", "Jornal"]
+    assert r1.headers["ETag"] != r2.headers["ETag"]
+    assert len(cache) == 2
+
+
+def test_query_cache_respects_byte_budget(tmp_path, monkeypatch):
+    cache = _setup(tmp_path, monkeypatch, max_bytes=2000)
+    for minute in range(10):
+        r = client.get("/catalog/epg", params={"start": f"2025-01-01T06:{minute:02d}:00Z"})
+        assert r.status_code == 200
+    stats = cache.stats()
+    assert stats["bytes"] <= 2000
+    assert stats["evictions"] > 0
+    assert 0 < stats["entries"] < 10
+
+
+def test_expired_queries_are_purged_on_later_requests(tmp_path, monkeypatch):
+    cache = _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(epg_router, "_last_purge", 0.0)
+    cache.set("consulta-antiga", ({}, "x"), size=100, ttl=-1)
+    assert client.get("/catalog/epg", params={"limit_per_channel": 1}).status_code == 200
+    assert "consulta-antiga" not in cache
+    assert epg_router._last_purge > 0
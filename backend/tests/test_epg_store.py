@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+
+from app.services import epg, epg_store, snapshot, xmltv_time
+from app.services.cache import LRUCache
+
+
+GUIDE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n<tv>'
+    '<channel id="Col.One"><display-name>Coluna Um</display-name><icon src="http://logo/1.png"/></channel>'
+    '<channel id="col.two"><display-name>Coluna Dois</display-name></channel>'
+    '<programme start="20250101090000 +0000" stop="20250101100000 +0000" channel="Col.One"><title>B</title></programme>'
+    '<programme start="20250101080000 +0000" stop="20250101093000 +0000" channel="Col.One">'
+    "<title>A</title><desc>Notícias</desc></programme>"
+    '<programme start="20250101100000 -0300" stop="20250101110000 -0300" channel="Col.One"><title>C</title></programme>'
+    '<programme start="invalido" channel="Col.One"><title>Sem hora</title></programme>'
+    '<programme start="20250101080000" stop="20250101090000" channel="orphan"><title>Órfão</title></programme>'
+    "</tv>\n"
+)
+
+
+def _parsed():
+    parser = epg.XMLTVStreamParser()
+    parser.feed(GUIDE.encode("utf-8"))
+    channels, programs = parser.close()
+    return channels, programs, parser.content_hash
+
+
+def test_compiled_store_matches_normalized_guide(tmp_path):
+    channels, programs, content_hash = _parsed()
+    path = epg_store.compile_store(tmp_path / "g.epgcol", channels, programs, content_hash)
+    store = epg_store.EPGStore(path)
+    mapped = epg_store.StorePrograms(store)
+
+    assert store.content_hash == content_hash
+    assert mapped.channels() == channels
+    assert dict(mapped) == programs
+    indexes = mapped.indexes()
+    for cid, lst in programs.items():
+        index = epg.ProgramIndex(lst)
+        assert len(indexes[cid.lower()]) == len(index)
+        for ts in (0, 1735718400, 1735720200, 1735722000, 1735740000, 1735747200, 1735750800, 2 ** 40):
+            for offset in (-1, 0, 0.5, 1):
+                assert indexes[cid.lower()].now_next(ts + offset) == index.now_next(ts + offset)
+
+
+def test_indexes_reuse_epochs_from_the_parse(tmp_path, monkeypatch):
+    channels, programs, content_hash = _parsed()
+    parser = epg.XMLTVStreamParser()
+    parser.feed(GUIDE.encode("utf-8"))
+    parser.close()
+    assert parser.epochs == {iso: int(xmltv_time.iso_to_epoch(iso)) for iso in parser.epochs}
+    expected_index = {cid: epg.ProgramIndex(lst).to_state(lst) for cid, lst in programs.items()}
+    expected_body = epg.EPGFragments(channels, programs).render(None, None, None, 0)
+
+    def reparse(iso_str):
+        raise AssertionError(f"horário reconvertido: {iso_str}")
+
+    # Com a tabela do parser, índices, fragmentos e guia compilado não reconvertem ISO
+    monkeypatch.setattr(xmltv_time, "iso_to_epoch", reparse)
+    assert {cid: epg.ProgramIndex(lst, parser.epochs).to_state(lst) for cid, lst in programs.items()} == expected_index
+    assert epg.EPGFragments(channels, programs, parser.epochs).render(None, None, None, 0) == expected_body
+    path = epg_store.compile_store(tmp_path / "g.epgcol", channels, programs, content_hash, parser.epochs)
+    assert dict(epg_store.StorePrograms(epg_store.EPGStore(path))) == programs
+
+
+def test_workers_share_one_compiled_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(epg_store, "EPG_STORE_DIR", str(tmp_path / "store"))
+    src_path = tmp_path / "guide.xml"
+    src_path.write_text(GUIDE, encoding="utf-8")
+    src = str(src_path)
+    calls = {"n": 0}
+    original = epg._ingest_file
+
+    async def counting(path):
+        calls["n"] += 1
+        return await original(path)
+
+    monkeypatch.setattr(epg, "_ingest_file", counting)
+    channels, programs, _ = _parsed()
+
+    async def load():
+        # Cache vazio a cada chamada: simula workers diferentes
+        monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=60))
+        return await epg.load_epg_data(src), await epg.get_channel_epg(src, "Col.One")
+
+    first, one = asyncio.run(load())
+    second, _ = asyncio.run(load())
+
+    assert calls["n"] == 1
+    assert first.store is not None and second.store.path == first.store.path
+    # JSON de /catalog/epg também vem do arquivo mapeado
+    assert all(isinstance(blob, memoryview) for blob in first.fragments.blobs)
+    assert len(list((tmp_path / "store").iterdir())) == 1
+    assert one == {"channel": channels["Col.One"], "programs": programs["Col.One"]}
+    assert first.channels == channels
+    assert asyncio.run(epg.get_epg(src))["programs"] == programs
+
+
+def test_snapshot_points_to_compiled_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(epg_store, "EPG_STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path / "snap"))
+    monkeypatch.setattr(epg, "SNAPSHOT_REFRESH_ON_START", False)
+    monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=60))
+    src_path = tmp_path / "guide.xml"
+    src_path.write_text(GUIDE, encoding="utf-8")
+    src = str(src_path)
+
+    async def first_run():
+        data = await epg.load_epg_data(src)
+        await snapshot.flush_snapshots()
+        return data
+
+    original = asyncio.run(first_run())
+    monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=60))
+    assert asyncio.run(epg.restore_snapshots()) == 1
+    restored = epg._CACHE.peek(src).value
+    assert restored.store.path == original.store.path
+    assert restored.channels == original.channels
+    assert dict(restored.programs) == dict(original.programs)
+
+
+def test_prune_uses_configured_retention(tmp_path, monkeypatch):
+    monkeypatch.setattr(epg_store, "EPG_STORE_RETENTION_SECONDS", 3600)
+    keep = tmp_path / f"epg-atual{epg_store._SUFFIX}"
+    keep.write_bytes(b"")
+    now = time.time()
+    for name, age in (("recente", 600), ("antigo", 7200)):
+        path = tmp_path / f"epg-{name}{epg_store._SUFFIX}"
+        path.write_bytes(b"")
+        os.utime(path, (now - age, now - age))
+    assert epg_store.prune(keep) == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == [keep.name, f"epg-recente{epg_store._SUFFIX}"]
@@ -0,0 +1,66 @@
+import re
+
+import pytest
+
+from app.services.m3u import _parse_extinf
+
+
+def _regex_parse_extinf(line):
+    # Implementação anterior (duas passadas com regex), usada como referência
+    attrs = {}
+    for key, val in re.findall(r'([\w-]+)="(.*?)"', line):
+        attrs[key] = val
+    name_match = re.search(r",\s*(.*)$", line)
+    name = name_match.group(1).strip() if name_match else ""
+    return attrs, name
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        '#EXTINF:-1 tvg-id="cnn.us" tvg-name="CNN" tvg-logo="http://logo/cnn.png" group-title="News",CNN HD',
+        '#EXTINF:-1 tvg-id="" group-title="",  Canal Vazio  ',
+        "#EXTINF:-1,Somente Nome",
+        '#EXTINF:0 tvg_chno="7" catchup-days="3",Sete',
+        '#EXTINF:-1 tvg-id="x",Nome, com vírgula',
+        "#EXTINF:-1",
+        '#EXTINF:-1 a="1"b="2"\tc-d="3",Colados',
+    ],
+)
+def test_tokenizer_matches_regex_on_regular_lines(line):
+    assert _parse_extinf(line) == _regex_parse_extinf(line)
+
+
+def test_commas_inside_quoted_values():
+    attrs, name = _parse_extinf(
+        '#EXTINF:-1 tvg-id="a.b" tvg-name="Filmes, Séries e Mais" group-title="VOD, Ação",Filme X (2020)'
+    )
+    assert attrs == {"tvg-id": "a.b", "tvg-name": "Filmes, Séries e Mais", "group-title": "VOD, Ação"}
+    assert name == "Filme X (2020)"
+
+
+def test_unterminated_quote_and_bare_quotes():
+    assert _parse_extinf('#EXTINF:-1 tvg-id="broken,Nome') == ({}, "Nome")
+    assert _parse_extinf('#EXTINF:-1 tvg-id="broken,Nome') == _regex_parse_extinf('#EXTINF:-1 tvg-id="broken,Nome')
+    assert _parse_extinf('#EXTINF:-1 tvg-name="A, B" tvg-id="broken, Nome ') == ({"tvg-name": "A, B"}, "Nome")
+    assert _parse_extinf('#EXTINF:-1 tvg-id="broken') == ({}, "")
+    assert _parse_extinf('#EXTINF:-1 "solto" tvg-id="ok",Nome') == ({"tvg-id": "ok"}, "Nome")
+
+
+@pytest.mark.benchmark
+def test_benchmark_extinf_tokenizer(bench):
+    lines = [
+        f'#EXTINF:-1 tvg-id="ch{i}.br" tvg-name="Canal {i}" tvg-logo="http://logo.example.com/{i}.png" '
+        f'group-title="Grupo {i % 50}",Canal {i} HD'
+        for i in range(500_000)
+    ]
+
+    def parse_all(fn):
+        for line in lines:
+            fn(line)
+
+    bench.compare(
+        "500k #EXTINF",
+        ("regex", bench.seconds(parse_all, _regex_parse_extinf)),
+        ("tokenizer", bench.seconds(parse_all, _parse_extinf)),
+    )
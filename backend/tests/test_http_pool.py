@@ -0,0 +1,84 @@
+import asyncio
+
+from app.services.http_pool import HTTPClientPool
+
+
+def test_pool_reuses_clients_per_outbound_config_and_closes():
+    async def scenario():
+        pool = HTTPClientPool()
+        a = pool.get()
+        b = pool.get()
+        c = pool.get("http://proxy.local:3128")
+        assert a is b
+        assert c is not a
+        await pool.aclose()
+        assert a.is_closed and c.is_closed
+        # Após fechar, um novo cliente é criado sob demanda
+        d = pool.get()
+        assert d is not a and not d.is_closed
+        await pool.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_host_slot_limits_concurrency(monkeypatch):
+    from app.services import http_pool
+
+    monkeypatch.setattr(http_pool, "PROXY_MAX_CONNECTIONS_PER_HOST", 2)
+
+    async def scenario():
+        pool = HTTPClientPool()
+        active = {"now": 0, "max": 0}
+
+        async def worker():
+            async with pool.host_slot("cdn.example.com"):
+                active["now"] += 1
+                active["max"] = max(active["max"], active["now"])
+                await asyncio.sleep(0.01)
+                active["now"] -= 1
+
+        await asyncio.gather(*(worker() for _ in range(6)))
+        return active["max"]
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_idle_host_slots_are_evicted(monkeypatch):
+    from app.services import http_pool
+
+    monkeypatch.setattr(http_pool, "PROXY_MAX_CONNECTIONS_PER_HOST", 1)
+
+    async def scenario():
+        pool = HTTPClientPool()
+
+        async def worker(host):
+            async with pool.host_slot(host):
+                await asyncio.sleep(0.01)
+
+        busy = asyncio.ensure_future(asyncio.gather(worker("a.example.com"), worker("a.example.com")))
+        await asyncio.gather(*(worker(f"cdn{i}.example.com") for i in range(50)))
+        # Só o host com requisições em andamento/aguardando mantém o semáforo
+        assert set(pool._host_slots) == {"a.example.com"}
+        await busy
+        return pool._host_slots, pool._host_users
+
+    assert asyncio.run(scenario()) == ({}, {})
+
+
+def test_clients_from_a_previous_loop_are_closed():
+    pool = HTTPClientPool()
+
+    async def first():
+        return pool.get(), pool.get("http://proxy.local:3128")
+
+    old = asyncio.run(first())
+
+    async def second():
+        client = pool.get()
+        await asyncio.sleep(0)
+        await asyncio.gather(*pool._closing)
+        await pool.aclose()
+        return client
+
+    assert asyncio.run(second()) not in old
+    assert all(client.is_closed for client in old)
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from app.services import m3u
+from app.services.cache import LRUCache
+
+
+def _write_playlist(path, name):
+    path.write_text(
+        "#EXTM3U\n"
+        f'#EXTINF:-1 tvg-id="{name}" group-title="News",{name}\n'
+        f"http://stream.example.com/{name}.m3u8\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_lru_cache_evicts_least_recently_used_by_bytes():
+    cache = LRUCache("test_lru", max_bytes=10, ttl=60)
+    cache.set("a", "A", size=4)
+    cache.set("b", "B", size=4)
+    assert cache.get("a") == "A"  # "a" passa a ser o mais recente
+    cache.set("c", "C", size=4)
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 8
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_lru_cache_ttl_and_oversized_entries():
+    cache = LRUCache("test_lru_ttl", max_bytes=10, ttl=60)
+    cache.set("short", "S", size=1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    # Entrada expirada ainda pode ser inspecionada via peek
+    assert cache.peek("short") is not None
+    cache.set("huge", "H", size=11)
+    assert "huge" not in cache
+
+
+def test_load_m3u_keeps_multiple_sources_warm(tmp_path, monkeypatch):
+    monkeypatch.setattr(m3u, "_CACHE", LRUCache("m3u_test", max_bytes=1024 * 1024, ttl=60))
+    src_a = _write_playlist(tmp_path / "a.m3u", "alpha")
+    src_b = _write_playlist(tmp_path / "b.m3u", "beta")
+
+    async def scenario():
+        for _ in range(3):
+            a = await m3u.load_m3u_channels(src_a)
+            b = await m3u.load_m3u_channels(src_b)
+        return a, b
+
+    a, b = asyncio.run(scenario())
+    assert a[0]["name"] == "alpha"
+    assert b[0]["name"] == "beta"
+    stats = m3u._CACHE.stats()
+    assert stats["entries"] == 2
+    assert stats["misses"] == 2
+    assert stats["hits"] == 4
+
+
+def test_concurrent_loads_share_one_fetch(tmp_path, monkeypatch):
+    monkeypatch.setattr(m3u, "_CACHE", LRUCache("m3u_test", max_bytes=1024 * 1024, ttl=60))
+    src = _write_playlist(tmp_path / "herd.m3u", "gamma")
+    calls = {"n": 0}
+    original = m3u._fetch_m3u
+
+    async def slow_fetch(source, validators=None):
+        calls["n"] += 1
+        await asyncio.sleep(0.01)
+        return await original(source, validators)
+
+    monkeypatch.setattr(m3u, "_fetch_m3u", slow_fetch)
+    coalesced_before = m3u._FLIGHT.coalesced
+
+    async def scenario():
+        return await asyncio.gather(*(m3u.load_m3u_text(src) for _ in range(10)))
+
+    texts = asyncio.run(scenario())
+    assert calls["n"] == 1
+    assert len(set(texts)) == 1
+    assert m3u._FLIGHT.coalesced - coalesced_before == 9
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import threading
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import m3u
+from app.services.cache import LRUCache
+
+
+PLAYLIST = (
+    "#EXTM3U\r\n"
+    '#EXTINF:-1 tvg-id="one" tvg-logo="http://logo/1.png" group-title="News",One\r\n'
+    "http://stream.example.com/one.m3u8\r\n"
+    "\r\n"
+    '#EXTINF:-1 tvg-id="two" group-title="Sports",Two\n'
+    "   http://stream.example.com/two.m3u8   \n"
+    "#EXTINF:-1,Three\n"
+)
+
+
+def _legacy_parse(text):
+    # Implementação anterior (lista de linhas), usada como referência
+    channels = []
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("#EXTINF"):
+            attrs, name = m3u._parse_extinf(line)
+            url = ""
+            if i + 1 < len(lines):
+                url = lines[i + 1]
+                i += 1
+            channels.append(
+                {
+                    "name": name,
+                    "url": url,
+                    "tvg_id": attrs.get("tvg-id"),
+                    "group": attrs.get("group-title"),
+                    "logo": attrs.get("tvg-logo"),
+                    "raw_extinf": line,
+                }
+            )
+        i += 1
+    return channels
+
+
+def test_stream_parser_matches_legacy_at_every_split():
+    expected = _legacy_parse(PLAYLIST)
+    assert [c["name"] for c in expected] == ["One", "Two", "Three"]
+    assert m3u.parse_m3u(PLAYLIST) == expected
+    for cut in range(len(PLAYLIST) + 1):
+        parser = m3u.M3UStreamParser()
+        out = parser.feed(PLAYLIST[:cut]) + parser.feed(PLAYLIST[cut:]) + parser.close()
+        assert out == expected, cut
+
+
+def test_iter_channels_streams_remote_body(monkeypatch):
+    monkeypatch.setattr(m3u, "_CACHE", LRUCache("m3u_test", max_bytes=1024 * 1024, ttl=60))
+    body = PLAYLIST.encode("utf-8")
+
+    async def chunks():
+        for i in range(0, len(body), 7):
+            yield body[i:i + 7]
+
+    def handler(request):
+        return httpx.Response(200, content=chunks())
+
+    real_client = httpx.AsyncClient
+
+    def factory(*args, **kwargs):
+        kwargs["transport"] = httpx.MockTransport(handler)
+        return real_client(*args, **kwargs)
+
+    monkeypatch.setattr(m3u.httpx, "AsyncClient", factory)
+
+    async def scenario():
+        return [ch async for ch in m3u.iter_m3u_channels("http://provider.example.com/list.m3u")]
+
+    assert asyncio.run(scenario()) == _legacy_parse(PLAYLIST)
+
+
+def test_iter_channels_reads_local_file_off_the_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(m3u, "_CACHE", LRUCache("m3u_test", max_bytes=1024 * 1024, ttl=60))
+    monkeypatch.setattr(m3u, "_CHUNK_SIZE", 16)
+    path = tmp_path / "local.m3u"
+    path.write_text(PLAYLIST, encoding="utf-8", newline="")
+    on_loop = set()
+    read_and_feed = m3u._read_and_feed
+
+    def tracking(f, parser):
+        on_loop.add(threading.current_thread() is threading.main_thread())
+        return read_and_feed(f, parser)
+
+    monkeypatch.setattr(m3u, "_read_and_feed", tracking)
+
+    async def collect():
+        return [ch async for ch in m3u.iter_m3u_channels(str(path))]
+
+    assert [ch["name"] for ch in asyncio.run(collect())] == ["One", "Two", "Three"]
+    assert on_loop == {False}
+    # Streaming não preenche o cache (não guarda o texto inteiro)
+    assert str(path) not in m3u._CACHE
+
+
+def test_channels_stream_endpoint_ndjson(tmp_path, monkeypatch):
+    monkeypatch.setattr(m3u, "_CACHE", LRUCache("m3u_test", max_bytes=1024 * 1024, ttl=60))
+    path = tmp_path / "stream.m3u"
+    path.write_text(PLAYLIST, encoding="utf-8", newline="")
+    monkeypatch.setenv("M3U_SOURCE", str(path))
+    client = TestClient(app)
+    r = client.get("/catalog/channels/stream")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["name"] for row in rows] == ["One", "Two", "Three"]
+    assert rows[0] == {
+        "name": "One",
+        "url": "http://stream.example.com/one.m3u8",
+        "tvg_id": "one",
+        "group": "News",
+        "logo": "http://logo/1.png",
+    }
+    assert rows[2]["url"] == ""
+
+
+def test_channels_stream_missing_source(monkeypatch):
+    monkeypatch.setenv("M3U_SOURCE", "does-not-exist.m3u")
+    client = TestClient(app)
+    r = client.get("/catalog/channels/stream")
+    assert r.status_code == 500
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from app.routers.catalog import _rewrite_hls_playlist
+from app.services.manifest_cache import ManifestCache
+
+
+PLAYLIST = """#EXTM3U
+#EXT-X-TARGETDURATION:4
+#EXT-X-KEY:METHOD=AES-128,URI="key.bin"
+#EXTINF:4,
+seg1.ts
+#EXTINF:4,
+https://other.example.com/seg2.ts
+"""
+
+
+def test_rewrite_reports_resources_and_target_duration():
+    body, resources, target_duration = _rewrite_hls_playlist(PLAYLIST, "http://cdn.example.com/live/index.m3u8")
+    assert target_duration == 4
+    assert resources == ["http://cdn.example.com/live/seg1.ts", "https://other.example.com/seg2.ts"]
+    assert 'URI="/catalog/proxy?url=http%3A%2F%2Fcdn.example.com%2Flive%2Fkey.bin"' in body
+    assert "/catalog/proxy?url=http%3A%2F%2Fcdn.example.com%2Flive%2Fseg1.ts" in body
+
+
+def test_manifest_ttl_is_fraction_of_target_duration():
+    cache = ManifestCache(max_bytes=1024)
+    cache.put("http://a/live.m3u8", "#EXTM3U", target_duration=0.04)
+    assert cache.get("http://a/live.m3u8") == "#EXTM3U"
+    time.sleep(0.03)
+    assert cache.get("http://a/live.m3u8") is None
+    stats = cache.cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_concurrent_manifest_requests_are_coalesced():
+    cache = ManifestCache(max_bytes=1024)
+    calls = {"n": 0}
+
+    async def fetch():
+        calls["n"] += 1
+        await asyncio.sleep(0.01)
+        return "#EXTM3U"
+
+    async def scenario():
+        return await asyncio.gather(*(cache.coalesce("http://a/live.m3u8", fetch) for _ in range(20)))
+
+    assert asyncio.run(scenario()) == ["#EXTM3U"] * 20
+    assert calls["n"] == 1
@@ -66,3 +66,76 @@ def test_enriched_channels_include_now():
     # Pelo menos um item deve conter current ou next
     assert any((it.get("current") is not None or it.get("next") is not None) for it in data)
 
+
+def test_enriched_include_now_matches_now_endpoint_in_single_pass(monkeypatch):
+    from app.services import catalog as catalog_service
+
+    calls = {"m3u": 0, "epg": 0}
+    orig_m3u = catalog_service.load_m3u_entry
+    orig_epg = catalog_service.load_epg_data
+
+    async def count_m3u(*args, **kwargs):
+        calls["m3u"] += 1
+        return await orig_m3u(*args, **kwargs)
+
+    async def count_epg(*args, **kwargs):
+        calls["epg"] += 1
+        return await orig_epg(*args, **kwargs)
+
+    monkeypatch.setattr(catalog_service, "load_m3u_entry", count_m3u)
+    monkeypatch.setattr(catalog_service, "load_epg_data", count_epg)
+    # Minuto ainda não materializado por outros testes
+    params = {"include_now": True, "time": "2025-01-01T08:31:00Z"}
+    r = client.get("/catalog/channels/enriched", params=params)
+    assert r.status_code == 200
+    assert calls == {"m3u": 1, "epg": 1}
+
+    now = client.get("/catalog/now", params={"time": params["time"]}).json()
+    now_by_id = {it["tvg_id"]: it for it in now}
+    for ch in r.json():
+        if ch["tvg_id"] in now_by_id:
+            assert ch["current"] == now_by_id[ch["tvg_id"]]["current"]
+            assert ch["next"] == now_by_id[ch["tvg_id"]]["next"]
+
+
+def test_enriched_view_is_materialized_and_supports_etag():
+    from app.services import catalog as catalog_service
+
+    params = {"include_now": True, "time": "2025-01-01T08:45:10Z"}
+    r1 = client.get("/catalog/channels/enriched", params=params)
+    assert r1.status_code == 200
+    etag = r1.headers.get("ETag")
+    assert etag
+    hits_before = catalog_service._VIEW_CACHE.hits
+    # Mesmo instante de referência: servido da visão materializada
+    r2 = client.get("/catalog/channels/enriched", params=params)
+    assert r2.status_code == 200
+    assert r2.content == r1.content
+    assert catalog_service._VIEW_CACHE.hits == hits_before + 1
+    # Instante explícito é exato (não arredondado ao minuto): outra visão
+    r_other = client.get("/catalog/channels/enriched", params={**params, "time": "2025-01-01T08:45:50Z"})
+    assert r_other.headers["ETag"] != etag
+    assert catalog_service._VIEW_CACHE.hits == hits_before + 1
+
+    r3 = client.get("/catalog/channels/enriched", params=params, headers={"If-None-Match": f'"x", {etag}'})
+    assert r3.status_code == 304
+    assert r3.headers["ETag"] == etag
+
+
+def test_enriched_explicit_time_is_not_rounded_to_the_minute(tmp_path, monkeypatch):
+    guide = tmp_path / "guide.xml"
+    guide.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n<tv><channel id="seg.one"><display-name>Um</display-name></channel>'
+        '<programme start="20250101080000 +0000" stop="20250101085945 +0000" channel="seg.one"><title>A</title></programme>'
+        '<programme start="20250101085945 +0000" stop="20250101100000 +0000" channel="seg.one"><title>B</title></programme>'
+        "</tv>\n",
+        encoding="utf-8",
+    )
+    playlist = tmp_path / "list.m3u"
+    playlist.write_text('#EXTM3U\n#EXTINF:-1 tvg-id="seg.one",Um\nhttp://example.com/1.m3u8\n', encoding="utf-8")
+    monkeypatch.setenv("M3U_SOURCE", str(playlist))
+    monkeypatch.setenv("EPG_SOURCE", str(guide))
+    params = {"include_now": True, "time": "2025-01-01T08:59:50Z"}
+    enriched = client.get("/catalog/channels/enriched", params=params).json()
+    now = client.get("/catalog/now", params={"time": params["time"]}).json()
+    assert enriched[0]["current"]["title"] == now[0]["current"]["title"] == "B"
@@ -0,0 +1,129 @@
+import asyncio
+import gc
+import random
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services import catalog, epg, epg_store, m3u, now_next
+from app.services.cache import LRUCache
+
+
+BASE = 1735689600  # 2025-01-01T00:00:00Z
+
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _guide(n_channels: int, per_channel: int, seed: int = 7):
+    rnd = random.Random(seed)
+    channels, programs = {}, {}
+    for c in range(n_channels):
+        cid = f"Canal.{c}"
+        channels[cid] = {"id": cid, "name": f"Canal {c}", "icon": None}
+        lst = []
+        ts = BASE + rnd.randrange(0, 3600)
+        for p in range(per_channel):
+            length = rnd.choice((900, 1800, 3600))
+            # Sobreposições, buracos e itens sem horário
+            start = ts - rnd.choice((0, 0, 0, 600))
+            lst.append({"title": f"{c}-{p}", "description": None, "start": _iso(start), "stop": _iso(start + length)})
+            ts = start + length + rnd.choice((0, 0, 300))
+        if c % 5 == 0:
+            lst.append({"title": "sem hora", "description": None, "start": None, "stop": None})
+        programs[cid] = lst
+    return channels, programs
+
+
+def _per_channel(data, keys, ts):
+    out = []
+    for k in keys:
+        ix = data.index.get(k)
+        out.append(ix.now_next(ts) if ix is not None else (None, None))
+    return out
+
+
+def _times(count: int = 60):
+    rnd = random.Random(3)
+    return [BASE - 100, BASE + 900, BASE + 36000.5] + [BASE + rnd.uniform(0, 30000) for _ in range(count)]
+
+
+def test_vectorized_matches_per_channel_lookup():
+    pytest.importorskip("numpy")
+    channels, programs = _guide(40, 30)
+    data = epg._build_epg_data(channels, programs)
+    keys = [k.lower() for k in programs] + ["desconhecido"]
+    times = _times()
+    batch = now_next.NowNextTable(data.index).lookup_many(keys, times)
+    assert len(batch) == len(times)
+    for ts, row in zip(times, batch):
+        assert row == _per_channel(data, keys, ts)
+
+
+def test_vectorized_reads_compiled_store(tmp_path):
+    pytest.importorskip("numpy")
+    channels, programs = _guide(10, 20)
+    path = epg_store.compile_store(tmp_path / "g.epgcol", channels, programs, "ab" * 32)
+    data, _ = epg._data_from_store(epg_store.EPGStore(path), None)
+    keys = list(data.index)
+    table = now_next.NowNextTable(data.index)
+    for ts in _times(20):
+        assert table.lookup(keys, ts) == _per_channel(data, keys, ts)
+
+
+def test_fallback_without_numpy(monkeypatch):
+    channels, programs = _guide(5, 10)
+    data = epg._build_epg_data(channels, programs)
+    keys = list(data.index)
+    monkeypatch.setattr(now_next, "_NUMPY_AVAILABLE", False)
+    assert now_next.now_next_all(data, keys, BASE + 1000) == _per_channel(data, keys, BASE + 1000)
+    assert data.now_next_table is None
+
+
+
+def test_now_lookup_runs_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(epg, "_CACHE", LRUCache("epg_test", max_bytes=1024 * 1024, ttl=60))
+    monkeypatch.setattr(m3u, "_CACHE", LRUCache("m3u_test", max_bytes=1024 * 1024, ttl=60))
+    guide = tmp_path / "guide.xml"
+    guide.write_text(
+        '<?xml version="1.0"?><tv><channel id="a.one"><display-name>A</display-name></channel>'
+        '<programme start="20250101080000 +0000" stop="20250101090000 +0000" channel="a.one">'
+        "<title>Manhã</title></programme></tv>",
+        encoding="utf-8",
+    )
+    playlist = tmp_path / "list.m3u"
+    playlist.write_text('#EXTM3U\n#EXTINF:-1 tvg-id="A.one",A\nhttp://stream/a\n', encoding="utf-8")
+    threads = []
+    original = catalog.now_next_all
+
+    def recording(*args):
+        threads.append(threading.current_thread().name)
+        return original(*args)
+
+    monkeypatch.setattr(catalog, "now_next_all", recording)
+    at = datetime(2025, 1, 1, 8, 30, tzinfo=timezone.utc)
+    items = asyncio.run(catalog.get_now(str(playlist), str(guide), ref_time=at))
+    assert items[0]["current"]["title"] == "Manhã"
+    # Tabela (criada sob demanda) e consulta rodam no executor CPU-bound
+    assert threads and all(name.startswith("cpu") for name in threads)
+
+
+@pytest.mark.benchmark
+def test_benchmark_vectorized_now_next(bench):
+    pytest.importorskip("numpy")
+    channels, programs = _guide(5000, 200)
+    data = epg._build_epg_data(channels, programs)
+    keys = list(data.index)
+    times = [BASE + 3600 * h for h in range(24)]
+    table = now_next.NowNextTable(data.index)
+    # O milhão de dicts do guia sintético faria as coletas do GC dominarem as duas medições
+    gc.collect()
+    gc.freeze()
+    try:
+        legacy = bench.seconds(lambda: [_per_channel(data, keys, ts) for ts in times])
+        current = bench.seconds(table.lookup_many, keys, times)
+    finally:
+        gc.unfreeze()
+    bench.compare("5000 canais x 24 instantes", ("loop", legacy), ("numpy", current))
@@ -0,0 +1,63 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.services.epg import ProgramIndex
+
+
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _iso(dt):
+    return dt.isoformat()
+
+
+def _brute_force(programs, ts):
+    # Referência: varredura linear sobre os programas ordenados por início
+    rows = sorted(
+        (p for p in programs if p["start"] and p["stop"]),
+        key=lambda p: datetime.fromisoformat(p["start"]),
+    )
+    current = None
+    upcoming = None
+    for p in rows:
+        s = datetime.fromisoformat(p["start"]).timestamp()
+        e = datetime.fromisoformat(p["stop"]).timestamp()
+        if s <= ts < e:
+            current = p
+        if s > ts and upcoming is None:
+            upcoming = p
+    return current, upcoming
+
+
+def test_now_next_matches_linear_scan_with_gaps_and_overlaps():
+    rnd = random.Random(42)
+    programs = []
+    cursor = BASE
+    for i in range(200):
+        start = cursor + timedelta(minutes=rnd.choice([0, 0, 5, -10]))
+        stop = start + timedelta(minutes=rnd.choice([15, 30, 60, 120]))
+        programs.append({"title": f"p{i}", "start": _iso(start), "stop": _iso(stop)})
+        cursor = stop
+    programs.append({"title": "sem horario", "start": None, "stop": None})
+    rnd.shuffle(programs)
+
+    index = ProgramIndex(programs)
+    assert len(index) == 200
+    end = cursor.timestamp()
+    ts = BASE.timestamp() - 600
+    while ts < end + 600:
+        assert index.now_next(ts) == _brute_force(programs, ts)
+        ts += 450
+
+
+def test_now_next_at_boundaries():
+    programs = [
+        {"title": "a", "start": "2025-01-01T08:00:00+00:00", "stop": "2025-01-01T09:00:00+00:00"},
+        {"title": "b", "start": "2025-01-01T09:00:00Z", "stop": "2025-01-01T10:00:00Z"},
+    ]
+    index = ProgramIndex(programs)
+    nine = datetime(2025, 1, 1, 9, tzinfo=timezone.utc).timestamp()
+    current, upcoming = index.now_next(nine)
+    assert current["title"] == "b" and upcoming is None
+    current, upcoming = index.now_next(nine - 1)
+    assert current["title"] == "a" and upcoming["title"] == "b"
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import threading
+
+from app.services import segment_cache
+from app.services.segment_cache import CachedSegment, SegmentCache
+
+
+URL = "http://cdn.example.com/live/seg1.ts"
+
+
+def test_concurrent_misses_produce_a_single_upstream_fetch():
+    cache = SegmentCache(max_bytes=1024 * 1024)
+    calls = {"n": 0}
+
+    async def fetch():
+        calls["n"] += 1
+        await asyncio.sleep(0.01)
+        seg = CachedSegment(body=b"x" * 100, content_type="video/mp2t")
+        await cache.put(URL, seg)
+        return seg
+
+    async def scenario():
+        return await asyncio.gather(*(cache.coalesce(URL, fetch) for _ in range(50)))
+
+    results = asyncio.run(scenario())
+    assert calls["n"] == 1
+    assert all(r.body == b"x" * 100 for r in results)
+    assert cache.flight.coalesced == 49
+    assert asyncio.run(cache.get(URL)).content_type == "video/mp2t"
+
+
+def test_ttl_is_derived_from_target_duration():
+    cache = SegmentCache(max_bytes=1024)
+    cache.register_playlist([URL], target_duration=4)
+    assert cache.ttl_for(URL) == 4 * 6
+    assert cache.ttl_for("http://cdn.example.com/other.ts") == 30
+
+
+def test_disk_tier_serves_after_memory_eviction(tmp_path, monkeypatch):
+    cache = SegmentCache(max_bytes=150, directory=str(tmp_path), disk_max_bytes=10_000)
+    threads = set()
+    read_file = segment_cache._read_file
+
+    def tracking_read(path):
+        threads.add(threading.current_thread() is threading.main_thread())
+        return read_file(path)
+
+    monkeypatch.setattr(segment_cache, "_read_file", tracking_read)
+
+    async def scenario():
+        await cache.put(URL, CachedSegment(body=b"a" * 100, content_type="video/mp2t"))
+        await cache.put(URL + "?2", CachedSegment(body=b"b" * 100, content_type="video/mp2t"))
+        # Primeiro segmento saiu da memória, mas continua no disco
+        assert cache.memory.peek(cache._key(URL)) is None
+        return await cache.get(URL)
+
+    seg = asyncio.run(scenario())
+    assert seg is not None and seg.body == b"a" * 100
+    # Leitura do arquivo fora do event loop
+    assert threads == {False}
+
+
+def test_disk_budget_evicts_files_in_the_worker_directory(tmp_path):
+    cache = SegmentCache(max_bytes=0, directory=str(tmp_path), disk_max_bytes=250)
+
+    async def scenario():
+        for i in range(5):
+            await cache.put(f"{URL}?{i}", CachedSegment(body=b"x" * 100, content_type="video/mp2t"))
+
+    asyncio.run(scenario())
+    own = tmp_path / str(os.getpid())
+    assert cache.disk.directory == str(own)
+    assert len(list(own.glob("*.seg"))) == 2
+    assert cache.disk._bytes == 200
+
+
+def test_files_left_by_previous_runs_are_removed(tmp_path):
+    dead = tmp_path / "999999999"
+    dead.mkdir()
+    (dead / "old.seg").write_bytes(b"x")
+    own = tmp_path / str(os.getpid())
+    own.mkdir()
+    (own / "reused_pid.seg").write_bytes(b"x")
+    (tmp_path / "legacy.seg").write_bytes(b"x")
+    alive = tmp_path / str(os.getppid())
+    alive.mkdir()
+    (alive / "other_worker.seg").write_bytes(b"x")
+
+    SegmentCache(max_bytes=0, directory=str(tmp_path), disk_max_bytes=1000)
+    assert not dead.exists() and not (tmp_path / "legacy.seg").exists()
+    assert list(own.iterdir()) == []
+    # Diretório de outro worker em execução é preservado
+    assert (alive / "other_worker.seg").exists()
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import m3u
+from app.services.cache import LRUCache
+from app.services.refresh import StaleWhileRevalidate
+
+
+def _write_playlist(path, name):
+    path.write_text(
+        "#EXTM3U\n"
+        f'#EXTINF:-1 tvg-id="{name}" group-title="News",{name}\n'
+        f"http://stream.example.com/{name}.m3u8\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def _setup(monkeypatch, ttl=0.05, max_stale=60.0):
+    monkeypatch.setattr(m3u, "_CACHE", LRUCache("m3u_test", max_bytes=1024 * 1024, ttl=ttl))
+    swr = StaleWhileRevalidate("m3u_test", max_stale=max_stale, enabled=True)
+    monkeypatch.setattr(m3u, "_SWR", swr)
+    return swr
+
+
+def test_expired_entry_is_served_while_refreshing(tmp_path, monkeypatch):
+    _setup(monkeypatch)
+    path = tmp_path / "swr.m3u"
+    src = _write_playlist(path, "old")
+
+    async def scenario():
+        first = await m3u.load_m3u_channels(src)
+        _write_playlist(path, "new")
+        await asyncio.sleep(0.06)
+        # Expirada: devolve a versão anterior e agenda a atualização
+        stale = await m3u.load_m3u_channels(src)
+        await asyncio.sleep(0.02)
+        fresh = await m3u.load_m3u_channels(src)
+        return first, stale, fresh
+
+    first, stale, fresh = asyncio.run(scenario())
+    assert first[0]["name"] == "old"
+    assert stale[0]["name"] == "old"
+    assert fresh[0]["name"] == "new"
+
+
+def test_entry_beyond_max_staleness_is_fetched_synchronously(tmp_path, monkeypatch):
+    _setup(monkeypatch, ttl=0.01, max_stale=0.01)
+    path = tmp_path / "old.m3u"
+    src = _write_playlist(path, "old")
+
+    async def scenario():
+        await m3u.load_m3u_channels(src)
+        _write_playlist(path, "new")
+        await asyncio.sleep(0.05)
+        return await m3u.load_m3u_channels(src)
+
+    channels = asyncio.run(scenario())
+    assert channels[0]["name"] == "new"
+
+
+def test_refresh_failure_backs_off_and_keeps_serving_stale(tmp_path, monkeypatch):
+    swr = _setup(monkeypatch)
+    src = _write_playlist(tmp_path / "fail.m3u", "kept")
+    calls = {"n": 0}
+    original = m3u._fetch_m3u
+
+    async def flaky(source, validators=None):
+        calls["n"] += 1
+        if calls["n"] > 1:
+            raise RuntimeError("upstream down")
+        return await original(source, validators)
+
+    monkeypatch.setattr(m3u, "_fetch_m3u", flaky)
+
+    async def scenario():
+        await m3u.load_m3u_channels(src)
+        await asyncio.sleep(0.06)
+        results = []
+        for _ in range(3):
+            results.append(await m3u.load_m3u_channels(src))
+            await asyncio.sleep(0.01)
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(r[0]["name"] == "kept" for r in results)
+    # Uma única tentativa de atualização; as demais aguardam o backoff
+    assert calls["n"] == 2
+    assert swr._failures[src][0] == 1
+
+
+def test_data_age_header(tmp_path, monkeypatch):
+    monkeypatch.setattr(m3u, "_CACHE", LRUCache("m3u_test", max_bytes=1024 * 1024, ttl=60))
+    src = _write_playlist(tmp_path / "age.m3u", "aged")
+    monkeypatch.setenv("M3U_SOURCE", src)
+    client = TestClient(app)
+    r = client.get("/catalog/m3u")
+    assert r.status_code == 200
+    assert r.headers["X-Data-Age"] == "0"
+    entry = m3u._CACHE.peek(src)
+    entry.ts = time.time() - 125
+    r = client.get("/catalog/channels")
+    assert r.status_code == 200
+    assert r.headers["X-Data-Age"] == "125"
@@ -0,0 +1,44 @@
+from app.services.epg import XMLTVStreamParser
+
+
+GUIDE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<tv generator-info-name="test">
+  <channel id="a">
+    <display-name lang="pt"> Canal A </display-name>
+    <display-name>Alternativo</display-name>
+    <icon src="https://example.com/a.png"/>
+  </channel>
+  <programme start="20250101090000 +0000" stop="20250101100000 +0000" channel="a">
+    <title>Segundo</title>
+  </programme>
+  <programme start="20250101080000 +0000" stop="20250101090000 +0000" channel="a">
+    <title lang="pt">Primeiro</title>
+    <desc>Descri\xc3\xa7\xc3\xa3o</desc>
+  </programme>
+  <programme start="20250101080000" stop="20250101090000" channel="orphan">
+    <title>Sem canal declarado</title>
+  </programme>
+</tv>
+"""
+
+
+def test_stream_parser_normalizes_in_small_chunks():
+    parser = XMLTVStreamParser()
+    for i in range(0, len(GUIDE), 7):
+        parser.feed(GUIDE[i:i + 7])
+    channels, programs = parser.close()
+
+    assert channels == {"a": {"id": "a", "name": "Canal A", "icon": "https://example.com/a.png"}}
+    titles = [p["title"] for p in programs["a"]]
+    assert titles == ["Primeiro", "Segundo"]
+    assert programs["a"][0]["description"] == "Descrição"
+    assert programs["a"][0]["start"] == "2025-01-01T08:00:00+00:00"
+    assert programs["orphan"][0]["start"] == "2025-01-01T08:00:00Z"
+
+
+def test_stream_parser_discards_processed_elements():
+    parser = XMLTVStreamParser()
+    parser.feed(GUIDE[: GUIDE.index(b"</tv>")])
+    # Elementos já convertidos não ficam pendurados na raiz
+    assert parser._root is not None
+    assert len(parser._root) == 0
@@ -0,0 +1,107 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from app.services.xmltv_time import _legacy_parse_xmltv_time, iso_to_epoch, parse_xmltv_time
+
+
+def _expected(value):
+    # Saída da implementação com strptime + epoch do ISO resultante
+    iso = _legacy_parse_xmltv_time(value)
+    if iso is None:
+        return None
+    return iso, int(datetime.fromisoformat(iso.replace("Z", "+00:00")).timestamp())
+
+
+def _check(values):
+    for value in values:
+        assert parse_xmltv_time(value) == _expected(value), value
+
+
+def test_every_date_including_invalid_days_and_months():
+    values = []
+    for year in ("0000", "0001", "1900", "1970", "1999", "2000", "2024", "2025", "2100", "9999"):
+        for month in range(0, 14):
+            for day in range(0, 33):
+                date = f"{year}{month:02d}{day:02d}"
+                values += [date + "123456", date + "123456 +0000", date + "000000 -0300", date + "235959 +1400"]
+    _check(values)
+
+
+def test_every_time_of_day_including_out_of_range_fields():
+    values = []
+    for hour in range(0, 30):
+        for minute in (0, 1, 30, 59, 60, 61, 99):
+            for second in (0, 1, 59, 60, 61):
+                clock = f"{hour:02d}{minute:02d}{second:02d}"
+                values += ["20250301" + clock, "20250301" + clock + " +0530", "20241231" + clock + " -0000"]
+    _check(values)
+
+
+def test_every_offset_including_invalid_ones():
+    values = []
+    for sign in "+-":
+        for hours in range(0, 27):
+            for minutes in range(0, 62):
+                values.append(f"20250101080000 {sign}{hours:02d}{minutes:02d}")
+    _check(values)
+
+
+def test_other_layouts_fall_back_to_strptime():
+    _check([
+        None,
+        "",
+        "   ",
+        " 20250101080000 +0000 ",
+        "20250101080000\t+0000",
+        "20250101080000  +0000",
+        "20250101080000+0000",
+        "20250101080000 Z",
+        "20250101080000 +05:30",
+        "20250101080000 +053",
+        "2025010108000",
+        "202501010800000",
+        "2025-01-01T08:00:00",
+        "20250101080000 +0000 extra",
+        "２０２５０１０１０８００００",
+        "٢٠٢٥٠١٠١٠٨٠٠٠٠ +0000",
+        "20250101080000 +٠٣٠٠",
+        "2025010108000² +0000",
+        "20251301000000",
+        "2025111080000 +0000",
+        "abcdefghijklmn",
+        "20250101080000 -0000",
+    ])
+
+
+def test_iso_to_epoch_reads_parser_output():
+    rnd = random.Random(4)
+    for _ in range(2000):
+        value = f"{rnd.randint(1970, 2100)}{rnd.randint(1, 12):02d}{rnd.randint(1, 28):02d}{rnd.randint(0, 23):02d}{rnd.randint(0, 59):02d}{rnd.randint(0, 59):02d}"
+        if rnd.random() < 0.7:
+            value += f" {rnd.choice('+-')}{rnd.randint(0, 14):02d}{rnd.choice((0, 30, 45)):02d}"
+        iso, epoch = parse_xmltv_time(value)
+        assert iso_to_epoch(iso) == epoch
+    assert iso_to_epoch(None) is None
+    assert iso_to_epoch("inválido") is None
+
+
+@pytest.mark.benchmark
+def test_benchmark_xmltv_time_parser(bench):
+    rnd = random.Random(1)
+    values = [
+        f"2025{rnd.randint(1, 12):02d}{rnd.randint(1, 28):02d}{rnd.randint(0, 23):02d}{rnd.choice((0, 15, 30, 45)):02d}00"
+        + ("" if i % 4 == 0 else f" {rnd.choice('+-')}0{rnd.randint(0, 9)}00")
+        for i in range(200_000)
+    ]
+
+    def parse_all(fn):
+        for value in values:
+            fn(value)
+
+    bench.compare(
+        "200k horários XMLTV",
+        ("strptime", bench.seconds(parse_all, _legacy_parse_xmltv_time)),
+        ("layout fixo com epoch", bench.seconds(parse_all, parse_xmltv_time)),
+    )